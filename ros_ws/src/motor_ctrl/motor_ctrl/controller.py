@@ -1,26 +1,36 @@
-import RPi.GPIO as GPIO
+import math
+import time
+
 import rclpy
 from rclpy.node import Node
 from robot_interfaces.msg import Movement # Import the new message
 
+from motor_ctrl.gpio_backends import get_backend
+
 class MotorController():
     """
     MOTOR CONTROL
     --
     This method contains functions to move the car in different directions
+
+    Args:
+        gpio: GPIO backend name ('auto', 'rpi', 'pigpio', 'lgpio', 'sim') or an object with the
+              RPi.GPIO API (see gpio_backends).
     """
     # Initialize Pin Setup
-    def __init__(self, leftMotors, rightMotors, leftBias=1, rightBias=1):
+    def __init__(self, leftMotors, rightMotors, leftBias=1, rightBias=1, gpio='auto'):
         self.leftMotorsEnable, self.leftMotorsForward, self.leftMotorsReverse = leftMotors
         self.rightMotorsEnable, self.rightMotorsForward, self.rightMotorsReverse = rightMotors
 
         self.leftBias = leftBias
         self.rightBias = rightBias
 
+        self.gpio = get_backend(gpio) if isinstance(gpio, str) else gpio
         self.setup()
 
     # Sets the pinmode as well as the output pins
     def setup(self):
+        GPIO = self.gpio
         GPIO.setmode(GPIO.BCM)
 
         GPIO.setup(self.leftMotorsEnable, GPIO.OUT)
@@ -44,10 +54,10 @@ class MotorController():
         self.leftMotorsPWM.ChangeDutyCycle(int(speed*self.leftBias))
         self.rightMotorsPWM.ChangeDutyCycle(speed)
 
-        GPIO.output(self.leftMotorsForward, True)
-        GPIO.output(self.leftMotorsReverse, False)
-        GPIO.output(self.rightMotorsForward, True)
-        GPIO.output(self.rightMotorsReverse, False)
+        self.gpio.output(self.leftMotorsForward, True)
+        self.gpio.output(self.leftMotorsReverse, False)
+        self.gpio.output(self.rightMotorsForward, True)
+        self.gpio.output(self.rightMotorsReverse, False)
 
      # Moves all wheels in reverse
     def moveReverse(self, speed=50):
@@ -56,10 +66,10 @@ class MotorController():
         self.leftMotorsPWM.ChangeDutyCycle(int(speed*self.leftBias))
         self.rightMotorsPWM.ChangeDutyCycle(int(speed*self.rightBias))
 
-        GPIO.output(self.leftMotorsForward, False)
-        GPIO.output(self.leftMotorsReverse, True)
-        GPIO.output(self.rightMotorsForward, False)
-        GPIO.output(self.rightMotorsReverse, True)
+        self.gpio.output(self.leftMotorsForward, False)
+        self.gpio.output(self.leftMotorsReverse, True)
+        self.gpio.output(self.rightMotorsForward, False)
+        self.gpio.output(self.rightMotorsReverse, True)
 
     # Turns left wheels reverse, and right wheels forward
     def turnLeft(self, speed=50):
@@ -68,10 +78,10 @@ class MotorController():
         self.leftMotorsPWM.ChangeDutyCycle(int(speed*0.9*self.leftBias))
         self.rightMotorsPWM.ChangeDutyCycle(int(speed*1.1*self.rightBias))
 
-        GPIO.output(self.leftMotorsForward, False)
-        GPIO.output(self.leftMotorsReverse, False)
-        GPIO.output(self.rightMotorsForward, True)
-        GPIO.output(self.rightMotorsReverse, False)
+        self.gpio.output(self.leftMotorsForward, False)
+        self.gpio.output(self.leftMotorsReverse, False)
+        self.gpio.output(self.rightMotorsForward, True)
+        self.gpio.output(self.rightMotorsReverse, False)
 
     # Turns left wheels forward, and right wheels reverse
     def turnRight(self, speed=50):
@@ -80,10 +90,10 @@ class MotorController():
         self.leftMotorsPWM.ChangeDutyCycle(int(speed*self.leftBias))
         self.rightMotorsPWM.ChangeDutyCycle(int(speed*self.rightBias))
 
-        GPIO.output(self.leftMotorsForward, True)
-        GPIO.output(self.leftMotorsReverse, False)
-        GPIO.output(self.rightMotorsForward, False)
-        GPIO.output(self.rightMotorsReverse, False)
+        self.gpio.output(self.leftMotorsForward, True)
+        self.gpio.output(self.leftMotorsReverse, False)
+        self.gpio.output(self.rightMotorsForward, False)
+        self.gpio.output(self.rightMotorsReverse, False)
 
     # Stops all wheels
     def stop(self):
@@ -92,40 +102,127 @@ class MotorController():
         self.leftMotorsPWM.ChangeDutyCycle(0)
         self.rightMotorsPWM.ChangeDutyCycle(0)
 
-        GPIO.output(self.leftMotorsForward, True)
-        GPIO.output(self.leftMotorsReverse, False)
-        GPIO.output(self.rightMotorsForward, True)
-        GPIO.output(self.rightMotorsReverse, False)
+        self.gpio.output(self.leftMotorsForward, True)
+        self.gpio.output(self.leftMotorsReverse, False)
+        self.gpio.output(self.rightMotorsForward, True)
+        self.gpio.output(self.rightMotorsReverse, False)
+
+    # Drives each side at a signed speed (-100 to 100, negative is reverse)
+    def drive(self, leftSpeed, rightSpeed):
+        self.leftMotorsPWM.ChangeDutyCycle(int(min(100, abs(leftSpeed)) * self.leftBias))
+        self.rightMotorsPWM.ChangeDutyCycle(int(min(100, abs(rightSpeed)) * self.rightBias))
+
+        self.gpio.output(self.leftMotorsForward, leftSpeed >= 0)
+        self.gpio.output(self.leftMotorsReverse, leftSpeed < 0)
+        self.gpio.output(self.rightMotorsForward, rightSpeed >= 0)
+        self.gpio.output(self.rightMotorsReverse, rightSpeed < 0)
 
     # Clears all setup on pins
     def exit(self):
-        GPIO.cleanup()
+        self.gpio.cleanup()
     
         
+class SlewLimiter():
+    """
+    Moves one wheel's speed towards its target with a bounded rate of change (slew, %/s) and a
+    bounded change of that rate (acceleration, %/s^2), easing into the target instead of overshooting.
+    """
+    def __init__(self, maxSlew=None, maxAccel=None):
+        self.maxSlew = maxSlew
+        self.maxAccel = maxAccel
+        self.value = 0.0
+        self.rate = 0.0
+
+    def update(self, target, dt):
+        error = target - self.value
+        if error == 0 or dt <= 0:
+            self.rate = 0.0
+            return self.value
+
+        rate = error / dt
+        if self.maxSlew is not None:
+            rate = max(-self.maxSlew, min(self.maxSlew, rate))
+        if self.maxAccel is not None:
+            brake = math.sqrt(2.0 * self.maxAccel * abs(error))
+            rate = max(-brake, min(brake, rate))
+            rate = max(self.rate - self.maxAccel * dt, min(self.rate + self.maxAccel * dt, rate))
+
+        step = rate * dt
+        if (error > 0 and step >= error) or (error < 0 and step <= error):
+            self.value = float(target)
+            self.rate = 0.0
+        else:
+            self.value += step
+            self.rate = rate
+        return self.value
+
+    def reset(self):
+        self.value = 0.0
+        self.rate = 0.0
+
+
 class MotorControlNode(Node): # MODIFY NAME
     def __init__(self):
         super().__init__("motor_controller") # MODIFY NAME
-        self.motor_controller = MotorController(leftMotors=[2,3,4], rightMotors=[17,27,22]) # Example pin numbers, replace with your actual pins
+        # 'auto' picks the first of pigpio, lgpio, RPi.GPIO that works ('sim' runs without a Pi)
+        gpio_backend = self.declare_parameter("gpio_backend", "auto").value
+        self.motor_controller = MotorController(leftMotors=[2,3,4], rightMotors=[17,27,22], gpio=gpio_backend) # Example pin numbers, replace with your actual pins
+
+        # Actuation runs on a fixed-rate timer: the callback only keeps the newest command, so bursts
+        # coalesce and stale queued messages are never applied one after another
+        rate = self.declare_parameter("actuation_rate", 50.0).value
+        maxSlew = self.declare_parameter("max_slew", 300.0).value       # %/s per wheel
+        maxAccel = self.declare_parameter("max_accel", 3000.0).value    # %/s^2 per wheel
+        # Publishers must repeat their command faster than this (0 disables the watchdog)
+        self.watchdog = self.declare_parameter("watchdog_ms", 500.0).value / 1000.0
+        self.left = SlewLimiter(maxSlew, maxAccel)
+        self.right = SlewLimiter(maxSlew, maxAccel)
+        self.target = (0.0, 0.0)
+        self.commandTime = None
+        self.stale = True
+        self.lastUpdate = time.monotonic()
+
         self.subscription = self.create_subscription(
             Movement,
             "robot_movement",
             self.subscription_callback,
-            10
+            1 # Only the newest command matters
         )
+        self.timer = self.create_timer(1.0 / rate, self.actuate)
         self.get_logger().info("Motor Controller Node has been started.")
 
 
     def subscription_callback(self, msg):
+        # Signed (left, right) wheel speeds for each command
         if msg.command == Movement.FORWARD:
-            self.motor_controller.moveForward(msg.speed)
+            self.target = (msg.speed, msg.speed)
         elif msg.command == Movement.REVERSE:
-            self.motor_controller.moveReverse(msg.speed)
+            self.target = (-msg.speed, -msg.speed)
         elif msg.command == Movement.TURN_LEFT:
-            self.motor_controller.turnLeft(msg.speed)
+            self.target = (0.0, msg.speed * 1.1)
         elif msg.command == Movement.TURN_RIGHT:
-            self.motor_controller.turnRight(msg.speed)
+            self.target = (msg.speed, 0.0)
         elif msg.command == Movement.STOP:
-            self.motor_controller.stop()
+            self.target = (0.0, 0.0)
+        self.commandTime = time.monotonic()
+
+    def actuate(self):
+        now = time.monotonic()
+        dt, self.lastUpdate = now - self.lastUpdate, now
+
+        # Watchdog: stop if the commands stop coming
+        if self.watchdog > 0 and (self.commandTime is None or now - self.commandTime > self.watchdog):
+            if not self.stale:
+                self.stale = True
+                self.get_logger().warn("No movement command within the watchdog timeout, stopping.")
+                self.left.reset()
+                self.right.reset()
+                self.motor_controller.stop()
+            return
+        self.stale = False
+
+        left, right = self.target
+        self.motor_controller.drive(self.left.update(left, dt), self.right.update(right, dt))
  
  
  
@@ -2,32 +2,39 @@
 This module handles the motor control for the robot.
 
 It also provides you with manual robot control functionality.
-To use this feature, run this file as a script.
+To use this feature, run this file as a script (add --gpio=pigpio|lgpio|rpi|sim to pick the GPIO backend).
 """
 
-import RPi.GPIO as GPIO
 import curses
 import time
 
+from GPIOBackends import backend_from_args, get_backend
+
 class MotorController():
     """
     MOTOR CONTROL
     --
     This method contains functions to move the car in different directions
+
+    Args:
+        gpio: GPIO backend name ('auto', 'rpi', 'pigpio', 'lgpio', 'sim') or an object with the
+              RPi.GPIO API (see GPIOBackends).
     """
 
     # Initialize Pin Setup
-    def __init__(self, leftMotors, rightMotors, leftBias=1, rightBias=1):
+    def __init__(self, leftMotors, rightMotors, leftBias=1, rightBias=1, gpio='auto'):
         self.leftMotorsEnable, self.leftMotorsForward, self.leftMotorsReverse = leftMotors
         self.rightMotorsEnable, self.rightMotorsForward, self.rightMotorsReverse = rightMotors
 
         self.leftBias = leftBias
         self.rightBias = rightBias
 
+        self.gpio = get_backend(gpio) if isinstance(gpio, str) else gpio
         self.setup()
 
     # Sets the pinmode as well as the output pins
     def setup(self):
+        GPIO = self.gpio
         GPIO.setmode(GPIO.BCM)
         GPIO.setwarnings(False) # Disable GPIO warnings
 
@@ -51,10 +58,10 @@ class MotorController():
         self.leftMotorsPWM.ChangeDutyCycle(dutyCycle)
         self.rightMotorsPWM.ChangeDutyCycle(speed)
 
-        GPIO.output(self.leftMotorsForward, True)
-        GPIO.output(self.leftMotorsReverse, False)
-        GPIO.output(self.rightMotorsForward, True)
-        GPIO.output(self.rightMotorsReverse, False)
+        self.gpio.output(self.leftMotorsForward, True)
+        self.gpio.output(self.leftMotorsReverse, False)
+        self.gpio.output(self.rightMotorsForward, True)
+        self.gpio.output(self.rightMotorsReverse, False)
 
     # Moves all wheels in reverse
     def moveReverse(self, speed=50):
@@ -62,10 +69,10 @@ class MotorController():
         self.leftMotorsPWM.ChangeDutyCycle(dutyCycle)
         self.rightMotorsPWM.ChangeDutyCycle(int(speed*self.rightBias))
 
-        GPIO.output(self.leftMotorsForward, False)
-        GPIO.output(self.leftMotorsReverse, True)
-        GPIO.output(self.rightMotorsForward, False)
-        GPIO.output(self.rightMotorsReverse, True)
+        self.gpio.output(self.leftMotorsForward, False)
+        self.gpio.output(self.leftMotorsReverse, True)
+        self.gpio.output(self.rightMotorsForward, False)
+        self.gpio.output(self.rightMotorsReverse, True)
 
     # Turns left on the spot (zero-point turn)
     def turnLeft(self, speed=50):
@@ -74,10 +81,10 @@ class MotorController():
         self.rightMotorsPWM.ChangeDutyCycle(int(speed*self.rightBias))
 
         # Left motors reverse, Right motors forward
-        GPIO.output(self.leftMotorsForward, False)
-        GPIO.output(self.leftMotorsReverse, True)
-        GPIO.output(self.rightMotorsForward, True)
-        GPIO.output(self.rightMotorsReverse, False)
+        self.gpio.output(self.leftMotorsForward, False)
+        self.gpio.output(self.leftMotorsReverse, True)
+        self.gpio.output(self.rightMotorsForward, True)
+        self.gpio.output(self.rightMotorsReverse, False)
 
     # Turns right on the spot (zero-point turn)
     def turnRight(self, speed=50):
@@ -86,10 +93,10 @@ class MotorController():
         self.rightMotorsPWM.ChangeDutyCycle(int(speed*self.rightBias))
 
         # Left motors forward, Right motors reverse
-        GPIO.output(self.leftMotorsForward, True)
-        GPIO.output(self.leftMotorsReverse, False)
-        GPIO.output(self.rightMotorsForward, False)
-        GPIO.output(self.rightMotorsReverse, True)
+        self.gpio.output(self.leftMotorsForward, True)
+        self.gpio.output(self.leftMotorsReverse, False)
+        self.gpio.output(self.rightMotorsForward, False)
+        self.gpio.output(self.rightMotorsReverse, True)
 
     # Stops all wheels
     def stop(self):
@@ -99,9 +106,9 @@ class MotorController():
     # Clears all setup on pins
     def exit(self):
         self.stop()
-        GPIO.cleanup()
+        self.gpio.cleanup()
 
-def main(stdscr):
+def main(stdscr, gpio='auto'):
     # Curses setup for real-time keyboard input
     curses.curs_set(0)  # Hide the cursor
     stdscr.nodelay(1)   # Don't block waiting for a key press
@@ -116,7 +123,7 @@ def main(stdscr):
     RIGHT_MOTORS = (22, 27, 17) # Example: (EN_B, IN3, IN4)
     
     # Initialize the robot
-    robot = MotorController(leftMotors=LEFT_MOTORS, rightMotors=RIGHT_MOTORS)
+    robot = MotorController(leftMotors=LEFT_MOTORS, rightMotors=RIGHT_MOTORS, gpio=gpio)
     speed = 75  # Default speed (0-100)
 
     # Display control instructions
@@ -177,11 +184,12 @@ def main(stdscr):
     robot.exit()
 
 if __name__ == "__main__":
+    gpio = get_backend(backend_from_args())
     try:
-        curses.wrapper(main)
+        curses.wrapper(main, gpio)
     except Exception as e:
         # This will run if curses fails to initialize, ensuring GPIO cleanup
         print("An error occurred. Cleaning up GPIO.")
-        GPIO.setmode(GPIO.BCM)
-        GPIO.cleanup()
+        gpio.setmode(gpio.BCM)
+        gpio.cleanup()
         print(f"Error: {e}")
\ No newline at end of file
@@ -1,4 +1,5 @@
 from MotorController import MotorController
+from GPIOBackends import backend_from_args
 import cv2
 from LaneDetection import getLaneCurve
 import WebcamMod
@@ -6,7 +7,8 @@ from ImageStreamer import ImageStreamer
 import time
  
 # Initialize MotorController
-car = MotorController((2, 3, 4), (22, 27, 17), leftBias=1, rightBias=1)
+# `python main.py --gpio=sim` runs without a Pi (also pigpio, lgpio or rpi; default: first that works)
+car = MotorController((2, 3, 4), (22, 27, 17), leftBias=1, rightBias=1, gpio=backend_from_args())
 
  
 def main():
@@ -0,0 +1,180 @@
+"""
+Fixed-rate actuation stage between the control loop and the motors.
+
+The control loop only posts commands; the actuator thread applies the most recent one at its own
+fixed rate, so a burst of commands costs a single motor update and the motors never work through
+a backlog of outdated ones. On the way each wheel's duty cycle is slew/acceleration limited, and a
+watchdog stops the car if the commands stop coming (a hung or crashed control loop).
+"""
+
+import math
+import sys
+import threading
+import time
+
+from Instrumentation import LatencyRecorder, ACTUATOR_STAGES
+from LoopScheduler import LoopScheduler
+
+# Actuator settings shared by main.py and replay.py: 100 Hz updates, per-wheel limits of 300 %/s
+# and 3000 %/s^2, and a stop after 250 ms without a command
+ACTUATOR = dict(rate_hz=100, max_slew=300, max_accel=3000, watchdog_ms=250)
+
+
+class SlewLimiter:
+    """
+    Moves one wheel's duty cycle towards its target with a bounded rate of change (slew, %/s) and a
+    bounded change of that rate (acceleration, %/s^2). While approaching the target the rate is also
+    capped at sqrt(2 * accel * distance), so the wheel eases into the new value instead of overshooting.
+
+    Args:
+        max_slew (float): Maximum duty-cycle change in percent per second (None: unlimited).
+        max_accel (float): Maximum change of the slew rate in percent per second^2 (None: unlimited).
+    """
+    def __init__(self, max_slew=None, max_accel=None):
+        self.max_slew = max_slew
+        self.max_accel = max_accel
+        self.value = 0.0
+        self.rate = 0.0
+
+    def update(self, target, dt):
+        """Advances by dt seconds towards target and returns the new value."""
+        error = target - self.value
+        if error == 0 or dt <= 0:
+            self.rate = 0.0
+            return self.value
+
+        rate = error / dt
+        if self.max_slew is not None:
+            rate = max(-self.max_slew, min(self.max_slew, rate))
+        if self.max_accel is not None:
+            brake = math.sqrt(2.0 * self.max_accel * abs(error))
+            rate = max(-brake, min(brake, rate))
+            rate = max(self.rate - self.max_accel * dt, min(self.rate + self.max_accel * dt, rate))
+
+        step = rate * dt
+        if (error > 0 and step >= error) or (error < 0 and step <= error):
+            self.value = float(target)
+            self.rate = 0.0
+        else:
+            self.value += step
+            self.rate = rate
+        return self.value
+
+    def reset(self, value=0.0):
+        self.value = float(value)
+        self.rate = 0.0
+
+
+class Actuator:
+    """
+    Applies the latest motor command at a fixed rate on its own thread.
+
+    Args:
+        motors (MotorController): Needs drive(left, right) and stop() (and steerSpeeds for command()).
+        rate_hz (float): Actuation rate.
+        max_slew (float): Per-wheel duty-cycle slew limit in %/s (None: unlimited).
+        max_accel (float): Per-wheel slew-rate change limit in %/s^2 (None: unlimited).
+        watchdog_ms (float): Stop the car if no command arrives for this long (None: disabled).
+    """
+    def __init__(self, motors, rate_hz=100.0, max_slew=300.0, max_accel=3000.0, watchdog_ms=250):
+        self.motors = motors
+        self.watchdog = watchdog_ms / 1000.0 if watchdog_ms is not None else None
+        self.left = SlewLimiter(max_slew, max_accel)
+        self.right = SlewLimiter(max_slew, max_accel)
+        self.scheduler = LoopScheduler(rate_hz=rate_hz, skip_perception_on_overrun=False,
+                                       name='actuator')
+        self.thread = None
+
+        # Single command slot: writers overwrite it, the actuator thread takes whatever is newest
+        self.lock = threading.Lock()
+        self.target = (0.0, 0.0)
+        self.command_time = None
+        self.capture_time = None
+        self.command_seq = 0
+        self.applied_seq = 0
+
+        # Capture -> command -> motor write, once per camera frame (the first write of its command)
+        self.latency = LatencyRecorder(ACTUATOR_STAGES)
+        self.timed_capture = None
+
+        self.commands = 0
+        self.coalesced = 0          # commands replaced before the actuator got to them
+        self.watchdog_trips = 0
+        self.stale = True
+        self.command_age_max = 0.0  # worst time from command() to its first motor update
+
+    def command(self, speed, steering, capture_time=None):
+        """Posts a steer command (same arguments as MotorController.steer, see command_wheels)."""
+        self.command_wheels(*self.motors.steerSpeeds(speed, steering), capture_time=capture_time)
+
+    def command_wheels(self, left, right, capture_time=None):
+        """
+        Posts signed per-wheel speeds (-100 to 100). Only the most recent command is kept.
+
+        Args:
+            capture_time (float): time.monotonic() when the camera frame the command comes from was
+                                  captured; the first motor write for each frame is recorded in `latency`.
+        """
+        with self.lock:
+            if self.command_seq > self.applied_seq:
+                self.coalesced += 1
+            self.target = (left, right)
+            self.command_time = time.monotonic()
+            self.capture_time = capture_time
+            self.command_seq += 1
+            self.commands += 1
+
+    def update(self, dt):
+        """One actuation step (called by the actuator thread, or by an external timer)."""
+        with self.lock:
+            (left, right), command_time, capture_time, seq = (self.target, self.command_time, self.capture_time,
+                                                              self.command_seq)
+
+        now = time.monotonic()
+        if self.watchdog is not None and (command_time is None or now - command_time > self.watchdog):
+            if not self.stale:
+                self.stale = True
+                self.watchdog_trips += 1
+                sys.stderr.write(f"Actuator watchdog: no command for {self.watchdog * 1000:.0f} ms, stopping.\n")
+                self.left.reset()
+                self.right.reset()
+                self.motors.stop()
+            return
+        self.stale = False
+
+        if seq != self.applied_seq:
+            self.applied_seq = seq
+            self.command_age_max = max(self.command_age_max, now - command_time)
+        self.motors.drive(self.left.update(left, dt), self.right.update(right, dt))
+        if capture_time is not None and capture_time != self.timed_capture:
+            self.timed_capture = capture_time
+            self.latency.start(capture_time)
+            self.latency.mark('command', command_time)
+            self.latency.mark('motor')
+            self.latency.finish()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.scheduler.run, args=(lambda dt, perceive: self.update(dt),),
+                                       name="Actuator", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stops the thread and the motors."""
+        self.scheduler.stop()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+        self.left.reset()
+        self.right.reset()
+        self.motors.stop()
+
+    def stats(self):
+        return {
+            "commands": self.commands,
+            "coalesced": self.coalesced,
+            "watchdog_trips": self.watchdog_trips,
+            "stale": self.stale,
+            "command_age_max_ms": self.command_age_max * 1000,
+            "duty": (self.left.value, self.right.value),
+            "scheduler": self.scheduler.stats(),
+        }
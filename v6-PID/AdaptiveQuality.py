@@ -0,0 +1,125 @@
+"""
+Adaptive JPEG quality / resolution for ImageStreamer streams.
+
+Watches how much CPU the encoder spends on a stream and how fast its viewers actually take the
+bytes, and steps along a ladder of (downscale factor, JPEG quality) settings to stay within budget.
+"""
+
+import threading
+import time
+
+# (scale, jpeg quality), best first. Quality is cheaper to give up than resolution, so it goes first.
+LEVELS = (
+    (1.0, 80),
+    (1.0, 70),
+    (1.0, 60),
+    (1.0, 50),
+    (0.75, 50),
+    (0.75, 40),
+    (0.5, 40),
+    (0.5, 30),
+    (0.35, 30),
+)
+
+
+class AdaptiveQuality:
+    """
+    Picks the encode settings for one stream.
+
+    Once per `window` seconds the measured load is compared with the budgets:
+    - over budget (or a viewer had frames skipped by backpressure): step one level down right away
+    - under `low_water` of every budget for `hold_windows` windows in a row: step one level up
+    The gap between the two thresholds is the hysteresis that keeps it from oscillating.
+
+    Args:
+        cpu_budget (float): Fraction of one core the stream's encoding may use (0.2 = 20%).
+        bandwidth_budget (float): Bytes per second a single viewer may be sent.
+        window (float): Measurement window in seconds.
+        low_water (float): Fraction of the budgets below which quality is stepped back up.
+        hold_windows (int): Consecutive quiet windows required before stepping up.
+        start_level (int): Index into `levels` to start at.
+        levels (tuple): (scale, quality) ladder, best first.
+    """
+    def __init__(self, cpu_budget=0.2, bandwidth_budget=500_000, window=1.0, low_water=0.6, hold_windows=3,
+                 start_level=1, levels=LEVELS):
+        self.cpu_budget = cpu_budget
+        self.bandwidth_budget = bandwidth_budget
+        self.window = window
+        self.low_water = low_water
+        self.hold_windows = hold_windows
+        self.levels = levels
+        self.level = max(0, min(len(levels) - 1, start_level))
+
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.encode_ms = 0.0        # encode time spent in the current window
+        self.client_bytes = {}      # viewer -> bytes sent in the current window
+        self.skipped = 0            # frames skipped by backpressure in the current window
+        self.quiet_windows = 0
+        self.changes = 0
+
+        # Last completed window, for the status endpoint
+        self.cpu_load = 0.0
+        self.bandwidth = 0.0
+
+    @property
+    def scale(self):
+        return self.levels[self.level][0]
+
+    @property
+    def quality(self):
+        return self.levels[self.level][1]
+
+    def observe_encode(self, elapsed_ms):
+        """Called by the encoder after every frame of this stream."""
+        with self.lock:
+            self.encode_ms += elapsed_ms
+        self._maybe_update()
+
+    def observe_send(self, client, nbytes, skipped=False):
+        """Called whenever a frame is sent to (or skipped for) a viewer of this stream."""
+        with self.lock:
+            self.client_bytes[client] = self.client_bytes.get(client, 0) + nbytes
+            if skipped:
+                self.skipped += 1
+
+    def _maybe_update(self):
+        now = time.monotonic()
+        with self.lock:
+            elapsed = now - self.window_start
+            if elapsed < self.window:
+                return
+            self.cpu_load = self.encode_ms / 1000.0 / elapsed
+            self.bandwidth = max(self.client_bytes.values(), default=0) / elapsed
+            skipped = self.skipped
+            self.window_start = now
+            self.encode_ms = 0.0
+            self.client_bytes = {}
+            self.skipped = 0
+
+            cpu_ratio = self.cpu_load / self.cpu_budget
+            bandwidth_ratio = self.bandwidth / self.bandwidth_budget
+            if (cpu_ratio > 1.0 or bandwidth_ratio > 1.0 or skipped) and self.level < len(self.levels) - 1:
+                self.level += 1
+                self.changes += 1
+                self.quiet_windows = 0
+            elif cpu_ratio < self.low_water and bandwidth_ratio < self.low_water and not skipped:
+                self.quiet_windows += 1
+                if self.quiet_windows >= self.hold_windows and self.level > 0:
+                    self.level -= 1
+                    self.changes += 1
+                    self.quiet_windows = 0
+            else:
+                self.quiet_windows = 0
+
+    def status(self):
+        return {
+            "level": self.level,
+            "scale": self.scale,
+            "jpeg_quality": self.quality,
+            "cpu_load": self.cpu_load,
+            "cpu_budget": self.cpu_budget,
+            "bandwidth": self.bandwidth,
+            "bandwidth_budget": self.bandwidth_budget,
+            "changes": self.changes,
+        }
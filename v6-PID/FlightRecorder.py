@@ -0,0 +1,238 @@
+"""
+Always-on flight recorder: the last N seconds of downscaled frames and control signals in a
+memory-mapped ring file, for working out after the fact why the car left the lane.
+
+The file is allocated and pre-faulted when the recorder opens, so record() is a resize into the
+mapping plus a handful of scalar stores: no allocation, no system call. A background thread
+msyncs the mapping every flush_interval seconds; the kernel owns the dirty pages, so even a crash
+of the control process loses nothing (the flush only guards against power loss).
+
+    python FlightRecorder.py flight.rec                   # summary of the recording
+    python FlightRecorder.py flight.rec.1                 # the run before that
+    python FlightRecorder.py flight.rec --export crash/   # frames as PNGs + columns as crash/signals.npz
+    python replay.py --frames crash/ --fps 30             # run the recorded frames through the pipeline again
+"""
+
+import argparse
+import mmap
+import os
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+MAGIC = b'LTRFLT01'
+HEADER = np.dtype([
+    ('magic', 'S8'),
+    ('capacity', np.int64),
+    ('height', np.int64),
+    ('width', np.int64),
+    ('channels', np.int64),
+    ('count', np.int64),            # records written so far; the newest is at (count - 1) % capacity
+    ('created', np.float64),        # time.time() when the file was created
+    ('created_monotonic', np.float64),  # time.monotonic() at the same moment (to convert timestamps)
+])
+HEADER_BYTES = mmap.PAGESIZE
+
+
+def record_dtype(height, width, channels):
+    """Layout of one ring slot."""
+    frame_shape = (height, width) if channels == 1 else (height, width, channels)
+    return np.dtype([
+        ('seq', np.int64),              # camera frame sequence number (0 if unknown)
+        ('time', np.float64),           # time.monotonic() when the record was written
+        ('capture_time', np.float64),   # time.monotonic() when the frame was captured (NaN if unknown)
+        ('error', np.float32),          # normalized lane error
+        ('steering', np.float32),       # PID output
+        ('left_duty', np.float32),      # signed wheel duty cycles (%)
+        ('right_duty', np.float32),
+        ('frame', np.uint8, frame_shape),
+    ])
+
+
+class FlightRecorder:
+    """
+    Ring file of the most recent control ticks (single writer).
+
+    Args:
+        path (str): Ring file. An existing one is kept as path.1 (path.1 as path.2, and so on), so
+                    restarting the car does not wipe the recording of the run that went wrong.
+        seconds (float): How much history to keep.
+        rate_hz (float): Expected record() rate (capacity = seconds * rate_hz records).
+        size (tuple): (width, height) frames are downscaled to.
+        channels (int): 1 stores grayscale frames, 3 keeps BGR.
+        flush_interval (float): Seconds between background msyncs (None: only on close()).
+        keep (int): Previous recordings to keep (0: overwrite the existing file).
+    """
+    def __init__(self, path='flight.rec', seconds=30, rate_hz=30, size=(90, 60), channels=1, flush_interval=1.0,
+                 keep=3):
+        self.path = path
+        self.capacity = max(1, int(seconds * rate_hz))
+        self.width, self.height = size
+        self.channels = channels
+        self.dtype = record_dtype(self.height, self.width, channels)
+
+        file_size = HEADER_BYTES + self.capacity * self.dtype.itemsize
+        rotate(path, keep)
+        self.file = open(path, 'w+b')
+        self.file.truncate(file_size)
+        if hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(self.file.fileno(), 0, file_size)  # reserve blocks now, not on first write
+        self.mmap = mmap.mmap(self.file.fileno(), file_size)
+
+        self.header = np.ndarray((1,), HEADER, buffer=self.mmap)
+        self.records = np.ndarray((self.capacity,), self.dtype, buffer=self.mmap, offset=HEADER_BYTES)
+        self.records[:] = 0  # touches every page once so record() never takes a page fault
+        self.header[0] = (MAGIC, self.capacity, self.height, self.width, channels, 0, time.time(), time.monotonic())
+
+        # Per-field views into the mapping (indexing a field view is much cheaper than a record)
+        self.count = self.header['count']
+        self.seq = self.records['seq']
+        self.time = self.records['time']
+        self.capture_time = self.records['capture_time']
+        self.error = self.records['error']
+        self.steering = self.records['steering']
+        self.left_duty = self.records['left_duty']
+        self.right_duty = self.records['right_duty']
+        self.frames = self.records['frame']
+        self._gray = np.empty((self.height, self.width), np.uint8)
+        self._small = np.empty((self.height, self.width, 3), np.uint8)
+
+        self.flushes = 0
+        self._stop = threading.Event()
+        self._thread = None
+        if flush_interval:
+            self._thread = threading.Thread(target=self._flush_loop, args=(flush_interval,),
+                                            name="FlightRecorder", daemon=True)
+            self._thread.start()
+
+    def record(self, img=None, error=0.0, steering=0.0, left_duty=0.0, right_duty=0.0, seq=0, capture_time=None):
+        """
+        Writes one tick into the next ring slot.
+
+        Args:
+            img (np.ndarray): Camera frame (BGR or grayscale), or None to leave the frame blank.
+        """
+        n = int(self.count[0])
+        slot = n % self.capacity
+        if img is not None:
+            self._store_frame(img, self.frames[slot])
+        self.seq[slot] = seq
+        self.capture_time[slot] = np.nan if capture_time is None else capture_time
+        self.error[slot] = error
+        self.steering[slot] = steering
+        self.left_duty[slot] = left_duty
+        self.right_duty[slot] = right_duty
+        self.time[slot] = time.monotonic()
+        self.count[0] = n + 1  # published last, so a reader of the file never sees a half-written newest slot
+
+    def _store_frame(self, img, dst):
+        # INTER_LINEAR: several times cheaper than INTER_AREA here and plenty for a post-mortem look
+        size = (self.width, self.height)
+        if (img.ndim == 3) == (self.channels == 3):
+            cv2.resize(img, size, dst=dst, interpolation=cv2.INTER_LINEAR)
+        elif self.channels == 1:
+            cv2.resize(img, size, dst=self._small, interpolation=cv2.INTER_LINEAR)
+            cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=dst)
+        else:
+            cv2.resize(img, size, dst=self._gray, interpolation=cv2.INTER_LINEAR)
+            cv2.cvtColor(self._gray, cv2.COLOR_GRAY2BGR, dst=dst)
+
+    def _flush_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.mmap.flush()
+            self.flushes += 1
+
+    def close(self):
+        """Stops the flush thread and writes everything out."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+        # Drop the numpy views before closing the mapping they point into
+        self.header = self.records = self.count = self.frames = None
+        self.seq = self.time = self.capture_time = self.error = self.steering = None
+        self.left_duty = self.right_duty = None
+        self.mmap.flush()
+        self.mmap.close()
+        self.file.close()
+
+    def stats(self):
+        n = int(self.count[0]) if self.count is not None else None
+        return {"records": n, "capacity": self.capacity, "flushes": self.flushes,
+                "record_bytes": self.dtype.itemsize, "file": self.path}
+
+
+def rotate(path, keep):
+    """Renames path -> path.1 -> path.2 ... up to path.<keep>, dropping the oldest."""
+    if keep <= 0 or not os.path.exists(path):
+        return
+    for i in range(keep - 1, 0, -1):
+        if os.path.exists(f"{path}.{i}"):
+            os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+    os.replace(path, f"{path}.1")
+
+
+def load_flight_record(path):
+    """
+    Reads a ring file (also one still being written).
+
+    Returns:
+        dict: header fields, plus one np.ndarray per record field, oldest record first.
+    """
+    with open(path, 'rb') as f:
+        header = np.frombuffer(f.read(HEADER.itemsize), HEADER)[0]
+        if header['magic'] != MAGIC:
+            raise ValueError(f"{path} is not a flight recorder file")
+        capacity, count = int(header['capacity']), int(header['count'])
+        dtype = record_dtype(int(header['height']), int(header['width']), int(header['channels']))
+        f.seek(HEADER_BYTES)
+        records = np.frombuffer(f.read(capacity * dtype.itemsize), dtype)
+
+    if count > capacity:
+        start = count % capacity
+        records = np.concatenate((records[start:], records[:start]))
+    else:
+        records = records[:count]
+    result = {name: header[name].item() for name in HEADER.names if name != 'magic'}
+    result.update({name: records[name].copy() for name in dtype.names})
+    return result
+
+
+def export(path, directory):
+    """Writes the frames as numbered PNGs (readable by replay.py --frames) and the signals as signals.npz."""
+    data = load_flight_record(path)
+    os.makedirs(directory, exist_ok=True)
+    for i, frame in enumerate(data['frame']):
+        cv2.imwrite(os.path.join(directory, f"{i:06d}.png"), frame)
+    np.savez_compressed(os.path.join(directory, "signals.npz"),
+                        **{name: values for name, values in data.items() if name != 'frame' and np.ndim(values)})
+    return len(data['frame'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or export a flight recorder file.")
+    parser.add_argument("path", nargs="?", default="flight.rec")
+    parser.add_argument("--export", metavar="DIR", help="Write frames and signals to this directory")
+    args = parser.parse_args(argv)
+
+    data = load_flight_record(args.path)
+    n = len(data['time'])
+    if n == 0:
+        print(f"{args.path}: no records")
+        return 1
+    span = data['time'][-1] - data['time'][0]
+    ended = time.strftime('%Y-%m-%d %H:%M:%S',
+                          time.localtime(data['created'] + data['time'][-1] - data['created_monotonic']))
+    print(f"{args.path}: {n} records over {span:.1f} s (of {data['count']} written), last at {ended}")
+    print(f"  error     min {data['error'].min():+.3f}  max {data['error'].max():+.3f}  last {data['error'][-1]:+.3f}")
+    print(f"  steering  min {data['steering'].min():+.3f}  max {data['steering'].max():+.3f}  "
+          f"last {data['steering'][-1]:+.3f}")
+    if args.export:
+        print(f"Exported {export(args.path, args.export)} frames to {args.export}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
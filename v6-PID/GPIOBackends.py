@@ -0,0 +1,324 @@
+"""
+GPIO backends for MotorController.
+
+Every backend exposes the part of the RPi.GPIO API the motor code uses (setmode, setwarnings,
+setup, output, PWM objects with start/ChangeDutyCycle/ChangeFrequency/stop, cleanup), so the
+controller works unchanged on top of any of them:
+
+    rpi     RPi.GPIO itself (software PWM thread per channel)
+    pigpio  pigpio daemon: DMA-timed PWM on any pin, true hardware PWM on GPIO 12/13/18/19;
+            neither jitters under CPU load (needs `sudo pigpiod`)
+    lgpio   lgpio on /dev/gpiochip (works on the Pi 5 and newer kernels)
+    sim     In-memory simulator that keeps a timestamped trace of recent pin and duty-cycle changes
+
+    gpio = get_backend('auto')   # first of pigpio, lgpio, rpi that works (the simulator only on request)
+"""
+
+import sys
+import time
+from collections import deque
+
+BCM = 11
+BOARD = 10
+OUT = 0
+IN = 1
+LOW = 0
+HIGH = 1
+
+BACKENDS = ('rpi', 'pigpio', 'lgpio', 'sim')
+AUTO_ORDER = ('pigpio', 'lgpio', 'rpi')
+
+# Pins wired to the SoC's PWM peripheral (12/18 share channel 0, 13/19 channel 1)
+HARDWARE_PWM_PINS = (12, 13, 18, 19)
+
+
+class SimulatedPWM:
+    """Mimics RPi.GPIO.PWM: reports duty-cycle and frequency changes to its SimulatedGPIO."""
+    def __init__(self, gpio, pin, frequency):
+        self.gpio = gpio
+        self.pin = pin
+        self.frequency = frequency
+        self.gpio._record(pin, 'frequency', frequency)
+
+    def start(self, duty_cycle):
+        self.gpio._write_duty(self.pin, duty_cycle)
+
+    def ChangeDutyCycle(self, duty_cycle):
+        self.gpio._write_duty(self.pin, duty_cycle)
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+        self.gpio.writes += 1
+        self.gpio._record(self.pin, 'frequency', frequency)
+
+    def stop(self):
+        self.gpio._write_duty(self.pin, 0)
+
+
+class SimulatedGPIO:
+    """
+    In-memory GPIO for running the control loop without a Pi.
+
+    Attributes:
+        levels (dict): pin -> last level written with output().
+        duty (dict): pin -> last duty cycle written through a PWM object.
+        writes (int): Number of calls that would have touched the hardware.
+        trace (deque): (time.monotonic(), pin, kind, value) for the last `trace_limit` changes,
+                       kind being 'level', 'duty' or 'frequency' (only kept if record=True).
+    """
+    BCM = BCM
+    BOARD = BOARD
+    OUT = OUT
+    IN = IN
+    LOW = LOW
+    HIGH = HIGH
+
+    def __init__(self, record=True, clock=time.monotonic, trace_limit=100_000):
+        self.record = record
+        self.clock = clock
+        self.mode = None
+        self.modes = {}
+        self.levels = {}
+        self.duty = {}
+        self.writes = 0
+        # Bounded: the simulator may back a whole run with the actuator changing duty at 100 Hz
+        self.trace = deque(maxlen=trace_limit)
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setwarnings(self, enabled):
+        pass
+
+    def setup(self, pin, direction):
+        self.modes[pin] = direction
+
+    def output(self, pin, level):
+        self.levels[pin] = bool(level)
+        self.writes += 1
+        self._record(pin, 'level', int(bool(level)))
+
+    def PWM(self, pin, frequency):
+        return SimulatedPWM(self, pin, frequency)
+
+    def cleanup(self):
+        self.modes.clear()
+        self.levels.clear()
+        self.duty.clear()
+
+    def _write_duty(self, pin, duty_cycle):
+        self.duty[pin] = duty_cycle
+        self.writes += 1
+        self._record(pin, 'duty', duty_cycle)
+
+    def _record(self, pin, kind, value):
+        if self.record:
+            self.trace.append((self.clock(), pin, kind, value))
+
+    def dump_trace(self, path):
+        """Writes the trace as CSV (time,pin,kind,value)."""
+        with open(path, 'w') as f:
+            f.write('time,pin,kind,value\n')
+            for t, pin, kind, value in self.trace:
+                f.write(f'{t:.6f},{pin},{kind},{value}\n')
+
+
+class PigpioPWM:
+    """
+    PWM channel on the pigpio daemon (duty cycle 0-100).
+
+    On HARDWARE_PWM_PINS the SoC's PWM peripheral generates the carrier (any frequency, fine
+    duty resolution). Other pins get DMA-timed PWM, whose frequency is rounded to one the daemon's
+    sample rate supports (8 kHz, 4 kHz, 2 kHz, 1.6 kHz, 1 kHz, 800 Hz, 500 Hz, ... at 5 us).
+    """
+    def __init__(self, gpio, pin, frequency):
+        self.pi = gpio.pi
+        self.pin = pin
+        self.hardware = gpio.hardware_pwm and pin in HARDWARE_PWM_PINS
+        self.duty_cycle = 0
+        if not self.hardware:
+            self.pi.set_PWM_range(pin, 100)
+        self.ChangeFrequency(frequency)
+
+    def start(self, duty_cycle):
+        self.ChangeDutyCycle(duty_cycle)
+
+    def ChangeDutyCycle(self, duty_cycle):
+        self.duty_cycle = duty_cycle
+        if self.hardware:
+            self.pi.hardware_PWM(self.pin, self.frequency, int(duty_cycle * 10000))
+        else:
+            self.pi.set_PWM_dutycycle(self.pin, duty_cycle)
+
+    def ChangeFrequency(self, frequency):
+        if self.hardware:
+            self.frequency = int(frequency)
+            self.pi.hardware_PWM(self.pin, self.frequency, int(self.duty_cycle * 10000))
+        else:
+            # pigpio rounds to the nearest frequency its sample rate supports
+            self.frequency = self.pi.set_PWM_frequency(self.pin, int(frequency))
+
+    def stop(self):
+        self.ChangeDutyCycle(0)
+
+
+class PigpioGPIO:
+    """
+    RPi.GPIO-style wrapper around a pigpio daemon connection (BCM numbering only).
+
+    Args:
+        host (str): Host running pigpiod (defaults to the local one / $PIGPIO_ADDR).
+        hardware_pwm (bool): Use the PWM peripheral for PWM on HARDWARE_PWM_PINS.
+    """
+    BCM = BCM
+    BOARD = BOARD
+    OUT = OUT
+    IN = IN
+    LOW = LOW
+    HIGH = HIGH
+
+    def __init__(self, host=None, hardware_pwm=True):
+        import pigpio
+        self.pigpio = pigpio
+        self.pi = pigpio.pi(host) if host else pigpio.pi()
+        if not self.pi.connected:
+            raise RuntimeError("Could not connect to pigpiod (start it with `sudo pigpiod`)")
+        self.hardware_pwm = hardware_pwm
+        self.pins = set()
+
+    def setmode(self, mode):
+        if mode != BCM:
+            raise ValueError("The pigpio backend only supports BCM pin numbering")
+
+    def setwarnings(self, enabled):
+        pass
+
+    def setup(self, pin, direction):
+        self.pi.set_mode(pin, self.pigpio.OUTPUT if direction == OUT else self.pigpio.INPUT)
+        self.pins.add(pin)
+
+    def output(self, pin, level):
+        self.pi.write(pin, 1 if level else 0)
+
+    def PWM(self, pin, frequency):
+        return PigpioPWM(self, pin, frequency)
+
+    def cleanup(self):
+        for pin in self.pins:
+            if self.hardware_pwm and pin in HARDWARE_PWM_PINS:
+                self.pi.hardware_PWM(pin, 0, 0)
+            self.pi.write(pin, 0)
+            self.pi.set_mode(pin, self.pigpio.INPUT)
+        self.pins.clear()
+        self.pi.stop()
+
+
+class LgpioPWM:
+    """PWM channel driven by lgpio's tx_pwm (duty cycle 0-100)."""
+    def __init__(self, gpio, pin, frequency):
+        self.gpio = gpio
+        self.pin = pin
+        self.frequency = frequency
+        self.duty_cycle = 0
+
+    def start(self, duty_cycle):
+        self.ChangeDutyCycle(duty_cycle)
+
+    def ChangeDutyCycle(self, duty_cycle):
+        self.duty_cycle = duty_cycle
+        self.gpio.lgpio.tx_pwm(self.gpio.handle, self.pin, self.frequency, duty_cycle)
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+        self.ChangeDutyCycle(self.duty_cycle)
+
+    def stop(self):
+        self.ChangeDutyCycle(0)
+
+
+class LgpioGPIO:
+    """
+    RPi.GPIO-style wrapper around lgpio (BCM numbering only).
+
+    Args:
+        chip (int): gpiochip number (0 on the Pi 4 and earlier, 4 on the Pi 5 with older kernels).
+    """
+    BCM = BCM
+    BOARD = BOARD
+    OUT = OUT
+    IN = IN
+    LOW = LOW
+    HIGH = HIGH
+
+    def __init__(self, chip=0):
+        import lgpio
+        self.lgpio = lgpio
+        try:
+            self.handle = lgpio.gpiochip_open(chip)
+        except lgpio.error as e:
+            raise RuntimeError(f"Could not open gpiochip{chip}: {e}")
+        self.pins = set()
+
+    def setmode(self, mode):
+        if mode != BCM:
+            raise ValueError("The lgpio backend only supports BCM pin numbering")
+
+    def setwarnings(self, enabled):
+        pass
+
+    def setup(self, pin, direction):
+        if direction == OUT:
+            self.lgpio.gpio_claim_output(self.handle, pin, 0)
+        else:
+            self.lgpio.gpio_claim_input(self.handle, pin)
+        self.pins.add(pin)
+
+    def output(self, pin, level):
+        self.lgpio.gpio_write(self.handle, pin, 1 if level else 0)
+
+    def PWM(self, pin, frequency):
+        return LgpioPWM(self, pin, frequency)
+
+    def cleanup(self):
+        for pin in self.pins:
+            self.lgpio.gpio_free(self.handle, pin)
+        self.pins.clear()
+        self.lgpio.gpiochip_close(self.handle)
+
+
+def get_backend(name='auto'):
+    """
+    Returns a GPIO object with the RPi.GPIO API.
+
+    Args:
+        name (str): One of BACKENDS, or 'auto' to use the first of AUTO_ORDER that can be opened.
+    Raises:
+        RuntimeError: 'auto' found no GPIO library that works. The simulator is never picked
+                      automatically, so a car missing its GPIO library fails here instead of
+                      silently not driving; ask for it with 'sim' (`--gpio=sim`).
+    """
+    if name == 'sim':
+        return SimulatedGPIO()
+    if name == 'rpi':
+        import RPi.GPIO as GPIO
+        return GPIO
+    if name == 'pigpio':
+        return PigpioGPIO()
+    if name == 'lgpio':
+        return LgpioGPIO()
+    if name == 'auto':
+        failures = []
+        for candidate in AUTO_ORDER:
+            try:
+                return get_backend(candidate)
+            except (ImportError, RuntimeError) as exc:
+                failures.append(f"{candidate}: {exc}")
+        raise RuntimeError("No GPIO backend could be opened (" + "; ".join(failures) + "). "
+                           "Use --gpio=sim to run on the simulator.")
+    raise ValueError(f"Unknown GPIO backend {name!r} (expected 'auto' or one of {BACKENDS})")
+
+
+def backend_from_args(argv=None, default='auto'):
+    """Returns the backend name given as `--gpio=<name>` on the command line (or `default`)."""
+    argv = sys.argv[1:] if argv is None else argv
+    return next((arg.split('=', 1)[1] for arg in argv if arg.startswith('--gpio=')), default)
@@ -1,105 +1,557 @@
 import cv2
 import time
 import threading
-import http.server
-import socketserver
+import asyncio
 import numpy as np
+import json
+import socket
+import struct
 import sys
+import zlib
+
+# Share of non-0/255 pixels a single-channel frame may have and still count as a binary mask
+# (warpImg interpolates, so warped masks have a thin band of grey along every edge)
+MASK_GREY_FRACTION = 0.05
+
+VIEWER_HTML = b"""<!DOCTYPE html>
+<html><head><title>Lane robot feeds</title>
+<style>body{background:#222;color:#ddd;font-family:sans-serif} canvas,img{image-rendering:pixelated;width:720px}</style>
+</head><body>
+<div id="links"></div>
+<canvas id="mask"></canvas><img id="image">
+<script>
+// Packed-bit mask feed: [u32 length][u16 width][u16 height][zlib(MSB-first bits, row-major)] per frame
+// Mask streams open as packed bits (?mode=image for their PNG feed), every other stream as images
+const params = new URLSearchParams(location.search);
+const canvas = document.getElementById('mask'), ctx = canvas.getContext('2d');
+
+async function draw(frame) {
+  const view = new DataView(frame.buffer, frame.byteOffset);
+  const w = view.getUint16(0), h = view.getUint16(2);
+  const inflated = new Blob([frame.subarray(4)]).stream().pipeThrough(new DecompressionStream('deflate'));
+  const bits = new Uint8Array(await new Response(inflated).arrayBuffer());
+  if (canvas.width !== w || canvas.height !== h) { canvas.width = w; canvas.height = h; }
+  const img = ctx.createImageData(w, h), px = new Uint32Array(img.data.buffer);
+  for (let i = 0; i < w * h; i++) px[i] = (bits[i >> 3] >> (7 - (i & 7))) & 1 ? 0xffffffff : 0xff000000;
+  ctx.putImageData(img, 0, 0);
+}
+
+async function watchMask() {
+  const reader = (await fetch('/' + name + '.mask')).body.getReader();
+  let buf = new Uint8Array(0);
+  for (;;) {
+    const {value, done} = await reader.read();
+    if (done) return;
+    const joined = new Uint8Array(buf.length + value.length);
+    joined.set(buf); joined.set(value, buf.length); buf = joined;
+    while (buf.length >= 4) {
+      const len = new DataView(buf.buffer, buf.byteOffset).getUint32(0);
+      if (buf.length < 4 + len) break;
+      await draw(buf.subarray(4, 4 + len));
+      buf = buf.slice(4 + len);
+    }
+  }
+}
+
+let name;
+fetch('/status.json').then(r => r.json()).then(s => {
+  const names = Object.keys(s.streams);
+  document.getElementById('links').innerHTML = names.map(n => `<a href="?stream=${n}">${n}</a>` +
+    (s.streams[n].mask === true ? ` (<a href="?stream=${n}&mode=image">png</a>)` : '')).join(' | ');
+  name = params.get('stream') || (names.includes('warp') ? 'warp' : names[0]);
+  const mode = params.get('mode') || (s.streams[name] && s.streams[name].mask === true ? 'mask' : 'image');
+  if (mode === 'mask') watchMask();
+  else document.getElementById('image').src = '/' + name + '.mjpg';
+});
+</script></body></html>
+"""
+
+
+def is_binary_mask(frame):
+    """
+    Cheap check for a single-channel 0/255 mask (e.g. thresholding/warpImg output).
+    Only a sparse grid of pixels is inspected, so this costs a few microseconds.
+    """
+    if frame.dtype != np.uint8 or not (frame.ndim == 2 or (frame.ndim == 3 and frame.shape[2] == 1)):
+        return False
+    sample = frame[::7, ::7]
+    return np.count_nonzero((sample > 0) & (sample < 255)) <= sample.size * MASK_GREY_FRACTION
+
+
+def pack_mask(frame):
+    """
+    Packs a mask into bits (pixels > 127 are set) and deflates them.
+    Returns:
+        bytes: u16 width, u16 height (big-endian), then the zlib-compressed MSB-first bits, row-major.
+    """
+    h, w = frame.shape[:2]
+    return struct.pack('>HH', w, h) + zlib.compress(np.packbits(frame > 127).tobytes(), 1)
+
+
+def image_content_type(frame_bytes):
+    return 'image/png' if frame_bytes[:4] == b'\x89PNG' else 'image/jpeg'
+
+
+class StreamClient:
+    """A connected viewer: 'image' (multipart JPEG/PNG, /<name>.mjpg) or 'mask' (packed bits, /<name>.mask)."""
+    def __init__(self, writer, stream, fmt='image'):
+        self.writer = writer
+        self.stream = stream
+        self.format = fmt
+        self.peer = writer.get_extra_info('peername')
+        self.frames_sent = 0
+        self.frames_skipped = 0
+        self.bytes_sent = 0
+
+
+class Stream:
+    """
+    One named MJPEG feed (e.g. /raw.mjpg) with its own encode settings.
+
+    Args:
+        name (str): Stream name; it is served at /<name>.mjpg.
+        size (tuple): Optional (width, height) frames are resized to before encoding.
+        jpeg_quality (int): JPEG quality for this stream.
+        max_fps (float): Maximum encode rate for this stream (None for every frame).
+        adaptive (AdaptiveQuality): Optional controller that overrides quality and downscales under load.
+        mask (bool): Whether frames are binary masks: None detects it per frame (is_binary_mask),
+                     True/False forces it. Mask frames go to image viewers as 1-bit PNG instead of JPEG;
+                     only mask=True streams are also served as packed bits on /<name>.mask.
+    """
+    def __init__(self, name, size=None, jpeg_quality=70, max_fps=None, adaptive=None, mask=None):
+        self.name = name
+        self.size = size
+        self.jpeg_quality = jpeg_quality
+        self.max_fps = max_fps
+        self.adaptive = adaptive
+        self.mask = mask
+        self.latest_frame = None    # raw frame waiting to be encoded
+        self.frame_seq = 0          # frames received through update_image
+        self.encoded_seq = 0        # frame_seq of the last frame the encoder processed
+        self.latest_frame_bytes = None
+        self.latest_mask_bytes = None
+        self.last_encode = 0.0      # time.monotonic() of the last encode (for max_fps)
+        self.clients = set()        # only touched from the event loop thread
+        self.client_count = 0
+        self.mask_clients = 0       # viewers of /<name>.mask (included in client_count)
+        self.frames_encoded = 0
+        self.frames_packed = 0
+        self.encode_ms_avg = 0.0
+
+    def ready_at(self):
+        """Earliest time.monotonic() at which the next frame may be encoded."""
+        return self.last_encode + (1.0 / self.max_fps if self.max_fps else 0.0)
+
+    def stats(self):
+        return {
+            "clients": self.client_count,
+            "size": self.size,
+            "jpeg_quality": self.jpeg_quality,
+            "max_fps": self.max_fps,
+            "mask": self.mask,
+            "frames_received": self.frame_seq,
+            "frames_encoded": self.frames_encoded,
+            "encode_ms_avg": self.encode_ms_avg,
+            "frames_packed": self.frames_packed,
+            "latest_bytes": len(self.latest_frame_bytes or b''),
+            "latest_mask_bytes": len(self.latest_mask_bytes or b''),
+            "adaptive": self.adaptive.status() if self.adaptive else None,
+            "viewers": [{"peer": str(c.peer), "format": c.format, "frames_sent": c.frames_sent, "frames_skipped": c.frames_skipped,
+                         "bytes_sent": c.bytes_sent} for c in list(self.clients)],
+        }
+
 
 class ImageStreamer:
     """
-    A class that manages a threaded HTTP server to stream images.
+    A class that manages an asyncio HTTP server (on its own thread) to stream images.
     The image being streamed can be updated by calling the update_image method.
+
+    Several named streams can be served from the same port (see add_stream). Frames are JPEG-encoded
+    lazily on a background encoder thread: at most once per frame (shared by all of that stream's
+    clients), and only while the stream has at least one client. All viewers are served from one
+    event loop; a viewer that has not taken the previous frame off the socket when a new one arrives
+    skips the new one instead of queueing it. Binary masks are sent as 1-bit PNG on /<name>.mjpg, and streams
+    added with mask=True also as deflated packed bits on /<name>.mask (drawn by the page at /viewer.html).
     """
-    def __init__(self, port=8000, jpeg_quality=70):
+    def __init__(self, port=8000, jpeg_quality=70, max_client_buffer=0, send_buffer=32 * 1024):
         """
         Initializes the streamer.
         Args:
             port (int): The port to serve the MJPEG stream on.
             jpeg_quality (int): The JPEG compression quality (0-100).
+            max_client_buffer (int): Bytes a client may have waiting in the event loop (i.e. not yet
+                                     accepted by the kernel) before new frames are skipped for it.
+                                     0 skips a frame whenever any part of an earlier one is still waiting.
+            send_buffer (int): SO_SNDBUF for viewer sockets (None: system default). Kept small so the
+                               kernel holds at most a frame or two for a slow viewer instead of megabytes.
         """
         self.port = port
         self.jpeg_quality = jpeg_quality
-        self.latest_frame_bytes = None
+        self.max_client_buffer = max_client_buffer
+        self.send_buffer = send_buffer
         self.frame_lock = threading.Lock()
+        self.frame_cond = threading.Condition(self.frame_lock)
+        self.streams = {}
+        self.stream_paths = {}
+        self.default_stream = self.add_stream('stream')
+        self.routes = {'/status.json': lambda: ('application/json', json.dumps(self.stats()).encode()),
+                       '/viewer.html': lambda: ('text/html', VIEWER_HTML)}
         self.server_thread = None
-        self.http_server = None
-
-    def _create_handler_class(self):
-        """Creates a request handler class that has access to this streamer instance."""
-        streamer_instance = self
-
-        class StreamingHandler(http.server.BaseHTTPRequestHandler):
-            def do_GET(self):
-                if self.path == '/stream.mjpg':
-                    self.send_response(200)
-                    self.send_header('Content-type', 'multipart/x-mixed-replace; boundary=frame')
-                    self.end_headers()
-                    try:
-                        while True:
-                            with streamer_instance.frame_lock:
-                                if streamer_instance.latest_frame_bytes:
-                                    frame = streamer_instance.latest_frame_bytes
-                                else:
-                                    # If no frame yet, wait a bit and continue
-                                    time.sleep(0.1)
-                                    continue
-
-                            self.wfile.write(b'--frame\r\n')
-                            self.send_header('Content-Type', 'image/jpeg')
-                            self.send_header('Content-Length', str(len(frame)))
-                            self.end_headers()
-                            self.wfile.write(frame)
-                            self.wfile.write(b'\r\n')
-                            time.sleep(1/30) # Limit frame rate to ~30 FPS
-                    except Exception as e:
-                        # Client disconnected or another error occurred
-                        sys.stderr.write(f"Client disconnected or error: {e}\n")
-                else:
-                    self.send_response(404)
-                    self.end_headers()
-                    self.wfile.write(b"Not Found. Access /stream.mjpg for the video feed.")
-        
-        return StreamingHandler
-
-    def update_image(self, numpy_frame):
+        self.encoder_thread = None
+        self.loop = None
+        self.server = None
+        self.running = False
+        self.start_error = None     # why the server thread failed to bind, re-raised by start()
+
+        # Encode metrics (all streams)
+        self.frames_encoded = 0
+        self.encode_ms_last = 0.0
+        self.encode_ms_avg = 0.0    # exponential moving average
+        self.encode_ms_max = 0.0
+
+    @property
+    def client_count(self):
+        """Number of viewers across all streams."""
+        return sum(stream.client_count for stream in self.streams.values())
+
+    @property
+    def latest_frame_bytes(self):
+        return self.default_stream.latest_frame_bytes
+
+    def add_stream(self, name, size=None, jpeg_quality=None, max_fps=None, aliases=(), adaptive=None, mask=None):
+        """
+        Registers a named stream served at /<name>.mjpg (plus any alias paths, and /<name>.mask for masks).
+        Args:
+            name (str): Stream name, e.g. 'raw'.
+            size (tuple): Optional (width, height) to downscale frames to before encoding.
+            jpeg_quality (int): JPEG quality (defaults to the streamer's).
+            max_fps (float): Maximum encode rate (None encodes every new frame).
+            aliases (iterable): Extra paths for this stream, e.g. ('/stream.mjpg',).
+            adaptive (AdaptiveQuality): Optional controller that adapts quality and size to CPU/bandwidth load.
+            mask (bool): Frames are binary masks (None: detect per frame). Only True adds /<name>.mask, since
+                         packing anything but a mask would send noise.
+        Returns:
+            Stream: The registered stream.
+        """
+        stream = Stream(name, size, jpeg_quality or self.jpeg_quality, max_fps, adaptive, mask)
+        with self.frame_lock:
+            self.streams[name] = stream
+            self.stream_paths[f'/{name}.mjpg'] = (stream, 'image')
+            if mask:
+                self.stream_paths[f'/{name}.mask'] = (stream, 'mask')
+            for path in aliases:
+                self.stream_paths[path] = (stream, 'image')
+        return stream
+
+    async def _handle_connection(self, reader, writer):
+        """Serves one HTTP connection on the event loop."""
+        try:
+            request_line = await reader.readline()
+            # Skip the request headers
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.decode('latin-1').split()
+            path = parts[1].split('?')[0] if len(parts) > 1 else ''
+
+            if path in self.stream_paths:
+                await self._serve_stream(reader, writer, *self.stream_paths[path])
+            elif path in self.routes:
+                content_type, body = self.routes[path]()
+                self._write_response(writer, b'200 OK', content_type, body)
+            else:
+                paths = ", ".join(sorted(self.stream_paths))
+                self._write_response(writer, b'404 Not Found', 'text/plain',
+                                     f"Not Found. Available feeds: {paths}".encode())
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            sys.stderr.write(f"Client disconnected or error: {e}\n")
+        finally:
+            writer.close()
+
+    def _write_response(self, writer, status, content_type, body):
+        writer.write(b'HTTP/1.0 ' + status + b'\r\n' +
+                     f'Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n'.encode() + body)
+
+    async def _serve_stream(self, reader, writer, stream, fmt):
+        if fmt == 'mask':
+            # Length-prefixed pack_mask() frames, read by the viewer page with fetch()
+            content_type = b'application/octet-stream'
+        else:
+            content_type = b'multipart/x-mixed-replace; boundary=frame'
+        sock = writer.get_extra_info('socket')
+        if self.send_buffer and sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.send_buffer)
+        writer.write(b'HTTP/1.0 200 OK\r\nCache-Control: no-cache\r\nContent-Type: ' + content_type + b'\r\n\r\n')
+        client = StreamClient(writer, stream, fmt)
+        stream.clients.add(client)
+        with self.frame_cond:
+            stream.client_count += 1
+            if fmt == 'mask':
+                stream.mask_clients += 1
+            self.frame_cond.notify_all() # Wake the encoder
+            frame_bytes = stream.latest_mask_bytes if fmt == 'mask' else stream.latest_frame_bytes
+        if frame_bytes is not None:
+            self._send_frame(client, frame_bytes)
+
+        try:
+            # Frames are pushed by _broadcast; just wait here until the viewer goes away
+            while await reader.read(1024):
+                pass
+        finally:
+            stream.clients.discard(client)
+            with self.frame_cond:
+                stream.client_count -= 1
+                if fmt == 'mask':
+                    stream.mask_clients -= 1
+            sys.stderr.write(f"Client {client.peer} left /{stream.name}.{'mask' if fmt == 'mask' else 'mjpg'} "
+                             f"({client.frames_sent} frames sent, {client.frames_skipped} skipped)\n")
+
+    def _send_frame(self, client, frame_bytes):
+        """Queues a frame on the client's socket, unless an earlier frame is still waiting to go out (backpressure)."""
+        transport = client.writer.transport
+        if transport.is_closing():
+            return
+        adaptive = client.stream.adaptive
+        if transport.get_write_buffer_size() > self.max_client_buffer:
+            client.frames_skipped += 1
+            if adaptive:
+                adaptive.observe_send(client, 0, skipped=True)
+            return
+        if client.format == 'mask':
+            client.writer.write(struct.pack('>I', len(frame_bytes)) + frame_bytes)
+        else:
+            client.writer.write(b'--frame\r\nContent-Type: ' + image_content_type(frame_bytes).encode() +
+                                b'\r\nContent-Length: ' + str(len(frame_bytes)).encode() + b'\r\n\r\n' +
+                                frame_bytes + b'\r\n')
+        client.frames_sent += 1
+        client.bytes_sent += len(frame_bytes)
+        if adaptive:
+            adaptive.observe_send(client, len(frame_bytes))
+
+    def _broadcast(self, stream, frame_bytes, fmt='image'):
+        """Runs on the event loop: hands a freshly encoded frame to every viewer of the stream in that format."""
+        for client in list(stream.clients):
+            if client.format == fmt:
+                self._send_frame(client, frame_bytes)
+
+    def add_route(self, path, callback):
+        """
+        Serves extra (non-streaming) content from the same port.
+        Args:
+            path (str): The URL path, e.g. '/latency.json'.
+            callback (callable): Returns (content_type, body_bytes) for each request.
+        """
+        self.routes[path] = callback
+
+    def has_clients(self, *names):
+        """
+        Returns True if at least one client is watching any of the named streams
+        (any stream at all if no names are given).
+        """
+        if not names:
+            return self.client_count > 0
+        return any(name in self.streams and self.streams[name].client_count > 0 for name in names)
+
+    def update_image(self, numpy_frame, copy=False, stream='stream'):
         """
         Updates the image to be streamed.
+        Only a reference is kept; the frame is encoded later on the encoder thread if anyone is watching.
         Args:
             numpy_frame (np.ndarray): The new image frame (from OpenCV).
+            copy (bool): Copy the frame (only while clients are connected). Pass True if the caller
+                         reuses the array for the next frame, e.g. a LanePipeline buffer.
+            stream (str): Name of the stream to update.
         """
         if numpy_frame is None:
             return
+        target = self.streams[stream]
+
+        if copy and target.client_count > 0:
+            numpy_frame = numpy_frame.copy()
 
-        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality]
-        result, encoded_image = cv2.imencode('.jpg', numpy_frame, encode_param)
+        with self.frame_cond:
+            target.latest_frame = numpy_frame
+            target.frame_seq += 1
+            if target.client_count > 0:
+                self.frame_cond.notify_all()
+
+    def encode(self, numpy_frame, stream=None):
+        """
+        Encodes a frame for image viewers with the stream's settings and records how long it took:
+        binary masks as 1-bit PNG (far smaller than JPEG for these), everything else as JPEG.
+        Returns:
+            bytes: The encoded frame, or None if encoding failed.
+        """
+        stream = stream or self.default_stream
+        start = time.perf_counter()
+        size, quality = stream.size, stream.jpeg_quality
+        if stream.adaptive is not None:
+            quality = stream.adaptive.quality
+            if stream.adaptive.scale != 1.0:
+                w, h = size or (numpy_frame.shape[1], numpy_frame.shape[0])
+                size = (max(1, int(w * stream.adaptive.scale)), max(1, int(h * stream.adaptive.scale)))
+        if size is not None and (numpy_frame.shape[1], numpy_frame.shape[0]) != tuple(size):
+            numpy_frame = cv2.resize(numpy_frame, tuple(size), interpolation=cv2.INTER_AREA)
+        if stream.mask if stream.mask is not None else is_binary_mask(numpy_frame):
+            _, numpy_frame = cv2.threshold(numpy_frame, 127, 255, cv2.THRESH_BINARY)
+            result, encoded_image = cv2.imencode('.png', numpy_frame, [int(cv2.IMWRITE_PNG_BILEVEL), 1,
+                                                                       int(cv2.IMWRITE_PNG_COMPRESSION), 1])
+        else:
+            encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), quality]
+            result, encoded_image = cv2.imencode('.jpg', numpy_frame, encode_param)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        self.frames_encoded += 1
+        self.encode_ms_last = elapsed_ms
+        self.encode_ms_max = max(self.encode_ms_max, elapsed_ms)
+        self.encode_ms_avg = elapsed_ms if self.frames_encoded == 1 else 0.9 * self.encode_ms_avg + 0.1 * elapsed_ms
+        stream.frames_encoded += 1
+        stream.encode_ms_avg = elapsed_ms if stream.frames_encoded == 1 else 0.9 * stream.encode_ms_avg + 0.1 * elapsed_ms
+        if stream.adaptive is not None:
+            stream.adaptive.observe_encode(elapsed_ms)
 
         if not result:
-            sys.stderr.write("Error: Could not encode frame as JPEG.\n")
+            sys.stderr.write("Error: Could not encode frame.\n")
+            return None
+        return encoded_image.tobytes()
+
+    def encode_mask(self, numpy_frame, stream=None):
+        """
+        Packs a frame for /<name>.mask viewers (see pack_mask), at the stream's size if it has one.
+        Returns:
+            bytes: The packed frame.
+        """
+        stream = stream or self.default_stream
+        if stream.size is not None and (numpy_frame.shape[1], numpy_frame.shape[0]) != tuple(stream.size):
+            numpy_frame = cv2.resize(numpy_frame, tuple(stream.size), interpolation=cv2.INTER_NEAREST)
+        if numpy_frame.ndim == 3 and numpy_frame.shape[2] == 3:
+            numpy_frame = cv2.cvtColor(numpy_frame, cv2.COLOR_BGR2GRAY)
+        stream.frames_packed += 1
+        return pack_mask(numpy_frame)
+
+    def _next_stream(self):
+        """
+        Returns (stream, None) for a stream with a frame to encode now, or (None, seconds) to wait
+        until a rate-limited stream becomes ready (None = until notified). Call with frame_lock held.
+        """
+        now = time.monotonic()
+        wait = None
+        for stream in self.streams.values():
+            if stream.client_count == 0 or stream.frame_seq <= stream.encoded_seq:
+                continue
+            ready_at = stream.ready_at()
+            if ready_at <= now:
+                return stream, None
+            wait = ready_at - now if wait is None else min(wait, ready_at - now)
+        return None, wait
+
+    def _encode_loop(self):
+        """Encoder thread: encodes each new frame once per stream, while that stream has clients."""
+        while True:
+            with self.frame_cond:
+                while self.running:
+                    stream, wait = self._next_stream()
+                    if stream is not None:
+                        break
+                    self.frame_cond.wait(wait)
+                if not self.running:
+                    return
+                frame, seq = stream.latest_frame, stream.frame_seq
+                stream.last_encode = time.monotonic()
+                # Only produce the formats somebody is watching
+                want_image = stream.client_count > stream.mask_clients
+                want_mask = stream.mask_clients > 0
+
+            frame_bytes = self.encode(frame, stream) if want_image else None
+            mask_bytes = self.encode_mask(frame, stream) if want_mask else None
+
+            with self.frame_cond:
+                stream.encoded_seq = seq
+                if frame_bytes is not None:
+                    stream.latest_frame_bytes = frame_bytes
+                if mask_bytes is not None:
+                    stream.latest_mask_bytes = mask_bytes
+            try:
+                if frame_bytes is not None:
+                    self.loop.call_soon_threadsafe(self._broadcast, stream, frame_bytes, 'image')
+                if mask_bytes is not None:
+                    self.loop.call_soon_threadsafe(self._broadcast, stream, mask_bytes, 'mask')
+            except RuntimeError:
+                return # Event loop already closed (streamer stopping)
+
+    def stats(self):
+        """Returns streamer metrics (also served at /status.json)."""
+        return {
+            "clients": self.client_count,
+            "frames_encoded": self.frames_encoded,
+            "encode_ms_last": self.encode_ms_last,
+            "encode_ms_avg": self.encode_ms_avg,
+            "encode_ms_max": self.encode_ms_max,
+            "streams": {name: stream.stats() for name, stream in self.streams.items()},
+        }
+
+    def _run_loop(self, started):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self._handle_connection, host=None, port=self.port))
+        except Exception as exc:
+            # e.g. the port is in use; start() raises it in the caller's thread
+            self.start_error = exc
+            self.loop.close()
             return
+        finally:
+            started.set()
+        self.loop.run_forever()
 
-        with self.frame_lock:
-            self.latest_frame_bytes = encoded_image.tobytes()
-
-    def start(self):
-        """Starts the HTTP server in a separate thread."""
-        class ThreadedHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
-            """Handle requests in a separate thread."""
-            pass
-
-        handler_class = self._create_handler_class()
-        self.http_server = ThreadedHTTPServer(("", self.port), handler_class)
-        
-        self.server_thread = threading.Thread(target=self.http_server.serve_forever)
+        # Shut down: stop accepting, drop the viewers, and let their handlers finish
+        self.server.close()
+        for stream in self.streams.values():
+            for client in list(stream.clients):
+                client.writer.close()
+        self.loop.run_until_complete(self.server.wait_closed())
+        pending = asyncio.all_tasks(self.loop)
+        if pending:
+            self.loop.run_until_complete(asyncio.wait(pending, timeout=1.0))
+        self.loop.close()
+
+    def start(self, timeout=5.0):
+        """
+        Starts the HTTP server and the encoder in separate threads.
+
+        Args:
+            timeout (float): Seconds to wait for the server to start listening.
+        Raises:
+            OSError: The server could not listen on the port (e.g. it is in use).
+            TimeoutError: The server did not start within `timeout` seconds.
+        """
+        self.running = True
+        self.start_error = None
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+        self.server_thread = threading.Thread(target=self._run_loop, args=(started,), name="ImageStreamer")
         self.server_thread.daemon = True
         self.server_thread.start()
-        sys.stderr.write(f"Image streamer started. Access at: http://<your_ip_address>:{self.port}/stream.mjpg\n")
-        
+        if not started.wait(timeout=timeout):
+            self.stop()
+            raise TimeoutError(f"Image streamer did not start listening on port {self.port} within {timeout} s")
+        if self.start_error is not None:
+            self.running = False
+            raise self.start_error
+
+        self.encoder_thread = threading.Thread(target=self._encode_loop, name="JpegEncoder", daemon=True)
+        self.encoder_thread.start()
+        sys.stderr.write(f"Image streamer started. Access at: http://<your_ip_address>:{self.port}/stream.mjpg "
+                         f"(all feeds: /viewer.html)\n")
+
     def stop(self):
         """Stops the HTTP server."""
-        if self.http_server:
-            self.http_server.shutdown()
-            self.http_server.server_close()
+        with self.frame_cond:
+            self.running = False
+            self.frame_cond.notify_all()
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.server_thread.join(timeout=2.0)
             sys.stderr.write("Image streamer stopped.\n")
 
 def main():
@@ -117,7 +569,7 @@ def main():
         while True:
             # Get the frame using your function
             frame = WebcamMod.getImg()
-        
+
             thresholdImage = utils.thresholding(frame)
             h, w, c = frame.shape
             points = utils.initWarpPointsArray([15, 100, 100, 15])
@@ -133,4 +585,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
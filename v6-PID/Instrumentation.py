@@ -0,0 +1,125 @@
+"""
+Lightweight per-stage latency instrumentation for the control loop.
+
+Each tick records a monotonic timestamp at every stage it passes through
+(capture -> threshold -> warp -> error -> pid -> command -> stream, where 'command' is the steer
+command being posted to the actuator; the actuator thread keeps its own capture -> command -> motor
+record of when that command reached the motors). Ticks are written into a
+preallocated ring buffer, so the control thread never allocates or takes a lock; readers
+(the HTTP endpoint, dump()) take a copy and compute the histogram from that.
+"""
+
+import json
+import time
+
+import numpy as np
+
+STAGES = ('capture', 'threshold', 'warp', 'error', 'pid', 'command', 'stream')
+ACTUATOR_STAGES = ('capture', 'command', 'motor')
+
+# Histogram bin edges in milliseconds (roughly logarithmic, covers 10 us to 1 s)
+HISTOGRAM_EDGES_MS = (0, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float('inf'))
+
+
+class LatencyRecorder:
+    """
+    Ring buffer of per-tick stage timestamps.
+
+    Single writer: only the control loop calls start()/mark()/finish(). A finished tick is copied
+    into its ring slot before the tick counter is bumped, so readers only ever see complete rows
+    (except the slot being overwritten once the ring has wrapped, which snapshot() skips).
+
+    Args:
+        stages (tuple): Stage names in the order the loop passes through them; the first is the capture.
+        capacity (int): Number of ticks kept (the histogram window).
+    """
+    def __init__(self, stages=STAGES, capacity=2048):
+        self.stages = tuple(stages)
+        self.index = {name: i for i, name in enumerate(self.stages)}
+        self.capacity = capacity
+        self.samples = np.full((capacity, len(self.stages)), np.nan)
+        self.count = 0
+        self._row = np.full(len(self.stages), np.nan)
+
+    def start(self, capture_time=None):
+        """Begins a tick. Pass the frame's capture timestamp (time.monotonic()) if it is known."""
+        self._row.fill(np.nan)
+        self._row[0] = time.monotonic() if capture_time is None else capture_time
+
+    def mark(self, stage, timestamp=None):
+        """Records that `stage` just finished (or finished at `timestamp`, e.g. in another process)."""
+        self._row[self.index[stage]] = time.monotonic() if timestamp is None else timestamp
+
+    def finish(self):
+        """Publishes the current tick to the ring buffer."""
+        self.samples[self.count % self.capacity] = self._row
+        self.count += 1
+
+    def snapshot(self):
+        """Returns a copy of the recorded ticks, oldest first (one row per tick, one column per stage)."""
+        count = self.count
+        if count <= self.capacity:
+            return self.samples[:count].copy()
+        start = count % self.capacity
+        # Skip the oldest slot, which the writer may be overwriting right now
+        return np.concatenate((self.samples[start + 1:], self.samples[:start]))
+
+    def durations(self, rows=None):
+        """
+        Per-stage durations in milliseconds: the time since the previous stage that was recorded on the
+        same tick (NaN where a stage was skipped), plus 'glass_to_command' / 'glass_to_motor' columns
+        for the stages the recorder has.
+
+        Returns:
+            dict: stage name -> np.ndarray of durations.
+        """
+        rows = self.snapshot() if rows is None else rows
+        result = {}
+        # Carry the latest timestamp seen so far across the row so skipped stages don't break the chain
+        previous = np.maximum.accumulate(np.nan_to_num(rows, nan=-np.inf), axis=1)
+        for i, name in enumerate(self.stages[1:], start=1):
+            result[name] = (rows[:, i] - previous[:, i - 1]) * 1000.0
+        for end in ('command', 'motor'):
+            if end in self.index:
+                result['glass_to_' + end] = (rows[:, self.index[end]] - rows[:, 0]) * 1000.0
+        return result
+
+    def summary(self):
+        """Returns percentiles and a histogram for every stage over the ring window."""
+        stats = {}
+        for name, values in self.durations().items():
+            values = values[np.isfinite(values)]
+            if values.size == 0:
+                continue
+            counts, _ = np.histogram(values, bins=HISTOGRAM_EDGES_MS)
+            stats[name] = {
+                "n": int(values.size),
+                "mean_ms": float(values.mean()),
+                "p50_ms": float(np.percentile(values, 50)),
+                "p95_ms": float(np.percentile(values, 95)),
+                "p99_ms": float(np.percentile(values, 99)),
+                "max_ms": float(values.max()),
+                "histogram": counts.tolist(),
+            }
+        return {
+            "ticks": self.count,
+            "window": min(self.count, self.capacity),
+            "histogram_edges_ms": [e if e != float('inf') else None for e in HISTOGRAM_EDGES_MS],
+            "stages": stats,
+        }
+
+    def to_json(self):
+        return json.dumps(self.summary(), indent=2).encode()
+
+    def dump(self, path):
+        """
+        Writes the summary to `path` (JSON) and the raw per-tick durations next to it (.csv).
+        """
+        with open(path, "wb") as f:
+            f.write(self.to_json())
+
+        durations = self.durations()
+        names = list(durations)
+        table = np.column_stack([durations[n] for n in names]) if names else np.empty((0, 0))
+        csv_path = path.rsplit(".", 1)[0] + ".csv"
+        np.savetxt(csv_path, table, delimiter=",", header=",".join(names), comments="", fmt="%.4f")
@@ -1,28 +1,627 @@
 import cv2
 import numpy as np
+import sys
 import utils
+from PIDController import PIDController
 
+# Warp calibration for the 360x240 camera frame; these never change between frames
+WARP_POINTS = utils.initWarpPointsArray([76, 60, 15, 161])
 
-def getLaneCurve(img):
+# LanePipeline options shared by main.py, the perception process and replay.py. The tracker keeps
+# steering on the last position for a few frames when the lane drops out, instead of snapping to
+# straight ahead, and places the model's sample strip; the model reads the error `lookahead` of the
+# warped height beyond the ROI, so the controller sees a curve coming. Together they cost about
+# 0.15 ms more than the single ROI band centroid, still under half a full-frame warp (see benchmark.py)
+LANE_PIPELINE = dict(tracker=True, model=True, lookahead=0.2)
+
+
+def getLaneCurve(img, full_warp=True, roi_top=0.6, roi_bot=0.8):
     """
     Get Lane Curve
     --
     This module calculates the lane curve from an input image.
+
+    Args:
+        img (np.ndarray): Camera frame (BGR, grayscale or raw YUYV).
+        full_warp (bool): Warp the whole frame and return it. When False only the ROI band that
+                          get_lane_error_norm reads is thresholded and warped (about a fifth of the work),
+                          and None is returned in place of the warped image.
+        roi_top (float): Top of the ROI as a fraction of the warped image height.
+        roi_bot (float): Bottom of the ROI as a fraction of the warped image height.
+
+    Returns:
+        tuple: (normalized lane error, warped threshold image or None)
     """
-    thresholdImage = utils.thresholding(img)
+    h, w = img.shape[:2]
+    warp = utils.getWarp(WARP_POINTS, w, h)
 
-    h, w, c = img.shape
-    points = utils.initWarpPointsArray([76, 60, 15, 161])
-    imgWarp = utils.warpImg(thresholdImage, points, w, h)
+    if not full_warp:
+        band = warp.band(int(h * roi_top), int(h * roi_bot))
+        thresholdBand = utils.thresholding(band.crop(img))
+        imgBand = band.apply(thresholdBand)
+        return get_lane_error_norm(imgBand, roi_top=0.0, roi_bot=1.0), None
+
+    thresholdImage = utils.thresholding(img)
+    imgWarp = warp.apply(thresholdImage)
 
     # cv2.imshow('warp', imgWarp)
     # curve = check_white_pixels(threshodlImage)
-    curve = get_lane_error_norm(imgWarp)
+    curve = get_lane_error_norm(imgWarp, roi_top, roi_bot)
 
     # print(curve)
     return curve, imgWarp
 
 
+class LanePipeline:
+    """
+    Lane detection with preallocated, reusable buffers.
+
+    Does the same work as getLaneCurve, but every stage writes into a buffer owned by the pipeline
+    (thresholding and warpPerspective all get a dst=), and the ROI centroid is computed from a
+    preallocated column-sum buffer instead of cv2.moments. Once the buffers exist, a frame allocates nothing.
+
+    Args:
+        w (int): Frame width.
+        h (int): Frame height.
+        points (np.ndarray): Warp points (see utils.initWarpPointsArray).
+        roi_top (float): Top of the ROI as a fraction of the warped image height.
+        roi_bot (float): Bottom of the ROI as a fraction of the warped image height.
+        lower (int): Lower grayscale threshold for lane pixels.
+        upper (int): Upper grayscale threshold for lane pixels.
+        pixel_format (str): Format of the incoming frames ('bgr', 'gray' or 'yuyv', see utils.ThresholdEngine).
+        tracker (bool): Estimate the error with a LaneTracker (sliding windows tracked across frames,
+                        also giving heading and curvature) instead of the single-band centroid.
+        model (bool): Also fit a LaneModel every frame; while it has the lane, the returned error is
+                      its lateral position `lookahead` beyond the ROI.
+        lookahead (float): Look-ahead distance for the model's error, as a fraction of the warped height.
+    """
+    def __init__(self, w=360, h=240, points=WARP_POINTS, roi_top=0.6, roi_bot=0.8, lower=0, upper=100,
+                 pixel_format='bgr', tracker=False, model=False, lookahead=0.0):
+        self.w, self.h = w, h
+        self.threshold = utils.ThresholdEngine(lower, upper, pixel_format)
+        self.warp = utils.getWarp(points, w, h)
+        self.band = self.warp.band(int(h * roi_top), int(h * roi_bot))
+
+        # Full-frame buffers
+        self.gray = np.empty((h, w), dtype=np.uint8)
+        self.mask = np.empty((h, w), dtype=np.uint8)
+        self.warped = np.empty((h, w), dtype=np.uint8)
+
+        # ROI-only buffers (see utils.WarpBand)
+        rows, cols = self.band.src_slice
+        crop_shape = (rows.stop - rows.start, cols.stop - cols.start)
+        self.band_gray = np.empty(crop_shape, dtype=np.uint8)
+        self.band_mask = np.empty(crop_shape, dtype=np.uint8)
+        self.band_warped = np.empty((self.band.h, w), dtype=np.uint8)
+
+        # Centroid buffers
+        self.col_sums = np.empty(w, dtype=np.uint32)
+        self.xs = np.arange(w, dtype=np.float64)
+
+        # Frames of any other size are resized into this buffer first (see _fit_frame)
+        self.resized = None
+        self.resized_frames = 0
+
+        self.frames = 0
+        self.allocations = 0            # stage outputs that did not land in their preallocated buffer
+        self.allocations_last_frame = 0
+
+        self.tracker = LaneTracker(w, h, self.warp, self.threshold, error_rows=(roi_top, roi_bot)) if tracker else None
+        self.model = LaneModel(w, h, self.warp, self.threshold, error_rows=(roi_top, roi_bot)) if model else None
+        self.lookahead = lookahead
+
+        # Optional Instrumentation.LatencyRecorder; marks 'threshold', 'warp' and 'error' on each frame
+        self.timer = None
+
+    def _check(self, out, buf):
+        if out is not buf:
+            self.allocations_last_frame += 1
+        return out
+
+    def process(self, img, full_warp=True):
+        """
+        Runs one frame through the pipeline.
+
+        Args:
+            img (np.ndarray): Frame in the pipeline's pixel format, normally of shape (h, w, ...). Other
+                              sizes (e.g. a webcam that ignored the requested resolution) are resized
+                              to (h, w) first, since the warp points are calibrated for that size.
+            full_warp (bool): Produce the full warped image (otherwise only the ROI band is computed).
+
+        Returns:
+            tuple: (normalized lane error, warped threshold image or None).
+                   The returned image is an internal buffer that is overwritten by the next call.
+        """
+        self.allocations_last_frame = 0
+        timer = self.timer
+        if img.shape[:2] != (self.h, self.w):
+            img = self._fit_frame(img)
+
+        if full_warp:
+            mask = self._check(self.threshold.apply(img, dst=self.mask, gray=self.gray), self.mask)
+            if timer:
+                timer.mark('threshold')
+            warped = self._check(self.warp.apply(mask, dst=self.warped), self.warped)
+            if timer:
+                timer.mark('warp')
+            if self.tracker is not None:
+                error = self.tracker.update_warped(warped)
+            else:
+                error = self._centroid_error(warped[self.band.y0:self.band.y1])
+        elif self.tracker is not None:
+            # The tracker thresholds and warps only its windows (reported as the 'warp' stage)
+            warped = None
+            error = self.tracker.update(img)
+            if timer:
+                timer.mark('warp')
+        else:
+            mask = self._check(self.threshold.apply(self.band.crop(img), dst=self.band_mask, gray=self.band_gray),
+                               self.band_mask)
+            if timer:
+                timer.mark('threshold')
+            roi = self._check(self.band.apply(mask, dst=self.band_warped), self.band_warped)
+            warped = None
+            if timer:
+                timer.mark('warp')
+            error = self._centroid_error(roi)
+
+        if self.model is not None:
+            # The tracker follows fast lateral motion better than the model's own strip, so it places the strip
+            prior = self.tracker.coeffs if self.tracker is not None and self.tracker.tracking else None
+            if warped is not None:
+                self.model.update_warped(warped, prior)
+            else:
+                self.model.update(img, prior)
+            if self.model.tracking:
+                error = self.model.error(self.lookahead)
+        if timer:
+            timer.mark('error')
+
+        self.frames += 1
+        self.allocations += self.allocations_last_frame
+        return error, warped
+
+    def _fit_frame(self, img):
+        """Resizes a frame of the wrong size into the pipeline's buffer (warning on the first one)."""
+        shape = (self.h, self.w) + img.shape[2:]
+        if self.resized is None or self.resized.shape != shape:
+            if self.resized is None:
+                sys.stderr.write(f"LanePipeline: got {img.shape[1]}x{img.shape[0]} frames, expected "
+                                 f"{self.w}x{self.h}; resizing them (ask the camera for {self.w}x{self.h}).\n")
+            self.resized = np.empty(shape, dtype=img.dtype)
+        self.resized_frames += 1
+        # Raw YUYV gets its U/V samples blended too, but only the Y plane is read
+        return self._check(cv2.resize(img, (self.w, self.h), dst=self.resized, interpolation=cv2.INTER_LINEAR),
+                           self.resized)
+
+    def _centroid_error(self, roi, default=0.0):
+        """Same result as get_lane_error_norm on the ROI, without allocating image-sized temporaries."""
+        np.sum(roi, axis=0, dtype=np.uint32, out=self.col_sums)
+        m00 = int(self.col_sums.sum())
+        if m00 == 0:
+            return float(default)
+
+        cX = float(np.dot(self.col_sums, self.xs)) / m00
+        center = (self.w - 1) / 2.0
+        return max(-1.0, min(1.0, (cX - center) / center))
+
+    def measure_allocations(self, img, frames=100, full_warp=True):
+        """
+        Measures how many bytes numpy/OpenCV allocate per frame once the pipeline is warm.
+
+        Returns:
+            float: Average bytes allocated (and still alive at peak) per frame in the steady state.
+        """
+        import tracemalloc
+
+        self.process(img, full_warp)  # warm up
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        for _ in range(frames):
+            self.process(img, full_warp)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return (peak - before) / frames
+
+
+class LaneTracker:
+    """
+    Sliding-window lane estimator with temporal tracking.
+
+    The warped rows between roi_top and roi_bot are sampled once per frame by a single
+    nearest-neighbour warp of the camera frame at 1/scale resolution (a quarter of the pixels at
+    scale 2, plenty to find a tape line), thresholded, and split into `bands` stacked horizontal
+    bands whose column sums come out of one small matrix product. On the first frame (or after
+    losing the lane) the lane is found from the column histogram of the lower half of those bands,
+    then followed upwards band by band, each window re-centred on the lane pixels found in the band
+    below. While tracking, every band is only searched in a window of +-margin around where the lane
+    was in the previous frame (shifted by how far the band below moved). A window is a lookup into
+    running sums of the band's columns, so the windows themselves cost next to nothing.
+
+    Lane x positions are fitted with a polynomial in the distance ahead v (0 at the bottom of the
+    warped image, 1 at the top) in normalized units (-1 left edge, +1 right edge):
+        offset     lateral position at the middle of the error rows (same rows as the centroid)
+        heading    du/dv there (positive: the lane runs off to the right ahead)
+        curvature  d2u/dv2 (0 unless at least 3 bands found the lane)
+
+    Args:
+        w (int): Warped image width.
+        h (int): Warped image height.
+        warp (utils.Warp): Warp from camera frame to bird's-eye view.
+        threshold (utils.ThresholdEngine): Lane pixel threshold for camera frames.
+        roi_top (float): Top of the searched rows as a fraction of the warped image height.
+        roi_bot (float): Bottom of the searched rows.
+        bands (int): Number of stacked bands.
+        margin (int): Half-width of a tracking window in pixels.
+        min_pixels (int): Lane pixels a window needs for the lane to count as found in that band.
+        min_bands (int): Bands that must find the lane to stay tracking (otherwise search again).
+        error_rows (tuple): (top, bottom) rows as fractions of the height where the offset is measured.
+        hold_frames (int): Frames the last offset is held after losing the lane before reporting `default`.
+        scale (int): The searched rows are sampled every `scale` pixels in both directions.
+        max_coverage (float): A search only trusts its histogram peak if at most this fraction of the
+                              searched pixels are lane pixels (a tape line covers under 0.1; a covered
+                              lens or deep shadow makes everything "lane").
+        max_fill (float): A window more than this full of lane pixels does not count as finding the lane.
+    """
+    def __init__(self, w, h, warp, threshold, roi_top=0.2, roi_bot=1.0, bands=8, margin=30, min_pixels=40,
+                 min_bands=3, error_rows=(0.6, 0.8), hold_frames=5, scale=2, max_coverage=0.25, max_fill=0.9):
+        self.w, self.h = w, h
+        self.threshold = threshold
+        self.margin = margin
+        self.max_coverage = max_coverage
+        self.max_fill = max_fill
+        self.min_bands = min_bands
+        self.hold_frames = hold_frames
+        self.scale = scale
+        # Each sample stands for scale x scale warped pixels
+        self.min_samples = min_pixels / scale ** 2
+
+        y0, y1 = int(h * roi_top), int(h * roi_bot)
+        self.y0, self.y1 = y0, y1
+        edges = np.linspace(y0, y1, bands + 1).astype(int)
+        # Bottom band first: the lane is followed away from the car
+        self.rows = [(int(edges[i - 1]), int(edges[i])) for i in range(bands, 0, -1)]
+        centers = np.array([(a + b) / 2.0 for a, b in self.rows])
+        self.v = (h - centers) / h
+        self.v_error = 1.0 - (error_rows[0] + error_rows[1]) / 2.0
+        self.vander = np.stack([np.ones(bands), self.v, self.v ** 2], axis=1)
+        self.center = (w - 1) / 2.0
+
+        # One warp of the searched rows, straight to the sampled resolution: sample (r, j) is warped
+        # pixel (y0 + scale * r, scale * j), the same pixels update_warped() slices out of a full warp.
+        # Warping before thresholding means only the samples are thresholded, not the whole crop
+        self.band = warp.band(y0, y1, (w, h))
+        self.sample_matrix = np.diag([1.0 / scale, 1.0 / scale, 1.0]) @ self.band.matrix
+        shape = (len(range(y0, y1, scale)), len(range(0, w, scale)))
+        channels = {'bgr': (3,), 'yuyv': (2,), 'gray': ()}[threshold.pixel_format]
+        self._frame_samples = np.empty(shape + channels, dtype=np.uint8)
+        self._gray = np.empty(shape, dtype=np.uint8)
+        self._samples = np.empty(shape, dtype=np.uint8)
+        self._samples_f = np.empty(self._samples.shape, dtype=np.float32)
+        # Band membership of every sample row (bottom band first), scaled so a 255 sample counts as 1:
+        # the band column sums are then one small matrix product
+        sample_ys = y0 + scale * np.arange(self._samples.shape[0])
+        self._members = np.array([(sample_ys >= a) & (sample_ys < b) for a, b in self.rows],
+                                 dtype=np.float32) / 255
+        self._band_samples = (self._members.sum(axis=1) * 255).round().tolist()  # sample rows per band
+        self._xs = np.arange(0, w, scale, dtype=np.float32)
+        # Running sums along each band's columns: lane samples in rows 0..bands-1, x-weighted below
+        self._sums = np.zeros((2 * bands, len(self._xs)), dtype=np.float32)
+        self._cumulative = np.zeros((2 * bands, len(self._xs) + 1))
+        self._solvers = {}
+
+        self.positions = np.full(bands, np.nan)   # lane x per band (pixels) in the last frame, NaN if not found
+        self.tracking = False
+        self.coeffs = (0.0, 0.0, 0.0)             # polynomial of the last fit (u = c0 + c1 v + c2 v^2)
+        self.offset = self.heading = self.curvature = 0.0
+        self.frames_lost = 0
+        self.searches = 0
+        self.pixels = self._samples.size          # warped pixels computed per frame
+
+    def update(self, img, default=0.0):
+        """Estimates the lane from a camera frame, warping and thresholding only the sampled rows."""
+        frame_samples = cv2.warpPerspective(self.band.crop(img), self.sample_matrix, self._samples.shape[::-1],
+                                            dst=self._frame_samples, flags=cv2.INTER_NEAREST)
+        return self._estimate(self.threshold.apply(frame_samples, dst=self._samples, gray=self._gray), default)
+
+    def update_warped(self, warped, default=0.0):
+        """Estimates the lane from an already warped mask (e.g. the full warp the debug streams get)."""
+        return self._estimate(warped[self.y0:self.y1:self.scale, ::self.scale], default)
+
+    def _columns(self, samples):
+        """Lane samples per column of every band (bottom band first), and their running sums."""
+        bands = len(self.rows)
+        np.copyto(self._samples_f, samples)
+        sums = np.matmul(self._members, self._samples_f, out=self._sums[:bands])
+        np.multiply(sums, self._xs, out=self._sums[bands:])
+        np.cumsum(self._sums, axis=1, out=self._cumulative[:, 1:])
+        return sums
+
+    def _slide(self, predicted):
+        """Follows the lane up through the bands. Returns lane x per band (NaN where not found)."""
+        bands = len(self.rows)
+        cumulative = self._cumulative
+        # Windows are `width` samples wide, kept inside the image
+        width = min(-(-2 * self.margin // self.scale), len(self._xs))
+        last = len(self._xs) - width
+        to_sample = 1.0 / self.scale
+        band_samples = self._band_samples
+        found = [np.nan] * bands
+        shift = 0.0
+        # Plain Python numbers: per-band numpy calls would cost more than the arithmetic
+        for i, x in enumerate(predicted.tolist()):
+            j0 = max(0, min(last, int((x + shift - self.margin) * to_sample + 0.5)))
+            j1 = j0 + width
+            m00 = float(cumulative[i, j1] - cumulative[i, j0])
+            if self.min_samples <= m00 <= self.max_fill * width * band_samples[i]:
+                found[i] = float(cumulative[bands + i, j1] - cumulative[bands + i, j0]) / m00
+                shift = found[i] - x
+        return np.array(found)
+
+    def _search(self, sums):
+        """Column histogram over the lower half of the bands, then a slide from its peak."""
+        self.searches += 1
+        lower = max(1, len(self.rows) // 2)
+        histogram = sums[:lower].sum(axis=0)
+        searched = sum(self._band_samples[:lower]) * len(histogram)
+        if not 0 < histogram.sum() <= self.max_coverage * searched:
+            return np.full(len(self.rows), np.nan)
+        # Smooth over roughly a tape width so a single noisy column does not win
+        smooth = np.convolve(histogram, np.ones(max(1, 9 // self.scale)), mode='same')
+        if smooth.max() < 3 * smooth.mean():
+            return np.full(len(self.rows), np.nan)  # no distinct peak (e.g. a flat histogram)
+        peak = self.scale * int(np.argmax(smooth))
+        return self._slide(np.full(len(self.rows), float(peak)))
+
+    def _estimate(self, samples, default):
+        sums = self._columns(samples)
+        found = None
+        if self.tracking:
+            predicted = self.positions
+            lost = np.isnan(predicted)
+            if lost.any():
+                # Bands lost last frame are predicted from the fit
+                predicted = np.where(lost, self._fit_positions(), predicted)
+            found = self._slide(predicted)
+        if found is None or np.count_nonzero(found == found) < self.min_bands:
+            found = self._search(sums)
+
+        ok = found == found  # not NaN
+        count = int(np.count_nonzero(ok))
+        self.tracking = count >= self.min_bands
+        if not count:
+            self.positions = found
+            self.frames_lost += 1
+            if self.frames_lost > self.hold_frames:
+                self.offset, self.heading, self.curvature = float(default), 0.0, 0.0
+            return self.offset
+        self.frames_lost = 0
+        self.positions = found
+
+        u = (found[ok] - self.center) / self.center
+        c0, c1, c2 = self._solver(ok) @ u
+        self.coeffs = (c0, c1, c2)
+        self.offset = float(max(-1.0, min(1.0, c0 + c1 * self.v_error + c2 * self.v_error ** 2)))
+        self.heading = float(c1 + 2 * c2 * self.v_error)
+        self.curvature = float(2 * c2)
+        return self.offset
+
+    def _solver(self, ok):
+        """Least-squares solver (3 x found) for the bands that found the lane, cached per combination."""
+        key = ok.tobytes()
+        solver = self._solvers.get(key)
+        if solver is None:
+            degree = min(2, int(ok.sum()) - 1)
+            solver = np.zeros((3, int(ok.sum())))
+            solver[:degree + 1] = np.linalg.pinv(self.vander[ok, :degree + 1])
+            self._solvers[key] = solver
+        return solver
+
+    def _fit_positions(self):
+        c0, c1, c2 = self.coeffs
+        return (c0 + c1 * self.v + c2 * self.v ** 2) * self.center + self.center
+
+    def reset(self):
+        """Forgets the lane, so the next frame does a full search."""
+        self.tracking = False
+        self.positions[:] = np.nan
+        self.frames_lost = 0
+
+
+class LaneModel:
+    """
+    Second-order polynomial lane model, refitted every frame at a fixed cost.
+
+    The lane centre line is modelled as u = c0 + c1 v + c2 v^2 in the same normalized coordinates
+    as LaneTracker (u: -1 left edge .. +1 right edge, v: 0 at the bottom of the warped image .. 1 at
+    the top). Each frame samples at most `budget` warped pixels on `rows` fixed rows:
+
+    - while tracking, a +-gate pixel strip around the previous frame's curve (warm start);
+    - around a prior curve handed in by the caller instead (e.g. the LaneTracker's fit), when there is one;
+    - otherwise (first frame, lane lost) the full width with a column stride.
+
+    On its own the strip only follows the lane while it moves less than about `gate` pixels per frame;
+    pair the model with a LaneTracker for faster lateral motion.
+
+    Warped pixels are read straight from the camera frame through a precomputed nearest-neighbour
+    index table of the warp and thresholded in one call, so no image-sized work happens at all.
+    The lane pixels update exponentially weighted normal equations (older frames fade by `memory`
+    per frame) that are solved with a small ridge towards the previous coefficients, which keeps
+    the fit stable when only a few rows see the lane.
+
+    Args:
+        w (int): Warped (and camera) image width.
+        h (int): Warped (and camera) image height.
+        warp (utils.Warp): Warp from camera frame to bird's-eye view.
+        threshold (utils.ThresholdEngine): Lane pixel threshold for camera frames.
+        roi_top (float): Top of the sampled rows as a fraction of the warped image height.
+        roi_bot (float): Bottom of the sampled rows.
+        rows (int): Number of sampled rows.
+        budget (int): Maximum pixels sampled per frame.
+        gate (int): Half-width in pixels of the strip sampled around the previous curve.
+        memory (float): Weight of the previous frames' normal equations (0: fit each frame on its own).
+        ridge (float): Pull towards the previous coefficients, relative to one sampled row of lane pixels.
+        min_pixels (int): Lane pixels needed for a frame to update the fit.
+        error_rows (tuple): (top, bottom) rows as fractions of the height where the offset is measured.
+        hold_frames (int): Frames the fit is kept without enough lane pixels before it is dropped.
+        max_coverage (float): Largest fraction of lane pixels a full-width search may find (more means
+                              a dark or shadowed frame, not a tape line).
+        max_fill (float): Largest fraction of lane pixels in the strip around a curve.
+    """
+    def __init__(self, w, h, warp, threshold, roi_top=0.2, roi_bot=1.0, rows=16, budget=1024, gate=24,
+                 memory=0.2, ridge=0.5, min_pixels=30, error_rows=(0.6, 0.8), hold_frames=5,
+                 max_coverage=0.25, max_fill=0.9):
+        self.w, self.h = w, h
+        self.threshold = threshold
+        self.max_coverage = max_coverage
+        self.max_fill = max_fill
+        self.memory = memory
+        self.ridge = ridge
+        self.min_pixels = min_pixels
+        self.hold_frames = hold_frames
+        self.center = (w - 1) / 2.0
+        self.v_error = 1.0 - (error_rows[0] + error_rows[1]) / 2.0
+        self.gate = gate
+
+        self.ys = np.linspace(h * roi_top, h * roi_bot - 1, rows).round().astype(np.intp)
+        self.v = (h - self.ys) / h
+        self.v_powers = np.stack([self.v ** k for k in range(5)])
+        self.row_starts = self.ys * w
+        per_row = max(1, budget // rows)
+        # Strip offsets around the curve, and the full-width search grid (both within the budget)
+        self.offsets = np.unique(np.linspace(-gate, gate, min(2 * gate + 1, per_row)).round().astype(np.intp))
+        self.strip_rows = np.repeat(np.arange(rows), len(self.offsets))
+        search_xs = np.unique(np.linspace(0, w - 1, min(w, per_row)).round().astype(np.intp))
+        self.search_rows = np.repeat(np.arange(rows), len(search_xs))
+        self.search_index = (self.row_starts[:, None] + search_xs).ravel()
+
+        # Nearest-neighbour warp as a lookup: warped (y, x) -> flat camera pixel index (-1 outside the frame)
+        xs, ys = np.meshgrid(np.arange(w, dtype=np.float32), np.arange(h, dtype=np.float32))
+        src = cv2.perspectiveTransform(np.stack([xs, ys], axis=-1).reshape(-1, 1, 2),
+                                       np.linalg.inv(warp.matrix)).reshape(h, w, 2)
+        sx, sy = np.rint(src[..., 0]).astype(np.int64), np.rint(src[..., 1]).astype(np.int64)
+        inside = (sx >= 0) & (sx < w) & (sy >= 0) & (sy < h)
+        self.source_index = np.where(inside, sy * w + sx, -1).astype(np.intp).ravel()
+
+        self.normal = np.zeros((3, 3))
+        self.rhs = np.zeros(3)
+        self.coeffs = np.zeros(3)
+        self.tracking = False
+        self.frames_lost = 0
+        self.pixels = 0             # pixels sampled in the last frame
+        self.lane_pixels = 0        # lane pixels among them
+
+    @property
+    def offset(self):
+        """Lateral lane position at the error rows."""
+        return self.error()
+
+    @property
+    def heading(self):
+        """du/dv at the error rows (positive: the lane runs off to the right ahead)."""
+        c0, c1, c2 = self.coeffs
+        return float(c1 + 2 * c2 * self.v_error)
+
+    @property
+    def curvature(self):
+        """d2u/dv2 of the lane."""
+        return float(2 * self.coeffs[2])
+
+    def error(self, lookahead=0.0):
+        """Lateral lane position `lookahead` (fraction of the warped height) beyond the error rows, in [-1, 1]."""
+        v = self.v_error + lookahead
+        c0, c1, c2 = self.coeffs
+        return float(max(-1.0, min(1.0, c0 + c1 * v + c2 * v * v)))
+
+    def _sample_points(self, prior):
+        """Sample grid for this frame: (row number, flat warped pixel index) per sample."""
+        coeffs = prior if prior is not None else self.coeffs if self.tracking else None
+        if coeffs is None:
+            return self.search_rows, self.search_index
+        # Strip centres are kept far enough from the edges that the whole strip stays on its row
+        curve = self.v_powers[:3].T @ np.asarray(coeffs, dtype=np.float64) * self.center + self.center
+        starts = self.row_starts + np.clip(curve, self.gate, self.w - 1 - self.gate).astype(np.intp)
+        return self.strip_rows, (starts[:, None] + self.offsets).ravel()
+
+    def update(self, img, prior=None):
+        """
+        Refits the model on a camera frame (in the threshold engine's pixel format).
+
+        Args:
+            prior (tuple): (c0, c1, c2) to sample around instead of the model's own fit (e.g. LaneTracker.coeffs).
+        Returns:
+            bool: Whether the lane was found.
+        """
+        rows, flat = self._sample_points(prior)
+        index = self.source_index.take(flat)
+        # The sampled pixels as an (n, 1) image, so the threshold engine handles every pixel format
+        pixels = img.reshape((self.h * self.w,) + img.shape[2:]).take(index, axis=0).reshape((len(index), 1) + img.shape[2:])
+        lane = (self.threshold.apply(pixels).ravel() > 0) & (index >= 0)
+        return self._fit(rows[lane], flat[lane], len(index), prior)
+
+    def update_warped(self, warped, prior=None):
+        """Refits the model on an already warped mask."""
+        rows, flat = self._sample_points(prior)
+        lane = warped.reshape(-1).take(flat) > 0
+        return self._fit(rows[lane], flat[lane], len(flat), prior)
+
+    def _fit(self, rows, flat, sampled, prior):
+        self.pixels = sampled
+        self.lane_pixels = n = len(flat)
+        searched = not self.tracking and prior is None
+        if n < self.min_pixels or n > (self.max_coverage if searched else self.max_fill) * sampled:
+            self.frames_lost += 1
+            if self.frames_lost > self.hold_frames:
+                self.reset()
+            return False
+
+        # Every sample on a row shares its v, so the normal equations only need per-row sums
+        count = np.bincount(rows, minlength=len(self.ys))
+        x_sum = np.bincount(rows, weights=flat - self.row_starts.take(rows), minlength=len(self.ys))
+        s0, s1, s2, s3, s4 = self.v_powers @ count
+        t0, t1, t2 = self.v_powers[:3] @ ((x_sum - count * self.center) / self.center)
+        normal = np.array([[s0, s1, s2], [s1, s2, s3], [s2, s3, s4]])
+        rhs = np.array([t0, t1, t2])
+
+        if self.tracking:
+            self.normal = self.memory * self.normal + normal
+            self.rhs = self.memory * self.rhs + rhs
+            previous = self.coeffs
+        else:
+            self.normal, self.rhs = normal, rhs
+            previous = np.zeros(3) if prior is None else np.asarray(prior, dtype=np.float64)
+        # Ridge towards the previous curve, weighted like roughly one sampled row of lane pixels
+        ridge = self.ridge * n / len(self.ys)
+        self.coeffs = _solve3(self.normal + ridge * np.eye(3), self.rhs + ridge * previous)
+        self.tracking = True
+        self.frames_lost = 0
+        return True
+
+    def reset(self):
+        """Drops the fit, so the next frame searches the full width."""
+        self.normal[:] = 0
+        self.rhs[:] = 0
+        self.coeffs = np.zeros(3)
+        self.tracking = False
+        self.frames_lost = 0
+
+
+def _solve3(a, b):
+    """Solves a 3x3 linear system by Cramer's rule (np.linalg.solve costs more than the arithmetic here)."""
+    (a00, a01, a02), (a10, a11, a12), (a20, a21, a22) = a.tolist()
+    b0, b1, b2 = b.tolist()
+    m0 = a11 * a22 - a12 * a21
+    m1 = a10 * a22 - a12 * a20
+    m2 = a10 * a21 - a11 * a20
+    det = a00 * m0 - a01 * m1 + a02 * m2
+    return np.array([
+        (b0 * m0 - a01 * (b1 * a22 - a12 * b2) + a02 * (b1 * a21 - a11 * b2)) / det,
+        (a00 * (b1 * a22 - a12 * b2) - b0 * m1 + a02 * (a10 * b2 - b1 * a20)) / det,
+        (a00 * (a11 * b2 - b1 * a21) - a01 * (a10 * b2 - b1 * a20) + b0 * m2) / det,
+    ])
+
+
 def get_lane_error(thresholded_img):
     """
     Calculates the horizontal error from the center of the lane using the centroid method.
@@ -135,8 +734,10 @@ def check_white_pixels(frame):
 
 
 
-previous_error = 0.0
-integral = 0.0
+# Controller behind PID_control (kept for older scripts; new code should own a PIDController)
+_pid = PIDController(kp=0.9, ki=0.1, kd=0.1, integral_limit=2.0)
+
+
 def PID_control(error_value: float, dt: float = 0.05, reset: bool = False) -> float:
     """
     PID on a normalized error in [-1, 1]. Returns steering in [-1, 1].
@@ -149,41 +750,9 @@ def PID_control(error_value: float, dt: float = 0.05, reset: bool = False) -> fl
     Returns:
         float: steering command in [-1, 1]
     """
-    import math
-    global previous_error, integral
-
     if reset:
-        print("reset")
-        previous_error = 0.0
-        integral = 0.0
-
-    # --- Tunable gains (normalized units) ---
-    Kp = 0.9
-
-    Ki = 0.1
-    
-    Kd = 0.1
-
-    # --- Proportional ---
-    P = error_value
-
-    # --- Integral (with anti-windup clamp) ---
-    integral += error_value * dt
-    I_MAX = 2.0  # adjust as needed
-    integral = max(-I_MAX, min(I_MAX, integral))
-    I = integral
-
-    # --- Derivative (simple form; consider filtering if noisy) ---
-    D = (error_value - previous_error) / dt if dt > 0 else 0.0
-
-    # PID sum
-    u = Kp * P + Ki * I + Kd * D
-
-    # Save state
-    previous_error = error_value
-
-    # Clamp output to actuator range
-    return max(-1.0, min(1.0, u))
+        _pid.reset()
+    return _pid.update(error_value, dt)
 
  
 
@@ -0,0 +1,115 @@
+"""
+Fixed-rate scheduler for the perception -> PID -> motor control loop.
+"""
+
+import sys
+import time
+
+
+class LoopScheduler:
+    """
+    Runs a tick function at a fixed target rate using deadline-based sleeps.
+
+    Deadlines advance by exactly one period per tick, so sleep overshoot does not accumulate into drift.
+    When a tick runs past its deadline it is counted as an overrun and the missed deadlines are
+    dropped (the loop never tries to "catch up" with a burst of back-to-back ticks).
+
+    Args:
+        rate_hz (float): Target loop frequency.
+        perception_every (int): Only run perception on every Nth tick (actuation still runs every tick).
+        skip_perception_on_overrun (bool): Skip perception on the tick after an overrun to get back on schedule.
+        log_interval (float): Minimum seconds between overrun log lines.
+        name (str): Shown in the overrun log lines and stats, to tell several schedulers apart.
+    """
+    def __init__(self, rate_hz=30.0, perception_every=1, skip_perception_on_overrun=True, log_interval=5.0,
+                 name='loop'):
+        self.name = name
+        self.rate_hz = rate_hz
+        self.period = 1.0 / rate_hz
+        self.perception_every = max(1, int(perception_every))
+        self.skip_perception_on_overrun = skip_perception_on_overrun
+        self.log_interval = log_interval
+
+        self.ticks = 0
+        self.overruns = 0
+        self.missed_deadlines = 0
+        self.perception_skips = 0
+        self.max_overrun = 0.0
+        self._overran = False
+        self._last_log = 0.0
+        self._last_tick = None
+        self.running = False
+
+    def run(self, tick, duration=None):
+        """
+        Calls tick(dt, perceive) at the target rate until stop() is called or `duration` seconds pass.
+
+        Args:
+            tick (callable): Receives the measured seconds since the previous tick started, and whether
+                             perception should run on this tick.
+            duration (float): Optional run time in seconds.
+        """
+        self.running = True
+        start = time.monotonic()
+        deadline = start
+
+        while self.running:
+            now = time.monotonic()
+            if duration is not None and now - start >= duration:
+                break
+            # Measured dt; the very first tick (or the first after a pause) assumes one nominal period
+            dt = now - self._last_tick if self._last_tick is not None else self.period
+            self._last_tick = now
+
+            perceive = self.ticks % self.perception_every == 0
+            if perceive and self._overran and self.skip_perception_on_overrun:
+                perceive = False
+            if not perceive:
+                self.perception_skips += 1
+
+            tick(dt, perceive)
+            self.ticks += 1
+
+            deadline += self.period
+            now = time.monotonic()
+            late = now - deadline
+            if late > 0:
+                self._overran = True
+                self.overruns += 1
+                self.max_overrun = max(self.max_overrun, late)
+                # Drop every deadline we already missed, keeping the original phase
+                missed = int(late // self.period) + 1
+                self.missed_deadlines += missed - 1
+                deadline += missed * self.period
+                self._log_overrun(late, now)
+            else:
+                self._overran = False
+            time.sleep(max(0.0, deadline - time.monotonic()))
+
+        self.running = False
+
+    def stop(self):
+        """Makes run() return after the current tick."""
+        self.running = False
+
+    def reset_timing(self):
+        """Forget the last tick time, e.g. after the loop was paused, so the next dt is not inflated."""
+        self._last_tick = None
+
+    def _log_overrun(self, late, now):
+        if now - self._last_log >= self.log_interval:
+            self._last_log = now
+            sys.stderr.write(f"Loop overrun ({self.name}): {late * 1000:.1f} ms late "
+                             f"({self.overruns} overruns in {self.ticks} ticks, "
+                             f"max {self.max_overrun * 1000:.1f} ms)\n")
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "rate_hz": self.rate_hz,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "missed_deadlines": self.missed_deadlines,
+            "perception_skips": self.perception_skips,
+            "max_overrun_ms": self.max_overrun * 1000,
+        }
@@ -2,32 +2,54 @@
 This module handles the motor control for the robot.
 
 It also provides you with manual robot control functionality.
-To use this feature, run this file as a script.
+To use this feature, run this file as a script (add --gpio=pigpio|lgpio|rpi|sim to pick the GPIO backend).
 """
 
-import RPi.GPIO as GPIO
 import curses
 import time
 
+from GPIOBackends import backend_from_args, get_backend
+
 class MotorController():
     """
     MOTOR CONTROL
     --
     This method contains functions to move the car in different directions
+
+    The controller keeps a shadow copy of the duty cycles and pin levels it last wrote and only
+    calls into the GPIO library when a value actually changes (the control loop mostly repeats
+    itself), so it assumes nothing else drives these pins. `writes` counts the calls that reached
+    the GPIO library, `writes_skipped` the ones the shadow state saved.
+
+    Args:
+        gpio: GPIO backend name ('auto', 'rpi', 'pigpio', 'lgpio', 'sim') or an object with the
+              RPi.GPIO API (see GPIOBackends).
+        pwm_frequency (int): PWM carrier frequency on the enable pins in Hz. RPi.GPIO generates it in
+              a software thread (keep it low there); with gpio='pigpio' it is DMA/hardware timed,
+              so a carrier of 1-20 kHz (quieter, smoother motors) costs no CPU.
     """
 
     # Initialize Pin Setup
-    def __init__(self, leftMotors, rightMotors, leftBias=1, rightBias=1):
+    def __init__(self, leftMotors, rightMotors, leftBias=1, rightBias=1, gpio='auto', pwm_frequency=100):
         self.leftMotorsEnable, self.leftMotorsForward, self.leftMotorsReverse = leftMotors
         self.rightMotorsEnable, self.rightMotorsForward, self.rightMotorsReverse = rightMotors
 
         self.leftBias = leftBias
         self.rightBias = rightBias
 
+        self.gpio = get_backend(gpio) if isinstance(gpio, str) else gpio
+        self.pwmFrequency = pwm_frequency
+
+        self.writes = 0
+        self.writes_skipped = 0
+        self.dutyShadow = {}    # PWM object -> last duty cycle written
+        self.levelShadow = {}   # pin -> last level written
+
         self.setup()
 
     # Sets the pinmode as well as the output pins
     def setup(self):
+        GPIO = self.gpio
         GPIO.setmode(GPIO.BCM)
         GPIO.setwarnings(False) # Disable GPIO warnings
 
@@ -39,67 +61,84 @@ class MotorController():
         GPIO.setup(self.rightMotorsForward, GPIO.OUT)
         GPIO.setup(self.rightMotorsReverse, GPIO.OUT)
 
-        self.leftMotorsPWM = GPIO.PWM(self.leftMotorsEnable, 100);
-        self.rightMotorsPWM = GPIO.PWM(self.rightMotorsEnable, 100);
+        self.leftMotorsPWM = GPIO.PWM(self.leftMotorsEnable, self.pwmFrequency);
+        self.rightMotorsPWM = GPIO.PWM(self.rightMotorsEnable, self.pwmFrequency);
 
         self.rightMotorsPWM.start(0);
         self.leftMotorsPWM.start(0);
+        self.dutyShadow = {self.leftMotorsPWM: 0, self.rightMotorsPWM: 0}
+        self.levelShadow = {}
+
+    # Changes the PWM carrier frequency on both enable pins
+    def setPwmFrequency(self, frequency):
+        self.pwmFrequency = frequency
+        self.leftMotorsPWM.ChangeFrequency(frequency)
+        self.rightMotorsPWM.ChangeFrequency(frequency)
+
+    # Writes a duty cycle unless it is already the one on the pin
+    def setDuty(self, pwm, dutyCycle):
+        dutyCycle = int(dutyCycle)
+        if self.dutyShadow.get(pwm) == dutyCycle:
+            self.writes_skipped += 1
+            return
+        pwm.ChangeDutyCycle(dutyCycle)
+        self.dutyShadow[pwm] = dutyCycle
+        self.writes += 1
+
+    # Sets a direction pin unless it is already at that level
+    def setPin(self, pin, level):
+        level = bool(level)
+        if self.levelShadow.get(pin) == level:
+            self.writes_skipped += 1
+            return
+        self.gpio.output(pin, level)
+        self.levelShadow[pin] = level
+        self.writes += 1
+
+    # Sets all four direction pins
+    def setDirection(self, leftForward, leftReverse, rightForward, rightReverse):
+        self.setPin(self.leftMotorsForward, leftForward)
+        self.setPin(self.leftMotorsReverse, leftReverse)
+        self.setPin(self.rightMotorsForward, rightForward)
+        self.setPin(self.rightMotorsReverse, rightReverse)
 
     # Moves all wheels forward
     def moveForward(self, speed=50):
         dutyCycle = int(speed * self.leftBias)
-        self.leftMotorsPWM.ChangeDutyCycle(dutyCycle)
-        self.rightMotorsPWM.ChangeDutyCycle(speed)
+        self.setDuty(self.leftMotorsPWM, dutyCycle)
+        self.setDuty(self.rightMotorsPWM, speed)
 
-        GPIO.output(self.leftMotorsForward, True)
-        GPIO.output(self.leftMotorsReverse, False)
-        GPIO.output(self.rightMotorsForward, True)
-        GPIO.output(self.rightMotorsReverse, False)
+        self.setDirection(True, False, True, False)
 
     # Moves all wheels in reverse
     def moveReverse(self, speed=50):
         dutyCycle = int(speed * self.leftBias)
-        self.leftMotorsPWM.ChangeDutyCycle(dutyCycle)
-        self.rightMotorsPWM.ChangeDutyCycle(int(speed*self.rightBias))
+        self.setDuty(self.leftMotorsPWM, dutyCycle)
+        self.setDuty(self.rightMotorsPWM, int(speed*self.rightBias))
 
-        GPIO.output(self.leftMotorsForward, False)
-        GPIO.output(self.leftMotorsReverse, True)
-        GPIO.output(self.rightMotorsForward, False)
-        GPIO.output(self.rightMotorsReverse, True)
+        self.setDirection(False, True, False, True)
 
     # Turns left on the spot (zero-point turn)
     def turnLeft(self, speed=50):
         dutyCycle = int(speed * self.leftBias)
-        self.leftMotorsPWM.ChangeDutyCycle(dutyCycle)
-        self.rightMotorsPWM.ChangeDutyCycle(int(speed*self.rightBias))
+        self.setDuty(self.leftMotorsPWM, dutyCycle)
+        self.setDuty(self.rightMotorsPWM, int(speed*self.rightBias))
 
         # Left motors reverse, Right motors forward
-        GPIO.output(self.leftMotorsForward, False)
-        GPIO.output(self.leftMotorsReverse, True)
-        GPIO.output(self.rightMotorsForward, True)
-        GPIO.output(self.rightMotorsReverse, False)
+        self.setDirection(False, True, True, False)
 
     # Turns right on the spot (zero-point turn)
     def turnRight(self, speed=50):
         dutyCycle = int(speed * self.leftBias)
-        self.leftMotorsPWM.ChangeDutyCycle(dutyCycle)
-        self.rightMotorsPWM.ChangeDutyCycle(int(speed*self.rightBias))
+        self.setDuty(self.leftMotorsPWM, dutyCycle)
+        self.setDuty(self.rightMotorsPWM, int(speed*self.rightBias))
 
         # Left motors forward, Right motors reverse
-        GPIO.output(self.leftMotorsForward, True)
-        GPIO.output(self.leftMotorsReverse, False)
-        GPIO.output(self.rightMotorsForward, False)
-        GPIO.output(self.rightMotorsReverse, True)
+        self.setDirection(True, False, False, True)
 
-    def steer(self, speed, steering_input):
-        """
-        Steers the car by adjusting the speed of the left and right motors.
-        
-        Args:
-            speed (int): The base forward speed (0-100).
-            steering_input (float): A value between -1.0 (full left) and 1.0 (full right).
-                                    0.0 means straight.
-        """
+    # Differential wheel speeds (0-100) for a base speed and a steering input in [-1, 1]
+    @staticmethod
+    def steerSpeeds(speed, steering_input):
         # Ensure steering_input is within valid range
         steering_input = max(-1.0, min(1.0, steering_input))
 
@@ -112,27 +151,42 @@ class MotorController():
         # Clamp speeds to 0-100
         left_speed = max(0, min(100, left_speed))
         right_speed = max(0, min(100, right_speed))
+        return left_speed, right_speed
 
-        self.leftMotorsPWM.ChangeDutyCycle(int(left_speed * self.leftBias))
-        self.rightMotorsPWM.ChangeDutyCycle(int(right_speed * self.rightBias))
+    def steer(self, speed, steering_input):
+        """
+        Steers the car by adjusting the speed of the left and right motors.
+        
+        Args:
+            speed (int): The base forward speed (0-100).
+            steering_input (float): A value between -1.0 (full left) and 1.0 (full right).
+                                    0.0 means straight.
+        """
+        left_speed, right_speed = self.steerSpeeds(speed, steering_input)
+        self.drive(left_speed, right_speed)
 
-        # Always move forward
-        GPIO.output(self.leftMotorsForward, True)
-        GPIO.output(self.leftMotorsReverse, False)
-        GPIO.output(self.rightMotorsForward, True)
-        GPIO.output(self.rightMotorsReverse, False)
+    def drive(self, left_speed, right_speed):
+        """
+        Drives each side at its own signed speed (-100 to 100, negative is reverse).
+        Only changed values reach the hardware; a steady command costs no GPIO calls at all.
+        """
+        self.setDuty(self.leftMotorsPWM, int(min(100, abs(left_speed)) * self.leftBias))
+        self.setDuty(self.rightMotorsPWM, int(min(100, abs(right_speed)) * self.rightBias))
+        self.setDirection(left_speed >= 0, left_speed < 0, right_speed >= 0, right_speed < 0)
 
     # Stops all wheels
     def stop(self):
-        self.leftMotorsPWM.ChangeDutyCycle(0)
-        self.rightMotorsPWM.ChangeDutyCycle(0)
+        self.setDuty(self.leftMotorsPWM, 0)
+        self.setDuty(self.rightMotorsPWM, 0)
 
     # Clears all setup on pins
     def exit(self):
         self.stop()
-        GPIO.cleanup()
+        self.gpio.cleanup()
+        self.dutyShadow = {}
+        self.levelShadow = {}
 
-def main(stdscr):
+def main(stdscr, gpio='auto'):
     # Curses setup for real-time keyboard input
     curses.curs_set(0)  # Hide the cursor
     stdscr.nodelay(1)   # Don't block waiting for a key press
@@ -147,7 +201,7 @@ def main(stdscr):
     RIGHT_MOTORS = (22, 27, 17) # Example: (EN_B, IN3, IN4)
     
     # Initialize the robot
-    robot = MotorController(leftMotors=LEFT_MOTORS, rightMotors=RIGHT_MOTORS)
+    robot = MotorController(leftMotors=LEFT_MOTORS, rightMotors=RIGHT_MOTORS, gpio=gpio)
     speed = 75  # Default speed (0-100)
 
     # Display control instructions
@@ -208,11 +262,12 @@ def main(stdscr):
     robot.exit()
 
 if __name__ == "__main__":
+    gpio = get_backend(backend_from_args())
     try:
-        curses.wrapper(main)
+        curses.wrapper(main, gpio)
     except Exception as e:
         # This will run if curses fails to initialize, ensuring GPIO cleanup
         print("An error occurred. Cleaning up GPIO.")
-        GPIO.setmode(GPIO.BCM)
-        GPIO.cleanup()
+        gpio.setmode(gpio.BCM)
+        gpio.cleanup()
         print(f"Error: {e}")
\ No newline at end of file
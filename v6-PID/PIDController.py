@@ -0,0 +1,196 @@
+"""
+PID controller for the steering loop.
+
+PIDController.update() runs one step for the live loop; update_many() runs the same controller
+over numpy arrays of error traces (many traces at once, optionally with a different gain per
+trace), for offline replay and gain sweeps.
+"""
+
+import math
+import time
+
+import numpy as np
+
+ANTI_WINDUP = ('clamp', 'conditional', 'back_calculation', 'none')
+
+# Steering controller settings shared by main.py and replay.py: the derivative is low-pass filtered
+# (lane error is noisy frame to frame) and taken on the measurement, so re-enabling the motors does
+# not kick the steering
+STEERING_PID = dict(kp=0.9, ki=0.1, kd=0.1, integral_limit=2.0, derivative_tau=0.05, derivative_on_measurement=True)
+
+
+class PIDController:
+    """
+    PID with measured dt, a low-pass filtered derivative and a choice of anti-windup.
+
+    The derivative is skipped on the first update after reset() (no kick from stale state).
+
+    Args:
+        kp, ki, kd (float): Gains (scalars, or arrays of one gain per trace for update_many).
+        setpoint (float): Target of the measurement (error = setpoint - measurement).
+        output_limits (tuple): (low, high) the output is clamped to, or None.
+        anti_windup (str): How the integral is kept from winding up while the output saturates:
+            'clamp'            integral clamped to +-integral_limit
+            'conditional'      stop integrating while saturated and the error pushes further out
+            'back_calculation' bleed the integral by tracking_gain * (saturated - raw output)
+            'none'             plain integral
+        integral_limit (float): Bound for the 'clamp' strategy.
+        tracking_gain (float): Back-calculation gain in 1/s (default 1/ki).
+        derivative_tau (float): Time constant of the derivative low-pass filter in seconds (0: unfiltered).
+        derivative_on_measurement (bool): Differentiate the measurement instead of the error, so a
+            setpoint change does not kick the output.
+        default_dt (float): dt of the first update() when it is not passed in.
+    """
+    __slots__ = ('kp', 'ki', 'kd', 'setpoint', 'output_limits', 'anti_windup', 'integral_limit',
+                 'tracking_gain', 'derivative_tau', 'derivative_on_measurement', 'default_dt',
+                 'integral', 'derivative', 'previous_error', 'previous_measurement', 'last_time', 'output')
+
+    def __init__(self, kp=0.9, ki=0.1, kd=0.1, setpoint=0.0, output_limits=(-1.0, 1.0), anti_windup='clamp',
+                 integral_limit=2.0, tracking_gain=None, derivative_tau=0.0, derivative_on_measurement=False,
+                 default_dt=0.05):
+        if anti_windup not in ANTI_WINDUP:
+            raise ValueError(f"Unknown anti_windup {anti_windup!r} (expected one of {ANTI_WINDUP})")
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.setpoint = setpoint
+        self.output_limits = output_limits if output_limits is not None else (-math.inf, math.inf)
+        self.anti_windup = anti_windup
+        self.integral_limit = integral_limit
+        self.tracking_gain = tracking_gain
+        self.derivative_tau = derivative_tau
+        self.derivative_on_measurement = derivative_on_measurement
+        self.default_dt = default_dt
+        self.reset()
+
+    def reset(self):
+        """Zeroes the integral and derivative state."""
+        self.integral = 0.0
+        self.derivative = 0.0
+        self.previous_error = None
+        self.previous_measurement = None
+        self.last_time = None
+        self.output = 0.0
+
+    def update(self, error, dt=None, measurement=None):
+        """
+        Runs one step.
+
+        Args:
+            error (float): setpoint - measurement (e.g. the normalized lane error).
+            dt (float): Seconds since the previous update; measured with time.monotonic() if None.
+            measurement (float): The measured value (defaults to setpoint - error); only needed
+                                 for derivative_on_measurement with a moving setpoint.
+        Returns:
+            float: The clamped controller output.
+        """
+        now = time.monotonic()
+        if dt is None:
+            dt = now - self.last_time if self.last_time is not None else self.default_dt
+        self.last_time = now
+        if measurement is None:
+            measurement = self.setpoint - error
+
+        # Derivative
+        if dt <= 0 or self.previous_error is None:
+            raw = 0.0
+        elif self.derivative_on_measurement:
+            raw = -(measurement - self.previous_measurement) / dt
+        else:
+            raw = (error - self.previous_error) / dt
+        if self.derivative_tau > 0 and self.previous_error is not None:
+            self.derivative += dt / (self.derivative_tau + dt) * (raw - self.derivative)
+        else:
+            self.derivative = raw
+        self.previous_error = error
+        self.previous_measurement = measurement
+
+        # Integral + output
+        low, high = self.output_limits
+        integral = self.integral + error * dt
+        if self.anti_windup == 'clamp':
+            integral = max(-self.integral_limit, min(self.integral_limit, integral))
+        u = self.kp * error + self.ki * integral + self.kd * self.derivative
+        output = max(low, min(high, u))
+
+        if self.anti_windup == 'conditional' and output != u and error * u > 0:
+            integral = self.integral
+            u = self.kp * error + self.ki * integral + self.kd * self.derivative
+            output = max(low, min(high, u))
+        elif self.anti_windup == 'back_calculation':
+            tracking = self.tracking_gain if self.tracking_gain is not None else (1.0 / self.ki if self.ki else 0.0)
+            integral += tracking * (output - u) * dt
+
+        self.integral = integral
+        self.output = output
+        return output
+
+    def update_many(self, errors, dts=None, measurements=None):
+        """
+        Runs fresh copies of this controller (reset state, same settings) over whole error traces.
+        This controller's own state is not touched.
+
+        Args:
+            errors (np.ndarray): (steps,) for one trace or (traces, steps) for many.
+            dts (np.ndarray): dt per step: scalar, (steps,) or (traces, steps) (default_dt if None).
+            measurements (np.ndarray): Same shape as errors (defaults to setpoint - errors).
+        Returns:
+            np.ndarray: Outputs, (steps,) or (traces, steps).
+
+        Gains may be arrays of shape (traces,) to evaluate one gain set per trace; a single trace
+        with array gains is run once per gain set (a gain sweep), giving (gains, steps) outputs.
+        """
+        single = np.ndim(errors) == 1
+        errors = np.atleast_2d(np.asarray(errors, dtype=np.float64))
+        gains = [np.asarray(g, dtype=np.float64) for g in (self.kp, self.ki, self.kd)]
+        # One trace against an array of gains is swept over every gain set
+        traces = np.broadcast_shapes(errors.shape[:1], *(g.shape for g in gains))[0]
+        steps = errors.shape[1]
+        if measurements is None:
+            measurements = self.setpoint - errors
+        errors = np.broadcast_to(errors, (traces, steps))
+        dts = np.broadcast_to(np.asarray(self.default_dt if dts is None else dts, dtype=np.float64), errors.shape)
+        measurements = np.broadcast_to(np.asarray(measurements, dtype=np.float64), errors.shape)
+
+        kp, ki, kd = (np.broadcast_to(g, (traces,)) for g in gains)
+        if self.tracking_gain is not None:
+            tracking = np.broadcast_to(np.asarray(self.tracking_gain, dtype=np.float64), (traces,))
+        else:
+            tracking = np.divide(1.0, ki, out=np.zeros(traces), where=ki != 0)
+        low, high = self.output_limits
+
+        integral = np.zeros(traces)
+        derivative = np.zeros(traces)
+        outputs = np.empty_like(errors)
+        for t in range(steps):
+            error, dt, measurement = errors[:, t], dts[:, t], measurements[:, t]
+            safe_dt = np.where(dt > 0, dt, 1.0)
+
+            if t == 0:
+                raw = np.zeros(traces)
+            elif self.derivative_on_measurement:
+                raw = np.where(dt > 0, -(measurement - measurements[:, t - 1]) / safe_dt, 0.0)
+            else:
+                raw = np.where(dt > 0, (error - errors[:, t - 1]) / safe_dt, 0.0)
+            if self.derivative_tau > 0 and t > 0:
+                derivative = derivative + dt / (self.derivative_tau + dt) * (raw - derivative)
+            else:
+                derivative = raw
+
+            new_integral = integral + error * dt
+            if self.anti_windup == 'clamp':
+                new_integral = np.clip(new_integral, -self.integral_limit, self.integral_limit)
+            u = kp * error + ki * new_integral + kd * derivative
+            output = np.clip(u, low, high)
+
+            if self.anti_windup == 'conditional':
+                hold = (output != u) & (error * u > 0)
+                new_integral = np.where(hold, integral, new_integral)
+                u = kp * error + ki * new_integral + kd * derivative
+                output = np.clip(u, low, high)
+            elif self.anti_windup == 'back_calculation':
+                new_integral = new_integral + tracking * (output - u) * dt
+
+            integral = new_integral
+            outputs[:, t] = output
+        return outputs[0] if traces == 1 and single else outputs
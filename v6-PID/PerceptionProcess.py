@@ -0,0 +1,125 @@
+"""
+Runs capture + perception and MJPEG streaming in their own processes.
+
+    perception process: FrameGrabber -> LanePipeline -> SharedLaneState (+ warped frame into SharedFrameRing)
+    streamer process:   SharedFrameRing -> ImageStreamer (JPEG encoding and HTTP clients)
+    main process:       SharedLaneState -> PID -> MotorController
+
+Nothing is pickled on the data path: frames and errors go through shared memory, so a slow JPEG
+encode or a GC pause in perception can never delay a motor update, and the work spreads over the Pi's cores.
+Uses the 'fork' start method (Linux / Raspberry Pi OS).
+"""
+
+import multiprocessing
+import sys
+import time
+
+from SharedFrames import SharedFrameRing, SharedLaneState
+
+
+def perception_worker(ring_name, state_name, stop_event, make_source, w, h, pixel_format, pipeline_options):
+    import WebcamMod
+    from LaneDetection import LanePipeline
+
+    ring = SharedFrameRing((h, w), name=ring_name, create=False)
+    state = SharedLaneState(name=state_name, create=False)
+    grabber = WebcamMod.FrameGrabber(make_source()).start()
+    pipeline = LanePipeline(w, h, pixel_format=pixel_format, **pipeline_options)
+
+    last_seq = 0
+    try:
+        while not stop_event.is_set():
+            last_seq, capture_time, img = grabber.read(after_seq=last_seq, timeout=0.5)
+            if img is None:
+                if grabber.finished:
+                    break   # A video file played out; main.py stops the car once the error goes stale
+                continue
+            # Only produce the full warped image while the streamer has viewers
+            error, warped = pipeline.process(img, full_warp=state.viewers > 0)
+            state.publish(last_seq, capture_time, error)
+            if warped is not None:
+                ring.write(warped, capture_time)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        grabber.stop()
+        ring.close()
+        state.close()
+
+
+def streamer_worker(ring_name, state_name, stop_event, w, h, port):
+    from ImageStreamer import ImageStreamer
+
+    ring = SharedFrameRing((h, w), name=ring_name, create=False)
+    state = SharedLaneState(name=state_name, create=False)
+    streamer = ImageStreamer(port=port)
+    # Warped masks, also as packed bits on /warp.mask (see /viewer.html)
+    streamer.add_stream('warp', aliases=('/stream.mjpg',), mask=True)
+    streamer.start()
+
+    last_seq = 0
+    try:
+        while not stop_event.is_set():
+            state.viewers = streamer.client_count
+            # A fresh array per frame: the streamer keeps a reference until its encoder gets to it
+            seq, timestamp, frame = ring.read(after_seq=last_seq)
+            if frame is None:
+                time.sleep(0.005)
+                continue
+            last_seq = seq
+            streamer.update_image(frame, stream='warp')
+    except KeyboardInterrupt:
+        pass
+    finally:
+        streamer.stop()
+        ring.close()
+        state.close()
+
+
+class PerceptionProcess:
+    """
+    Owns the shared memory and the perception/streamer processes.
+
+    Args:
+        make_source (callable): Returns the frame source for the FrameGrabber (runs in the perception process).
+        w (int): Frame width.
+        h (int): Frame height.
+        pixel_format (str): Pixel format delivered by the source (see utils.ThresholdEngine).
+        stream_port (int): Port for the MJPEG streamer process, or None to not stream.
+        pipeline_options (dict): Extra LanePipeline arguments (e.g. LaneDetection.LANE_PIPELINE).
+    """
+    def __init__(self, make_source, w=360, h=240, pixel_format='bgr', stream_port=8000, pipeline_options=None):
+        ctx = multiprocessing.get_context('fork')
+        self.ring = SharedFrameRing((h, w))
+        self.state = SharedLaneState()
+        self.stop_event = ctx.Event()
+
+        self.processes = [ctx.Process(
+            target=perception_worker, name="perception", daemon=True,
+            args=(self.ring.name, self.state.name, self.stop_event, make_source, w, h, pixel_format,
+                  pipeline_options or {}))]
+        if stream_port is not None:
+            self.processes.append(ctx.Process(
+                target=streamer_worker, name="streamer", daemon=True,
+                args=(self.ring.name, self.state.name, self.stop_event, w, h, stream_port)))
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+        return self
+
+    def read(self):
+        """Returns (seq, capture_time, processed_time, error) for the latest processed frame."""
+        return self.state.read()
+
+    def stop(self):
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                sys.stderr.write(f"{process.name} process did not stop, terminating it.\n")
+                process.terminate()
+        self.ring.close()
+        self.state.close()
+        self.ring.unlink()
+        self.state.unlink()
@@ -0,0 +1,171 @@
+"""
+Shared-memory structures for handing frames and lane errors between processes without pickling.
+
+Both structures have exactly one writer process. Readers never block the writer: they copy what
+they need and check a sequence number afterwards to detect (and retry) a torn read.
+"""
+
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+SLOT_HEADER = np.dtype([('seq', np.int64), ('timestamp', np.float64)])
+LANE_STATE = np.dtype([
+    ('version', np.int64),          # seqlock: odd while the writer is updating
+    ('seq', np.int64),              # camera frame sequence number the error was computed from
+    ('capture_time', np.float64),   # time.monotonic() when that frame was captured
+    ('processed_time', np.float64), # time.monotonic() when the error was published
+    ('error', np.float64),          # normalized lane error in [-1, 1]
+    ('viewers', np.int64),          # stream viewers, written by the streamer process
+])
+
+
+def _align(n, alignment=64):
+    return (n + alignment - 1) // alignment * alignment
+
+
+class SharedFrameRing:
+    """
+    A ring of fixed-size frame slots in shared memory.
+
+    The writer copies each frame into the next slot and only then publishes its sequence number,
+    so a reader always finds a complete frame behind the latest sequence number. With 3+ slots the
+    writer would have to lap the reader twice to overwrite a frame mid-copy; read() detects that case.
+
+    Args:
+        shape (tuple): Frame shape, e.g. (240, 360) for the warped mask.
+        dtype: Frame dtype.
+        slots (int): Number of frame slots.
+        name (str): Shared memory block name (None picks a unique one when creating).
+        create (bool): Create the block (writer side) or attach to an existing one.
+    """
+    def __init__(self, shape, dtype=np.uint8, slots=3, name=None, create=True):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+
+        frame_bytes = _align(int(np.prod(self.shape)) * self.dtype.itemsize)
+        header_bytes = _align(8 + slots * SLOT_HEADER.itemsize)
+        size = header_bytes + slots * frame_bytes
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        self.name = self.shm.name
+
+        buf = self.shm.buf
+        self.latest = np.ndarray((1,), np.int64, buffer=buf, offset=0)
+        self.headers = np.ndarray((slots,), SLOT_HEADER, buffer=buf, offset=8)
+        self.frames = [np.ndarray(self.shape, self.dtype, buffer=buf, offset=header_bytes + i * frame_bytes)
+                       for i in range(slots)]
+        if create:
+            self.latest[0] = 0
+            self.headers['seq'] = 0
+
+    def write(self, frame, timestamp=None):
+        """Copies `frame` into the next slot and publishes it. Returns the new sequence number."""
+        seq = int(self.latest[0]) + 1
+        slot = seq % self.slots
+        self.headers['seq'][slot] = -1  # slot is being rewritten
+        np.copyto(self.frames[slot], frame)
+        self.headers['timestamp'][slot] = time.monotonic() if timestamp is None else timestamp
+        self.headers['seq'][slot] = seq
+        self.latest[0] = seq
+        return seq
+
+    def read(self, after_seq=0, out=None, retries=3):
+        """
+        Copies the newest frame if it is newer than `after_seq`.
+
+        Args:
+            after_seq (int): Sequence number of the last frame the caller has seen.
+            out (np.ndarray): Optional buffer to copy into (avoids allocating).
+            retries (int): How often to retry if the writer overwrote the slot during the copy.
+
+        Returns:
+            tuple: (seq, timestamp, frame), with frame None if there is nothing new.
+        """
+        for _ in range(retries + 1):
+            seq = int(self.latest[0])
+            if seq <= after_seq:
+                return after_seq, None, None
+            slot = seq % self.slots
+            if out is None:
+                out = np.empty(self.shape, self.dtype)
+            np.copyto(out, self.frames[slot])
+            timestamp = float(self.headers['timestamp'][slot])
+            if int(self.headers['seq'][slot]) == seq:
+                return seq, timestamp, out
+        return after_seq, None, None
+
+    def close(self):
+        # Drop our numpy views first, or SharedMemory.close() refuses to release the buffer
+        self.latest = self.headers = self.frames = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+class SharedLaneState:
+    """
+    The perception process's latest lane error, guarded by a seqlock.
+
+    Args:
+        name (str): Shared memory block name (None picks a unique one when creating).
+        create (bool): Create the block (writer side) or attach to an existing one.
+    """
+    def __init__(self, name=None, create=True):
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=_align(LANE_STATE.itemsize))
+        self.name = self.shm.name
+        self.data = np.ndarray((1,), LANE_STATE, buffer=self.shm.buf)
+        if create:
+            self.data[0] = (0, 0, 0.0, 0.0, 0.0, 0)
+        self.last = (0, 0.0, 0.0, 0.0)  # last consistent read
+
+    def publish(self, seq, capture_time, error, processed_time=None):
+        data = self.data
+        version = int(data['version'][0])
+        data['version'][0] = version + 1
+        data['seq'][0] = seq
+        data['capture_time'][0] = capture_time
+        data['processed_time'][0] = time.monotonic() if processed_time is None else processed_time
+        data['error'][0] = error
+        data['version'][0] = version + 2
+
+    def read(self, retries=3):
+        """
+        Args:
+            retries (int): How often to retry if the writer was mid-update.
+
+        Returns:
+            tuple: (seq, capture_time, processed_time, error) from one consistent update. If none could be
+                   read (e.g. the writer died mid-update), the last consistent one again, whose capture_time
+                   then ages until the reader's staleness check stops the car.
+        """
+        data = self.data
+        for _ in range(retries + 1):
+            version = int(data['version'][0])
+            if version % 2:
+                continue
+            seq = int(data['seq'][0])
+            capture_time = float(data['capture_time'][0])
+            processed_time = float(data['processed_time'][0])
+            error = float(data['error'][0])
+            if int(data['version'][0]) == version:
+                self.last = (seq, capture_time, processed_time, error)
+                break
+        return self.last
+
+    @property
+    def viewers(self):
+        return int(self.data['viewers'][0])
+
+    @viewers.setter
+    def viewers(self, count):
+        self.data['viewers'][0] = count
+
+    def close(self):
+        self.data = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
@@ -0,0 +1,224 @@
+"""
+Telemetry channel between the control loop and everything that wants to watch it.
+
+The loop calls publish() with a sample (a plain dict); that is a single deque append, which never
+blocks and never waits for a terminal, a socket or a disk. A background thread drains the queue
+every `interval` seconds and hands the batch to each sink:
+
+    SliderSink   the steering slider on stdout, throttled to a few lines per second
+    UDPSink      one JSON object per datagram, for a dashboard on a laptop
+    CSVSink      every sample as a CSV row
+
+If the consumer falls behind, the queue drops its oldest samples (counted in stats()).
+
+On the laptop, `python Telemetry.py --listen 5005` prints the slider from the UDP stream.
+"""
+
+import argparse
+import csv
+import json
+import socket
+import sys
+import threading
+import time
+from collections import deque
+
+from utils import format_slider
+
+
+class SliderSink:
+    """
+    Prints the steering slider for the newest sample, at most rate_hz times per second.
+
+    Args:
+        rate_hz (float): Maximum lines per second.
+        field (str): Sample field shown on the slider.
+        stream: File to write to (stdout by default).
+    """
+    def __init__(self, rate_hz=10, field='steering', stream=None):
+        self.period = 1.0 / rate_hz
+        self.field = field
+        self.stream = stream
+        self.next_time = 0.0
+
+    def write(self, samples):
+        now = time.monotonic()
+        if now < self.next_time:
+            return
+        self.next_time = now + self.period
+        value = samples[-1].get(self.field)
+        if value is not None:
+            stream = self.stream or sys.stdout
+            stream.write(format_slider(value) + "\n")
+            stream.flush()
+
+    def close(self):
+        pass
+
+
+class UDPSink:
+    """
+    Sends each sample as a JSON datagram (fire and forget: nothing listening is not an error).
+
+    Args:
+        host (str): Receiver address.
+        port (int): Receiver port.
+        rate_hz (float): Maximum samples sent per second (None: every sample).
+    """
+    def __init__(self, host, port=5005, rate_hz=None):
+        self.address = (host, port)
+        self.period = 1.0 / rate_hz if rate_hz else 0.0
+        self.next_time = 0.0
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+        self.sent = 0
+        self.errors = 0
+
+    def write(self, samples):
+        for sample in samples:
+            if self.period:
+                t = sample.get('t', time.monotonic())
+                if t < self.next_time:
+                    continue
+                self.next_time = t + self.period
+            try:
+                self.socket.sendto(json.dumps(sample, separators=(',', ':')).encode(), self.address)
+                self.sent += 1
+            except OSError: # No receiver yet (ECONNREFUSED), full socket buffer, network down
+                self.errors += 1
+
+    def close(self):
+        self.socket.close()
+
+
+class CSVSink:
+    """
+    Appends every sample to a CSV file; the header comes from the first sample's keys.
+
+    Args:
+        path (str): Output file (overwritten).
+        fields (list): Column order (default: keys of the first sample).
+    """
+    def __init__(self, path, fields=None):
+        self.file = open(path, 'w', newline='')
+        self.fields = fields
+        self.writer = None
+
+    def write(self, samples):
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.file, fieldnames=self.fields or list(samples[0]),
+                                         extrasaction='ignore')
+            self.writer.writeheader()
+        self.writer.writerows(samples)
+
+    def close(self):
+        self.file.close()
+
+
+class Telemetry:
+    """
+    Bounded, non-blocking sample queue with a consumer thread feeding the sinks.
+
+    Args:
+        sinks (list): Objects with write(samples) and close().
+        queue_size (int): Samples kept while the consumer is behind (oldest are dropped).
+        interval (float): Seconds between drains of the queue.
+    """
+    def __init__(self, sinks=(), queue_size=512, interval=0.05):
+        self.sinks = list(sinks)
+        self.queue = deque(maxlen=queue_size)
+        self.interval = interval
+        self.published = 0
+        self.dropped = 0
+        self.sink_errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def publish(self, sample):
+        """Queues a sample (a dict of JSON-serializable values). Never blocks."""
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(sample)
+        self.published += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="Telemetry", daemon=True)
+        self._thread.start()
+        return self
+
+    def _drain(self):
+        batch = []
+        try:
+            while True:
+                batch.append(self.queue.popleft())
+        except IndexError:
+            pass
+        if not batch:
+            return
+        for sink in self.sinks:
+            try:
+                sink.write(batch)
+            except Exception as e:
+                self.sink_errors += 1
+                if self.sink_errors == 1:
+                    sys.stderr.write(f"Telemetry sink {type(sink).__name__} failed: {e}\n")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._drain()
+
+    def stop(self):
+        """Stops the thread, delivers what is still queued and closes the sinks."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        self._drain()
+        for sink in self.sinks:
+            sink.close()
+
+    def stats(self):
+        return {"published": self.published, "dropped": self.dropped, "sink_errors": self.sink_errors}
+
+
+def sinks_from_args(argv=None):
+    """
+    Builds the sinks for the command line: always the slider, plus UDPSink for
+    `--telemetry-udp=HOST[:PORT]` and CSVSink for `--telemetry-csv=PATH`.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    sinks = [SliderSink()]
+    for arg in argv:
+        if arg.startswith('--telemetry-udp='):
+            host, _, port = arg.split('=', 1)[1].partition(':')
+            sinks.append(UDPSink(host, int(port) if port else 5005))
+        elif arg.startswith('--telemetry-csv='):
+            sinks.append(CSVSink(arg.split('=', 1)[1]))
+    return sinks
+
+
+def listen(port=5005, field='steering', rate_hz=10):
+    """Prints the slider for samples arriving on the UDP port (run on the laptop)."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('', port))
+    slider = SliderSink(rate_hz=rate_hz, field=field)
+    print(f"Listening for telemetry on UDP port {port}")
+    while True:
+        data, _ = sock.recvfrom(65536)
+        slider.write([json.loads(data)])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show telemetry sent by main.py --telemetry-udp=HOST:PORT.")
+    parser.add_argument("--listen", type=int, default=5005, metavar="PORT", help="UDP port to listen on")
+    parser.add_argument("--field", default="steering", help="Sample field to show on the slider")
+    parser.add_argument("--rate", type=float, default=10, help="Slider lines per second")
+    args = parser.parse_args(argv)
+    try:
+        listen(args.listen, args.field, args.rate)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
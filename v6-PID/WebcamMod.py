@@ -1,21 +1,372 @@
 import cv2
+import numpy as np
+import os
+import sys
+import threading
+import time
 
-# open camera once
-vCapture = cv2.VideoCapture(0)
-# request 360×240 frames directly
-vCapture.set(cv2.CAP_PROP_FRAME_WIDTH, 360)
-vCapture.set(cv2.CAP_PROP_FRAME_HEIGHT, 240)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
 
-def getImg():
-    success, img = vCapture.read()
-    if not success:
-        return None
+
+class CameraSource:
+    """
+    Frame source backed by a V4L2/USB webcam.
+
+    Args:
+        index (int): The camera index passed to cv2.VideoCapture.
+        width (int): Requested frame width.
+        height (int): Requested frame height.
+        pixel_format (str): 'bgr' for normal colour frames, 'yuyv' for raw (h, w, 2) YUYV frames whose
+                            Y plane can be thresholded directly, or 'gray' for Y-only frames decoded
+                            straight from the camera's MJPEG stream (no colour conversion).
+    """
+    def __init__(self, index=0, width=360, height=240, pixel_format='bgr'):
+        self.pixel_format = pixel_format
+        self.capture = cv2.VideoCapture(index)
+        # request 360×240 frames directly
+        self.capture.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.capture.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        # Keep the driver queue as short as possible so we never read stale frames
+        self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+        if pixel_format == 'yuyv':
+            self.capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'YUYV'))
+            self.capture.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        elif pixel_format == 'gray':
+            self.capture.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+            self.capture.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+
+    def read(self):
+        success, img = self.capture.read()
+        if not success or self.pixel_format != 'gray':
+            return success, img
+
+        if img.ndim == 3 and img.shape[2] == 2:
+            # The camera ignored the MJPG request and sent YUYV; the Y plane is already grayscale
+            return True, np.ascontiguousarray(img[:, :, 0])
+        # Raw MJPEG bytes: libjpeg only decodes the luma plane for grayscale output
+        img = cv2.imdecode(img.reshape(-1), cv2.IMREAD_GRAYSCALE)
+        return img is not None, img
+
+    def release(self):
+        self.capture.release()
+
+
+def convertPixelFormat(img, pixel_format):
+    """
+    Converts a BGR frame to 'gray' or packed 'yuyv' (h, w, 2), so recorded or synthetic
+    frames can stand in for the camera's raw formats. 'bgr' returns the frame unchanged.
+    """
+    if pixel_format == 'bgr':
+        return img
+    if pixel_format == 'gray':
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+    yuv = cv2.cvtColor(img, cv2.COLOR_BGR2YUV)
+    packed = np.empty(img.shape[:2] + (2,), dtype=np.uint8)
+    packed[:, :, 0] = yuv[:, :, 0]
+    packed[:, 0::2, 1] = yuv[:, 0::2, 1]   # U on even columns
+    packed[:, 1::2, 1] = yuv[:, 1::2, 2]   # V on odd columns
+    return packed
+
+
+class VideoFileSource:
+    """
+    Frame source that plays back a recorded video file.
+
+    Args:
+        path (str): Path to the video file.
+        loop (bool): Rewind to the start when the end of the file is reached; otherwise set `finished`
+                     and fail every read from then on.
+        realtime (bool): Pace reads at the file's native frame rate instead of as fast as possible.
+        size (tuple): Optional (width, height) to resize every frame to.
+    """
+    def __init__(self, path, loop=True, realtime=True, size=None):
+        self.path = path
+        self.loop = loop
+        self.realtime = realtime
+        self.size = size
+        self.finished = False
+        self.capture = cv2.VideoCapture(path)
+        fps = self.capture.get(cv2.CAP_PROP_FPS)
+        self.period = 1.0 / fps if fps and fps > 0 else 1.0 / 30
+        self._next_time = None
+
+    def read(self):
+        if self.realtime:
+            now = time.monotonic()
+            if self._next_time is not None and now < self._next_time:
+                time.sleep(self._next_time - now)
+            self._next_time = max(now, self._next_time or now) + self.period
+
+        if self.finished:
+            return False, None
+        success, img = self.capture.read()
+        if not success and self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, img = self.capture.read()
+        elif not success:
+            self.finished = True
+        if success and self.size is not None:
+            img = cv2.resize(img, self.size)
+        return success, img
+
+    def release(self):
+        self.capture.release()
+
+
+class ImageDirectorySource:
+    """
+    Frame source that plays back a directory of recorded images, in file name order.
+
+    Args:
+        path (str): Directory of images (any format in IMAGE_EXTENSIONS).
+        loop (bool): Start over after the last image; otherwise set `finished` there.
+        realtime (bool): Pace reads at `fps` instead of as fast as possible.
+        fps (float): Frame rate the images were recorded at.
+        size (tuple): Optional (width, height) to resize every frame to.
+    """
+    def __init__(self, path, loop=False, realtime=False, fps=30, size=None):
+        self.path = path
+        self.loop = loop
+        self.realtime = realtime
+        self.size = size
+        self.period = 1.0 / fps
+        self.files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        self.index = 0
+        self.finished = False
+        self._next_time = None
+
+    def read(self):
+        if self.realtime:
+            now = time.monotonic()
+            if self._next_time is not None and now < self._next_time:
+                time.sleep(self._next_time - now)
+            self._next_time = max(now, self._next_time or now) + self.period
+
+        if self.index >= len(self.files):
+            if not self.loop or not self.files:
+                self.finished = True
+                return False, None
+            self.index = 0
+        img = cv2.imread(self.files[self.index])
+        self.index += 1
+        if img is None:
+            return False, None
+        if self.size is not None:
+            img = cv2.resize(img, self.size)
+        return True, img
+
+    def release(self):
+        pass
+
+
+class SyntheticSource:
+    """
+    Frame source that draws a dark lane line on a light floor.
+    The lane sways left and right over time, so it can stand in for the camera on a dev machine.
+
+    Args:
+        width (int): Frame width.
+        height (int): Frame height.
+        fps (float): Frames generated per second (0 for as fast as possible).
+        lane_width (int): Width of the tape line in pixels.
+        sway (float): Peak lateral offset of the lane as a fraction of the frame width.
+        period (float): Seconds of (nominal) video time for one full left-right sway.
+        noise (int): Amplitude of per-pixel noise added to the floor (0 disables noise).
+        seed (int): Seed for the noise generator so runs are reproducible.
+        pixel_format (str): Format of the generated frames ('bgr', 'gray' or 'yuyv').
+    """
+    def __init__(self, width=360, height=240, fps=30, lane_width=24, sway=0.25,
+                 period=4.0, noise=8, seed=0, pixel_format='bgr'):
+        self.pixel_format = pixel_format
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.lane_width = lane_width
+        self.sway = sway
+        self.period = period
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        self.index = 0
+        self._next_time = None
+
+    def make_frame(self, index):
+        """
+        Renders frame number `index` as a BGR image.
+        """
+        t = index / (self.fps or 30)
+        phase = 2 * np.pi * t / self.period
+        floor = np.full((self.height, self.width, 3), 200, dtype=np.uint8)
+        if self.noise:
+            jitter = self.rng.integers(-self.noise, self.noise + 1, size=floor.shape[:2], dtype=np.int16)
+            floor = np.clip(floor.astype(np.int16) + jitter[:, :, None], 0, 255).astype(np.uint8)
+
+        # The lane bends more towards the top of the frame, like a curve seen in perspective
+        ys = np.arange(self.height)
+        depth = 1.0 - ys / self.height
+        centers = self.width / 2 + self.sway * self.width * np.sin(phase) * (0.5 + depth)
+        pts = np.stack([centers, ys], axis=1).astype(np.int32)
+        cv2.polylines(floor, [pts], False, (30, 30, 30), self.lane_width)
+        return floor
+
+    def read(self):
+        if self.fps:
+            now = time.monotonic()
+            if self._next_time is not None and now < self._next_time:
+                time.sleep(self._next_time - now)
+            self._next_time = max(now, self._next_time or now) + 1.0 / self.fps
+
+        img = convertPixelFormat(self.make_frame(self.index), self.pixel_format)
+        self.index += 1
+        return True, img
+
+    def release(self):
+        pass
+
+
+class FrameGrabber:
+    """
+    Reads frames from a source on a dedicated thread and keeps only the most recent one.
+
+    Frames that arrive before the previous one was consumed are dropped rather than queued,
+    so the control loop always works on the freshest image available. Failed reads and exceptions
+    from the source are counted (and exceptions logged) without stopping the thread; it only ends
+    when a file source reports it has played out (`finished`), which also wakes up read().
+
+    Args:
+        source: Any object with read() -> (success, img) and release() methods, and optionally a
+                `finished` attribute that becomes True once it can deliver no more frames.
+    """
+    def __init__(self, source):
+        self.source = source
+        self.cond = threading.Condition()
+        self.frame = None
+        self.seq = 0              # sequence number of self.frame (0 = no frame yet)
+        self.timestamp = None     # time.monotonic() at which self.frame was captured
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.read_errors = 0        # failed reads, including the ones that raised
+        self.read_exceptions = 0
+        self.last_exception = None
+        self.finished = False       # the source ran out of frames
+        self._consumed_seq = 0
+        self._running = False
+        self._logged_time = None
+        self.thread = None
+
+    def start(self):
+        """Starts the grabber thread."""
+        if self._running:
+            return self
+        self._running = True
+        self.thread = threading.Thread(target=self._run, name="FrameGrabber", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        """Stops the grabber thread and releases the source."""
+        self._running = False
+        with self.cond:
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2.0)
+            self.thread = None
+        self.source.release()
+
+    def _run(self):
+        while self._running:
+            try:
+                success, img = self.source.read()
+            except Exception as exc:
+                # A flaky driver or a corrupt file must not kill the thread the control loop waits on
+                success, img = False, None
+                self._log_exception(exc)
+            timestamp = time.monotonic()
+            if not success or img is None:
+                self.read_errors += 1
+                if getattr(self.source, 'finished', False):
+                    with self.cond:
+                        self.finished = True
+                        self._running = False
+                        self.cond.notify_all()
+                    return
+                time.sleep(0.005)
+                continue
+
+            with self.cond:
+                if self.seq > self._consumed_seq:
+                    self.frames_dropped += 1
+                self.frame = img
+                self.seq += 1
+                self.timestamp = timestamp
+                self.frames_captured += 1
+                self.cond.notify_all()
+
+    def _log_exception(self, exc):
+        """Counts an exception from source.read() and logs it (at most once a second)."""
+        self.read_exceptions += 1
+        self.last_exception = exc
+        now = time.monotonic()
+        if self._logged_time is None or now - self._logged_time >= 1.0:
+            self._logged_time = now
+            sys.stderr.write(f"FrameGrabber: source.read() raised {exc!r} "
+                             f"({self.read_exceptions} so far), retrying.\n")
+
+    def read(self, after_seq=0, timeout=None):
+        """
+        Returns the latest frame that is newer than `after_seq`.
+
+        Args:
+            after_seq (int): Only return a frame whose sequence number is greater than this.
+                             Pass the last sequence number you processed to never see a frame twice.
+            timeout (float): Maximum seconds to wait for such a frame (None waits forever).
+
+        Returns:
+            tuple: (seq, timestamp, frame), or (seq, timestamp, None) if the timeout expired or the
+                   source has finished.
+        """
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.seq > after_seq or not self._running, timeout):
+                return self.seq, self.timestamp, None
+            if self.seq <= after_seq:
+                return self.seq, self.timestamp, None
+            self._consumed_seq = self.seq
+            return self.seq, self.timestamp, self.frame
+
+    def latest(self):
+        """Returns (seq, timestamp, frame) for the newest frame without waiting."""
+        with self.cond:
+            self._consumed_seq = self.seq
+            return self.seq, self.timestamp, self.frame
+
+
+# Default grabber used by getImg(); the camera is opened on first use rather than at import
+_grabber = None
+
+def getGrabber():
+    """Returns the shared camera FrameGrabber, starting it if needed."""
+    global _grabber
+    if _grabber is None:
+        _grabber = FrameGrabber(CameraSource()).start()
+    return _grabber
+
+def getImg(timeout=1.0):
+    """
+    Returns the most recent camera frame, or None if no frame arrived within `timeout` seconds.
+    Only blocks until the very first frame has been captured.
+    """
+    seq, timestamp, img = getGrabber().read(timeout=timeout)
     return img
 
 # Camera Test Script
 if __name__ == '__main__':
-    pass
-    # while True:
-    #     img = getImg()
-    #     showImg(img, 'img')
-    #     cv2.waitKey(50)
\ No newline at end of file
+    grabber = FrameGrabber(SyntheticSource(fps=60)).start()
+    last_seq = 0
+    start = time.monotonic()
+    while time.monotonic() - start < 2:
+        last_seq, timestamp, img = grabber.read(after_seq=last_seq, timeout=1.0)
+        time.sleep(1 / 20)  # Simulate a control loop slower than the source
+    grabber.stop()
+    print(f"captured={grabber.frames_captured} dropped={grabber.frames_dropped} last_seq={last_seq}")
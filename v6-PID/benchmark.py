@@ -0,0 +1,225 @@
+"""
+Benchmarks the lane-detection hot path.
+
+Runs every stage (and the full pipeline) over a set of frames and reports p50/p95/p99 latency,
+frames per second and peak RSS. Frames come from a directory of recorded images, a video file,
+or are generated on the fly by WebcamMod.SyntheticSource.
+
+Usage:
+    python benchmark.py                                   # synthetic frames
+    python benchmark.py --frames recordings/run1/         # recorded frames (any image format OpenCV reads)
+    python benchmark.py --output after.json --compare before.json --threshold 0.15
+
+With --compare the run fails (exit code 1) if any stage's p50 or p95 got slower than the
+baseline by more than --threshold (a fraction, 0.15 = 15%).
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+import utils
+import LaneDetection
+import WebcamMod
+from ImageStreamer import ImageStreamer
+
+def loadFrames(path=None, count=300, size=(360, 240)):
+    """
+    Loads benchmark frames.
+
+    Args:
+        path (str): Directory of images, a video file, or None for synthetic frames.
+        count (int): Number of frames to generate or read at most.
+        size (tuple): (width, height) every frame is resized to.
+
+    Returns:
+        list: BGR frames.
+    """
+    if path is None:
+        source = WebcamMod.SyntheticSource(width=size[0], height=size[1], fps=0)
+        return [source.read()[1] for _ in range(count)]
+
+    if os.path.isdir(path):
+        names = sorted(n for n in os.listdir(path) if n.lower().endswith(WebcamMod.IMAGE_EXTENSIONS))[:count]
+        frames = [cv2.imread(os.path.join(path, n)) for n in names]
+        return [cv2.resize(f, size) for f in frames if f is not None]
+
+    source = WebcamMod.VideoFileSource(path, loop=False, realtime=False, size=size)
+    frames = []
+    while len(frames) < count:
+        success, img = source.read()
+        if not success:
+            break
+        frames.append(img)
+    source.release()
+    return frames
+
+
+def timeStage(func, inputs, repeat=1, warmup=5):
+    """
+    Times func(x) for every x in inputs.
+
+    Returns:
+        dict: Latency percentiles in milliseconds and throughput in frames per second.
+    """
+    for x in inputs[:warmup]:
+        func(x)
+
+    samples = []
+    for _ in range(repeat):
+        for x in inputs:
+            start = time.perf_counter()
+            func(x)
+            samples.append(time.perf_counter() - start)
+
+    samples = np.array(samples) * 1000.0
+    return {
+        "n": len(samples),
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "p99_ms": float(np.percentile(samples, 99)),
+        "max_ms": float(samples.max()),
+        "fps": float(1000.0 / samples.mean()),
+    }
+
+
+def buildStages(frames):
+    """
+    Returns (name, func, inputs) for every benchmarked stage.
+    Inputs are prepared ahead of time so each stage is timed on its own.
+    """
+    h, w = frames[0].shape[:2]
+    points = LaneDetection.WARP_POINTS
+    masks = [utils.thresholding(f) for f in frames]
+    warped = [utils.warpImg(m, points, w, h) for m in masks]
+    pipeline = LaneDetection.LanePipeline(w, h, points)
+    tracked = LaneDetection.LanePipeline(w, h, points, tracker=True)
+    modelled = LaneDetection.LanePipeline(w, h, points, tracker=True, model=True, lookahead=0.2)
+    # Pinned formats: the camera feed as JPEG, warped masks as 1-bit PNG and as packed bits
+    streamer = ImageStreamer()
+    jpeg = streamer.add_stream('jpeg', mask=False)
+    png = streamer.add_stream('png', mask=True)
+
+    return [
+        ("thresholding", utils.thresholding, frames),
+        ("warpImg", lambda m: utils.warpImg(m, points, w, h), masks),
+        ("get_lane_error_norm", LaneDetection.get_lane_error_norm, warped),
+        ("getLaneCurve", LaneDetection.getLaneCurve, frames),
+        ("getLaneCurve_roi", lambda f: LaneDetection.getLaneCurve(f, full_warp=False), frames),
+        ("LanePipeline", pipeline.process, frames),
+        ("LanePipeline_roi", lambda f: pipeline.process(f, full_warp=False), frames),
+        ("LanePipeline_tracker", lambda f: tracked.process(f, full_warp=False), frames),
+        ("LanePipeline_model", lambda f: modelled.process(f, full_warp=False), frames),
+        ("LaneModel.update", modelled.model.update, frames),
+        ("ImageStreamer.encode_jpeg", lambda f: streamer.encode(f, jpeg), frames),
+        ("ImageStreamer.encode_png", lambda m: streamer.encode(m, png), warped),
+        ("ImageStreamer.encode_mask", lambda m: streamer.encode_mask(m, png), warped),
+    ]
+
+
+def peakRssMb():
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def gitCommit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def runBenchmark(frames, repeat=1, only=None):
+    results = {}
+    for name, func, inputs in buildStages(frames):
+        if only and name not in only:
+            continue
+        results[name] = timeStage(func, inputs, repeat=repeat)
+
+    return {
+        "commit": gitCommit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "frames": len(frames),
+        "frame_shape": list(frames[0].shape),
+        "peak_rss_mb": peakRssMb(),
+        "stages": results,
+    }
+
+
+def compareResults(current, baseline, threshold):
+    """
+    Returns a list of human-readable regressions (empty if none).
+    """
+    regressions = []
+    for name, stats in current["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if base is None:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            if base[key] > 0 and stats[key] > base[key] * (1 + threshold):
+                change = (stats[key] / base[key] - 1) * 100
+                regressions.append(f"{name} {key}: {base[key]:.3f} -> {stats[key]:.3f} ms (+{change:.0f}%)")
+    return regressions
+
+
+def printReport(report):
+    print(f"{report['frames']} frames of {report['frame_shape']}, OpenCV {report['opencv']}, "
+          f"peak RSS {report['peak_rss_mb']:.1f} MB")
+    print(f"{'stage':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'fps':>10}")
+    for name, s in report["stages"].items():
+        print(f"{name:<28}{s['p50_ms']:>10.3f}{s['p95_ms']:>10.3f}{s['p99_ms']:>10.3f}{s['fps']:>10.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the lane-detection hot path.")
+    parser.add_argument("--frames", help="Directory of recorded frames or a video file (default: synthetic)")
+    parser.add_argument("--count", type=int, default=300, help="Number of frames to use")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the frames per stage")
+    parser.add_argument("--stage", action="append", help="Only run this stage (can be repeated)")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Allowed slowdown vs the baseline as a fraction (default 0.15)")
+    args = parser.parse_args(argv)
+
+    frames = loadFrames(args.frames, args.count)
+    if not frames:
+        sys.stderr.write(f"No frames could be loaded from {args.frames}\n")
+        return 2
+
+    report = runBenchmark(frames, repeat=args.repeat, only=args.stage)
+    printReport(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compareResults(report, baseline, args.threshold)
+        if regressions:
+            print(f"\nRegressions against {args.compare} (threshold {args.threshold:.0%}):")
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print(f"\nNo regressions against {args.compare}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,20 @@
 from MotorController import MotorController
+from Actuator import Actuator, ACTUATOR
+from GPIOBackends import backend_from_args
+import sys
 import cv2
-from LaneDetection import getLaneCurve, PID_control
+from LaneDetection import LanePipeline, LANE_PIPELINE, WARP_POINTS
+from PIDController import PIDController, STEERING_PID
 import WebcamMod
 from ImageStreamer import ImageStreamer
+from AdaptiveQuality import AdaptiveQuality
+from Instrumentation import LatencyRecorder
+from LoopScheduler import LoopScheduler
+from PerceptionProcess import PerceptionProcess
+from FlightRecorder import FlightRecorder
+from Telemetry import Telemetry, sinks_from_args
 import time
-from utils import print_slider
+from utils import drawOverlay
  
 # Initialize MotorController
 # --- ⚙️ PIN CONFIGURATION ---
@@ -12,40 +22,221 @@ from utils import print_slider
 # Replace these placeholder pin numbers with the actual BCM pin numbers (https://pinout.xyz)
 # you have connected to your motor driver.
 # Format: (Enable Pin, Forward Pin, Reverse Pin)
-car = MotorController((2, 3, 4), (22, 27, 17), leftBias=1, rightBias=1)
+# `python main.py --gpio=sim` runs without a Pi (also pigpio, lgpio or rpi; default: first that works)
+# Forward speed (duty cycle %) the steering is applied around
+BASE_SPEED = 30
 
-def main(movement_enabled=False):
-    img = WebcamMod.getImg() # Get image from WebcamMod module
-    curveVal, frame = getLaneCurve(img) # calculate lane curve
-    streamer.update_image(frame)
+# PWM carrier on the enable pins: RPi.GPIO makes it in software, so keep it low there; with
+# --gpio=pigpio it is DMA/hardware timed and e.g. 1000-8000 Hz costs no CPU
+PWM_FREQUENCY = 100
+car = MotorController((2, 3, 4), (22, 27, 17), leftBias=1, rightBias=1, gpio=backend_from_args(),
+                      pwm_frequency=PWM_FREQUENCY)
 
-    # print(curveVal)
-    steer_val = PID_control(curveVal, reset = (not movement_enabled))
+# The loop only posts steer commands; the actuator applies the latest one at 100 Hz with per-wheel
+# slew/acceleration limits, and stops the car if the loop goes quiet for 250 ms (settings shared
+# with replay.py)
+actuator = Actuator(car, **ACTUATOR)
+
+# Lane detection with preallocated frame buffers (360x240 camera frames). The tracker follows the
+# lane in windows across frames, working on one reduced-resolution warp of the rows ahead; the full
+# image is only warped when a debug stream needs it (settings shared with replay.py)
+pipeline = LanePipeline(360, 240, **LANE_PIPELINE)
+
+# Per-stage timestamps for every tick (served at /latency.json and dumped to latency.json on exit).
+# The loop's last stage is posting the steer command; the actuator times the motor write that follows
+# (glass_to_motor at /actuator_latency.json and in actuator_latency.json)
+latency = LatencyRecorder()
+pipeline.timer = latency
+last_seq = 0
+curveVal = 0.0
+
+# The loop keeps steering on the last error between frames, but only for so long: once the newest
+# frame is older than this (camera or perception process gone), it commands a stop instead
+MAX_FRAME_AGE = 0.25
+last_frame_time = None # capture time (time.monotonic()) of the newest processed frame
+frame_stale = False
+
+# Steering PID (settings shared with replay.py)
+pid = PIDController(**STEERING_PID)
+
+# Perception -> PID -> steer at a fixed rate. The PID only steps on new frames, with the time between
+# their captures as dt, and the steering is held on the ticks in between (see frame_interval())
+LOOP_RATE_HZ = 30
+scheduler = LoopScheduler(rate_hz=LOOP_RATE_HZ, name='control')
+
+# Last 30 s of downscaled frames + error/steering/duty in flight.rec (inspect or export it with
+# `python FlightRecorder.py flight.rec --export DIR` after the car has left the lane). Opened when
+# the car starts; the previous runs are kept as flight.rec.1 to flight.rec.3
+recorder = None
+
+# Per-tick samples go to a background thread: the steering slider on stdout (10 lines/s), plus
+# `--telemetry-udp=HOST[:PORT]` (JSON datagrams, view with `python Telemetry.py` there) and
+# `--telemetry-csv=PATH`. publish() never blocks the loop
+telemetry = Telemetry(sinks_from_args())
+
+# `python main.py --multiprocess` runs capture + perception and streaming in their own processes
+MULTIPROCESS = '--multiprocess' in sys.argv
+perception = None
+
+def main_multiprocess(movement_enabled=False, dt=1 / LOOP_RATE_HZ, perceive=True):
+    global last_seq, curveVal, last_frame_time
+    # Latest error published by the perception process (never blocks)
+    seq, capture_time, processed_time, error = perception.read()
+    timed = seq > last_seq
+    if timed:
+        frame_dt = frame_interval(capture_time, dt)
+        last_seq, curveVal, last_frame_time = seq, error, capture_time
+        latency.start(capture_time)
+        latency.mark('error', processed_time)
+
+    if not movement_enabled:
+        pid.reset()
+    if timed:
+        steer_val = pid.update(curveVal, dt=frame_dt)
+        latency.mark('pid')
+    else:
+        steer_val = pid.output # Same error as last tick: hold the steering
+
+    if movement_enabled:
+        drive(steer_val)
+        if timed:
+            latency.mark('command')
+    if timed:
+        latency.finish()
+        recorder.record(None, curveVal, steer_val, actuator.left.value, actuator.right.value, seq, capture_time)
 
-    print_slider(steer_val) # Print slider to show detection
+    publish_telemetry(dt, steer_val, timed)
+
+def frame_interval(capture_time, dt):
+    """
+    The PID's dt for a new frame: the time since the previous frame was captured.
+
+    Args:
+        capture_time (float): Capture time of the new frame.
+        dt (float): Loop period, used for the first frame.
+    Returns:
+        float: Seconds, at most MAX_FRAME_AGE (after longer gaps drive() has stopped the car and reset the PID).
+    """
+    if last_frame_time is None:
+        return dt
+    return min(capture_time - last_frame_time, MAX_FRAME_AGE)
+
+def drive(steer_val):
+    """Posts the steer command, or a stop while the newest frame is older than MAX_FRAME_AGE."""
+    global frame_stale
+    stale = last_frame_time is None or time.monotonic() - last_frame_time > MAX_FRAME_AGE
+    if stale != frame_stale:
+        frame_stale = stale
+        sys.stderr.write(f"No camera frame for {MAX_FRAME_AGE * 1000:.0f} ms, stopping.\n" if stale else
+                         "Camera frames are back, steering again.\n")
+    if stale:
+        pid.reset() # Start from a clean integral when frames come back
+        actuator.command_wheels(0, 0)
+    else:
+        actuator.command(BASE_SPEED, steer_val, capture_time=last_frame_time)
+
+def publish_telemetry(dt, steer_val, fresh):
+    telemetry.publish({"t": time.monotonic(), "seq": last_seq, "fresh": fresh, "stale": frame_stale, "dt": dt,
+                       "error": curveVal, "steering": steer_val,
+                       "left_duty": actuator.left.value, "right_duty": actuator.right.value})
+
+def publish_debug_streams(img, frame, steer_val):
+    """Hands the debug feeds to the streamer; each is only encoded if it has viewers."""
+    streamer.update_image(img, stream='raw') # The grabber hands out a new array per frame
+    if frame is not None:
+        # Pipeline buffers are reused next tick, so they are copied (only while someone watches)
+        streamer.update_image(pipeline.mask, copy=True, stream='mask')
+        streamer.update_image(frame, copy=True, stream='warp')
+    if streamer.has_clients('overlay'):
+        streamer.update_image(drawOverlay(img, WARP_POINTS, curveVal, steer_val), stream='overlay')
+
+def main(movement_enabled=False, dt=1 / LOOP_RATE_HZ, perceive=True):
+    global last_seq, curveVal, last_frame_time
+    img = None
+    if perceive:
+        # Take the newest frame if there is one we haven't processed; never wait for the camera
+        seq, capture_time, img = WebcamMod.getGrabber().read(after_seq=last_seq, timeout=0)
+
+    # No new frame (or perception skipped): keep actuating on the last steering (see drive()).
+    # Only ticks that processed a fresh frame are timed, so the latency stats stay glass-to-command.
+    timed = img is not None
+    frame = None
+    if timed:
+        frame_dt = frame_interval(capture_time, dt)
+        last_seq, last_frame_time = seq, capture_time
+        latency.start(capture_time)
+        # Only threshold/warp the full frame when someone is watching those streams
+        curveVal, frame = pipeline.process(img, full_warp=streamer.has_clients('mask', 'warp')) # calculate lane curve
+
+    # print(curveVal)
+    if not movement_enabled:
+        pid.reset()
+    if timed:
+        steer_val = pid.update(curveVal, dt=frame_dt)
+        latency.mark('pid')
+    else:
+        steer_val = pid.output # Same error as last tick: hold the steering
 
     if movement_enabled:
-        car.steer(30, steer_val)
+        drive(steer_val)
+        if timed:
+            latency.mark('command')
+
+    if timed:
+        publish_debug_streams(img, frame, steer_val)
+        latency.mark('stream')
+        latency.finish()
+        recorder.record(img, curveVal, steer_val, actuator.left.value, actuator.right.value, seq, capture_time)
+
+    publish_telemetry(dt, steer_val, timed)
 
 try: 
     if __name__ == '__main__':
-        streamer = ImageStreamer(port=8000)
-        streamer.start()
+        if MULTIPROCESS:
+            perception = PerceptionProcess(WebcamMod.CameraSource, 360, 240,
+                                           pipeline_options=LANE_PIPELINE).start()
+            step = main_multiprocess
+        else:
+            streamer = ImageStreamer(port=8000)
+            # Debug feeds: /raw.mjpg, /mask.mjpg, /warp.mjpg (also /stream.mjpg) and /overlay.mjpg.
+            # The mask and warp feeds are binary, so they also go out as packed bits on /mask.mask and
+            # /warp.mask (open /viewer.html) at a fraction of the CPU and bandwidth of JPEG.
+            # Each feed steps its JPEG quality / size down if encoding or sending it gets too expensive
+            streamer.add_stream('raw', max_fps=15, adaptive=AdaptiveQuality(cpu_budget=0.1))
+            streamer.add_stream('mask', max_fps=15, adaptive=AdaptiveQuality(cpu_budget=0.1), mask=True)
+            streamer.add_stream('warp', aliases=('/stream.mjpg',), adaptive=AdaptiveQuality(cpu_budget=0.15), mask=True)
+            streamer.add_stream('overlay', max_fps=15, adaptive=AdaptiveQuality(cpu_budget=0.1))
+            streamer.add_route('/latency.json', lambda: ('application/json', latency.to_json()))
+            streamer.add_route('/actuator_latency.json', lambda: ('application/json', actuator.latency.to_json()))
+            streamer.start()
+            WebcamMod.getGrabber() # Start the camera thread before the loop needs frames
+            step = main
         
+        recorder = FlightRecorder('flight.rec', seconds=30, rate_hz=LOOP_RATE_HZ)
+        telemetry.start()
+
         # Read camera for the first 5 seconds without motor control
-        start_time = time.time()
         print("Reading camera for 5 seconds...")
-        while time.time() - start_time < 5:
-            main() # Call main to update image streamer
-            time.sleep(0.01) # Small delay to avoid busy-waiting
+        scheduler.run(lambda dt, perceive: step(dt=dt, perceive=perceive), duration=5)
 
         print("Motor control enabled.")
-        
-        while True:
-            main(movement_enabled=True)
-            time.sleep(0.01) # Small delay to avoid busy-waiting
+        actuator.start()
+        scheduler.run(lambda dt, perceive: step(movement_enabled=True, dt=dt, perceive=perceive))
 finally:
+    actuator.stop() # Stops the actuator thread and the car
     car.stop() # Stops the Car
     time.sleep(0.2)
     # car.exit() # ! Runs Pin Cleanup script (for some reason my pi acts weird when this line run)
-    streamer.stop() # Stops the Image Streamer  
\ No newline at end of file
+    if perception is not None:
+        perception.stop() # Stops the perception and streamer processes
+    else:
+        streamer.stop() # Stops the Image Streamer  
+    latency.dump('latency.json')
+    actuator.latency.dump('actuator_latency.json')
+    telemetry.stop() # Sends what is still queued and closes the sinks
+    print(telemetry.stats())
+    if recorder is not None:
+        print(recorder.stats())
+        recorder.close()
+    print(scheduler.stats())
+    print(actuator.stats())
@@ -0,0 +1,186 @@
+"""
+Measures the timing jitter of a PWM carrier.
+
+Real output: connect the PWM pin to a spare input (a jumper wire) and let pigpio timestamp every
+edge on it (DMA-sampled, 1 us resolution). The PWM itself can come from any backend:
+
+    sudo pigpiod
+    python pwm_jitter.py --gpio=rpi    --pin 18 --sense-pin 23 --frequency 100  --load 3
+    python pwm_jitter.py --gpio=pigpio --pin 18 --sense-pin 23 --frequency 1000 --load 3
+
+Simulated output (no Pi needed): --gpio=sim emulates a sleep-timed software PWM thread like the
+one RPi.GPIO runs per channel, which shows how CPU load bends its timing on any Linux machine.
+
+--load N keeps N processes busy running the lane pipeline, the load the Pi sees while driving.
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+
+import numpy as np
+
+from GPIOBackends import BCM, OUT, get_backend
+
+
+def busyPipeline(stop_event):
+    import WebcamMod
+    from LaneDetection import LanePipeline
+
+    source = WebcamMod.SyntheticSource(fps=0)
+    pipeline = LanePipeline(source.width, source.height)
+    while not stop_event.is_set():
+        pipeline.process(source.read()[1], full_warp=True)
+
+
+def startLoad(processes):
+    """Starts `processes` lane-pipeline workers. Returns (stop_event, processes)."""
+    ctx = multiprocessing.get_context('fork')
+    stop_event = ctx.Event()
+    workers = [ctx.Process(target=busyPipeline, args=(stop_event,), daemon=True) for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    return stop_event, workers
+
+
+def emulateSoftwarePwm(frequency, duty, duration):
+    """
+    Sleep-timed PWM like RPi.GPIO's per-channel thread.
+    Returns:
+        tuple: (rising, falling) edge times in seconds.
+    """
+    period = 1.0 / frequency
+    high_time = period * duty / 100.0
+    rising, falling = [], []
+    end = time.perf_counter() + duration
+    while True:
+        now = time.perf_counter()
+        if now >= end:
+            break
+        rising.append(now)
+        time.sleep(high_time)
+        falling.append(time.perf_counter())
+        time.sleep(period - high_time)
+    return np.array(rising), np.array(falling)
+
+
+def captureEdges(pin, duration):
+    """
+    Timestamps every edge on `pin` with pigpio for `duration` seconds.
+    Returns:
+        tuple: (rising, falling) edge times in seconds.
+    """
+    import pigpio
+
+    pi = pigpio.pi()
+    if not pi.connected:
+        raise RuntimeError("Could not connect to pigpiod (start it with `sudo pigpiod`)")
+    pi.set_mode(pin, pigpio.INPUT)
+    edges = []
+    callback = pi.callback(pin, pigpio.EITHER_EDGE, lambda gpio, level, tick: edges.append((tick, level)))
+    time.sleep(duration)
+    callback.cancel()
+    pi.stop()
+
+    if not edges:
+        return np.array([]), np.array([])
+    ticks = np.array([tick for tick, _ in edges], dtype=np.int64)
+    levels = np.array([level for _, level in edges])
+    # Ticks are microseconds in a wrapping 32-bit counter
+    times = np.concatenate(([0], np.cumsum(np.diff(ticks) % (1 << 32)))) / 1e6
+    return times[levels == 1], times[levels == 0]
+
+
+def jitterStats(rising, falling, frequency, duty):
+    """
+    Period and duty-cycle statistics of a captured carrier (times in microseconds).
+    """
+    if len(rising) < 3:
+        return {"edges": int(len(rising) + len(falling))}
+    nominal = 1e6 / frequency
+    periods = np.diff(rising) * 1e6
+    deviation = np.abs(periods - nominal)
+
+    # Pair every rising edge with the first falling edge after it (within the same period)
+    index = np.searchsorted(falling, rising[:-1])
+    valid = index < len(falling)
+    high = (falling[index[valid]] - rising[:-1][valid]) * 1e6
+    measured_duty = 100.0 * high / periods[valid]
+
+    return {
+        "edges": int(len(rising) + len(falling)),
+        "frequency_hz": frequency,
+        "period_nominal_us": nominal,
+        "period_mean_us": float(periods.mean()),
+        "period_std_us": float(periods.std()),
+        "period_p99_dev_us": float(np.percentile(deviation, 99)),
+        "period_max_dev_us": float(deviation.max()),
+        "duty_nominal": duty,
+        "duty_mean": float(measured_duty.mean()) if measured_duty.size else None,
+        "duty_std": float(measured_duty.std()) if measured_duty.size else None,
+        "duty_p99_dev": float(np.percentile(np.abs(measured_duty - duty), 99)) if measured_duty.size else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure PWM carrier jitter.")
+    parser.add_argument("--gpio", default="sim", help="Backend generating the PWM: sim, rpi, pigpio or lgpio")
+    parser.add_argument("--pin", type=int, default=18, help="BCM pin to generate the PWM on")
+    parser.add_argument("--sense-pin", type=int, help="BCM pin wired to --pin to sample the output on")
+    parser.add_argument("--frequency", type=int, default=100, help="Carrier frequency in Hz")
+    parser.add_argument("--duty", type=float, default=30, help="Duty cycle in percent")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds to sample")
+    parser.add_argument("--load", type=int, default=0, help="Lane-pipeline processes to run alongside")
+    parser.add_argument("--output", help="Write the statistics to this JSON file")
+    args = parser.parse_args(argv)
+
+    if args.gpio != "sim" and args.sense_pin is None:
+        parser.error("--sense-pin is required to measure real output")
+
+    stop_event, workers = startLoad(args.load)
+    try:
+        time.sleep(0.5 if workers else 0) # Let the load ramp up
+        if args.gpio == "sim":
+            rising, falling = emulateSoftwarePwm(args.frequency, args.duty, args.duration)
+        else:
+            gpio = get_backend(args.gpio)
+            gpio.setmode(BCM)
+            gpio.setup(args.pin, OUT)
+            pwm = gpio.PWM(args.pin, args.frequency)
+            pwm.start(args.duty)
+            try:
+                time.sleep(0.2)
+                rising, falling = captureEdges(args.sense_pin, args.duration)
+            finally:
+                pwm.stop()
+                gpio.cleanup()
+    finally:
+        stop_event.set()
+        for worker in workers:
+            worker.join(timeout=2.0)
+
+    stats = jitterStats(rising, falling, args.frequency, args.duty)
+    stats.update({"backend": args.gpio, "load_processes": args.load})
+    if "period_mean_us" not in stats:
+        sys.stderr.write(f"Only {stats['edges']} edges captured; is --sense-pin wired to --pin?\n")
+        return 1
+
+    print(f"{args.gpio} PWM at {args.frequency} Hz / {args.duty:.0f}% with {args.load} load processes: "
+          f"{stats['edges']} edges")
+    print(f"  period   mean {stats['period_mean_us']:.1f} us (nominal {stats['period_nominal_us']:.1f}), "
+          f"std {stats['period_std_us']:.1f} us, p99 dev {stats['period_p99_dev_us']:.1f} us, "
+          f"max dev {stats['period_max_dev_us']:.1f} us")
+    if stats["duty_mean"] is not None:
+        print(f"  duty     mean {stats['duty_mean']:.2f}%, std {stats['duty_std']:.2f}%, "
+              f"p99 dev {stats['duty_p99_dev']:.2f}%")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(stats, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+Replays a recorded run through the v6 pipeline on a dev machine.
+
+Frames from a video file, an image directory or the synthetic source go through the same
+LanePipeline -> PIDController -> Actuator -> MotorController path as main.py, with the motors on the
+simulated GPIO backend. Per-frame error, steering, the slew-limited wheel duty cycles and stage
+timings are written to a columnar file (.npz, or .csv by extension).
+
+Usage:
+    python replay.py --video runs/lap1.mp4 --output lap1.npz              # as fast as possible
+    python replay.py --frames runs/lap1/ --fps 30 --realtime             # at the recorded timing
+    python replay.py --video runs/lap1.mp4 --output after.npz --compare before.npz
+
+The PID and the actuator's slew limiters get the recorded frame period as dt (not the replay's
+wall-clock time), so the steering and duty output only depend on the frames: --compare fails
+(exit code 1) if the frame count differs from the baseline or any steering value differs by more
+than --tolerance, which makes it a check that a performance change did not alter the controller
+output.
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import WebcamMod
+from Actuator import Actuator, ACTUATOR
+from GPIOBackends import SimulatedGPIO
+from Instrumentation import LatencyRecorder
+from LaneDetection import LanePipeline, LANE_PIPELINE
+from MotorController import MotorController
+from PIDController import PIDController, STEERING_PID
+
+REPLAY_STAGES = ('capture', 'threshold', 'warp', 'error', 'pid', 'motor')
+
+
+def openSource(args, size):
+    """Returns (source, fps, frame count or None) for the command line arguments."""
+    if args.video:
+        source = WebcamMod.VideoFileSource(args.video, loop=False, realtime=args.realtime, size=size)
+        fps = 1.0 / source.period
+        count = int(source.capture.get(WebcamMod.cv2.CAP_PROP_FRAME_COUNT)) or None
+    elif args.frames:
+        source = WebcamMod.ImageDirectorySource(args.frames, realtime=args.realtime, fps=args.fps, size=size)
+        fps, count = args.fps, len(source.files)
+    else:
+        source = WebcamMod.SyntheticSource(width=size[0], height=size[1], fps=args.fps if args.realtime else 0)
+        fps, count = args.fps, args.count
+    if args.count:
+        count = min(count, args.count) if count else args.count
+    return source, fps, count
+
+
+def replay(source, fps, count=None, speed=30, full_warp=False, size=(360, 240), pipeline_options=None):
+    """
+    Runs every frame through pipeline -> PID -> actuator (LanePipeline options default to main.py's).
+
+    The actuator is stepped by hand at its own rate (about three updates per 30 fps frame), with the
+    slew limits main.py drives the car with; its watchdog is off, as there is no wall clock to go stale.
+
+    Returns:
+        dict: column name -> np.ndarray, one row per frame.
+    """
+    pipeline = LanePipeline(*size, **(LANE_PIPELINE if pipeline_options is None else pipeline_options))
+    recorder = LatencyRecorder(stages=REPLAY_STAGES, capacity=count or 100_000)
+    pipeline.timer = recorder
+    pid = PIDController(**STEERING_PID)
+    gpio = SimulatedGPIO(record=False)
+    car = MotorController((2, 3, 4), (22, 27, 17), gpio=gpio)
+    actuator = Actuator(car, **dict(ACTUATOR, watchdog_ms=None))
+    dt = 1.0 / fps
+    steps = max(1, round(dt * ACTUATOR["rate_hz"]))
+
+    errors, steering, left_duty, right_duty, lane = [], [], [], [], []
+    while count is None or len(errors) < count:
+        success, img = source.read()
+        if not success:
+            break
+        recorder.start()
+        error, _ = pipeline.process(img, full_warp=full_warp)
+        steer_val = pid.update(error, dt=dt)
+        recorder.mark('pid')
+        actuator.command(speed, steer_val)
+        for _ in range(steps):
+            actuator.update(dt / steps)
+        recorder.mark('motor')
+        recorder.finish()
+
+        errors.append(error)
+        steering.append(steer_val)
+        left_duty.append(actuator.left.value)
+        right_duty.append(actuator.right.value)
+        if pipeline.model is not None:
+            lane.append((pipeline.model.offset, pipeline.model.heading, pipeline.model.curvature))
+
+    rows = recorder.snapshot()[-len(errors):] if errors else recorder.snapshot()
+    columns = {
+        "frame": np.arange(len(errors)),
+        "video_time": np.arange(len(errors)) * dt,
+        "error": np.array(errors, dtype=np.float64),
+        "steering": np.array(steering, dtype=np.float64),
+        "left_duty": np.array(left_duty, dtype=np.float64),   # signed, as in the flight recorder
+        "right_duty": np.array(right_duty, dtype=np.float64),
+    }
+    if lane:
+        columns["offset"], columns["heading"], columns["curvature"] = np.array(lane, dtype=np.float64).T
+    # Past `capacity` frames the ring only holds the most recent ticks; pad the older ones with NaN
+    for stage, values in recorder.durations(rows).items():
+        columns[f"{stage}_ms"] = np.concatenate((np.full(len(errors) - len(values), np.nan), values))
+    return columns
+
+
+def saveColumns(path, columns):
+    if path.endswith(".csv"):
+        names = list(columns)
+        table = np.column_stack([columns[n] for n in names])
+        np.savetxt(path, table, delimiter=",", header=",".join(names), comments="", fmt="%.10g")
+    else:
+        np.savez_compressed(path, **columns)
+
+
+def loadColumns(path):
+    if path.endswith(".csv"):
+        table = np.genfromtxt(path, delimiter=",", names=True)
+        return {name: table[name] for name in table.dtype.names}
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded run through the v6 pipeline.")
+    parser.add_argument("--video", help="Recorded video file")
+    parser.add_argument("--frames", help="Directory of recorded frames")
+    parser.add_argument("--fps", type=float, default=30, help="Frame rate of --frames / synthetic frames")
+    parser.add_argument("--count", type=int, help="Stop after this many frames (default 300 for synthetic)")
+    parser.add_argument("--realtime", action="store_true", help="Replay at the recorded timing")
+    parser.add_argument("--speed", type=int, default=30, help="Base speed of the steer commands")
+    parser.add_argument("--tracker", action=argparse.BooleanOptionalAction, default=LANE_PIPELINE["tracker"],
+                        help="Sliding-window lane tracker instead of the single-band centroid")
+    parser.add_argument("--model", action=argparse.BooleanOptionalAction, default=LANE_PIPELINE["model"],
+                        help="Polynomial lane model with a look-ahead error")
+    parser.add_argument("--lookahead", type=float, default=LANE_PIPELINE["lookahead"],
+                        help="Look-ahead of the lane model's error (fraction of the warped height)")
+    parser.add_argument("--full-warp", action="store_true", help="Warp the whole mask (as with stream viewers)")
+    parser.add_argument("--output", help="Write per-frame columns to this .npz or .csv file")
+    parser.add_argument("--compare", help="Baseline .npz/.csv whose steering output must match")
+    parser.add_argument("--tolerance", type=float, default=1e-6, help="Allowed steering difference")
+    args = parser.parse_args(argv)
+    if not args.video and not args.frames and not args.count:
+        args.count = 300
+
+    size = (360, 240)
+    source, fps, count = openSource(args, size)
+    start = time.perf_counter()
+    options = dict(LANE_PIPELINE, tracker=args.tracker, model=args.model, lookahead=args.lookahead)
+    columns = replay(source, fps, count, speed=args.speed, full_warp=args.full_warp, size=size,
+                     pipeline_options=options)
+    elapsed = time.perf_counter() - start
+    source.release()
+
+    frames = len(columns["frame"])
+    if frames == 0:
+        sys.stderr.write("No frames could be read.\n")
+        return 2
+    print(f"{frames} frames in {elapsed:.2f} s ({frames / elapsed:.0f} fps)")
+    for name, values in columns.items():
+        if name.endswith("_ms") and np.isfinite(values).any(): # the tracker has no separate threshold stage
+            print(f"  {name[:-3]:<16} mean {np.nanmean(values):.3f} ms   p95 {np.nanpercentile(values, 95):.3f} ms")
+
+    if args.output:
+        saveColumns(args.output, columns)
+
+    if args.compare:
+        baseline = loadColumns(args.compare)
+        n = min(frames, len(baseline["steering"]))
+        if n != frames or n != len(baseline["steering"]):
+            print(f"Frame count differs from {args.compare}: {frames} vs {len(baseline['steering'])}")
+            return 1
+        diff = np.abs(columns["steering"][:n] - baseline["steering"][:n])
+        worst = int(np.argmax(diff)) if n else 0
+        if n and diff[worst] > args.tolerance:
+            print(f"Steering differs from {args.compare}: {int((diff > args.tolerance).sum())} frames, "
+                  f"max {diff[worst]:.6f} at frame {worst}")
+            return 1
+        print(f"Steering matches {args.compare} ({n} frames, max difference {diff.max() if n else 0:.2e}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
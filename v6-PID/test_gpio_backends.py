@@ -0,0 +1,91 @@
+"""
+Checks the GPIO simulator and how backend names are resolved.
+
+    cd v6-PID && python -m pytest -q
+"""
+
+import itertools
+import sys
+
+import pytest
+
+import GPIOBackends
+from GPIOBackends import SimulatedGPIO, backend_from_args, get_backend
+
+
+def test_simulator_keeps_levels_duty_and_trace():
+    clock = itertools.count()
+    gpio = SimulatedGPIO(clock=lambda: next(clock))
+    gpio.setmode(gpio.BCM)
+    gpio.setup(4, gpio.OUT)
+    gpio.output(4, gpio.HIGH)
+    pwm = gpio.PWM(2, 100)
+    pwm.start(0)
+    pwm.ChangeDutyCycle(40)
+    pwm.ChangeFrequency(1000)
+    pwm.stop()
+
+    assert gpio.mode == gpio.BCM and gpio.modes == {4: gpio.OUT}
+    assert gpio.levels == {4: True} and gpio.duty == {2: 0}
+    assert gpio.writes == 5
+    assert list(gpio.trace) == [(0, 4, 'level', 1), (1, 2, 'frequency', 100), (2, 2, 'duty', 0),
+                                (3, 2, 'duty', 40), (4, 2, 'frequency', 1000), (5, 2, 'duty', 0)]
+
+
+def test_simulator_trace_is_bounded():
+    gpio = SimulatedGPIO(trace_limit=10)
+    pwm = gpio.PWM(2, 100)
+    for duty in range(100):
+        pwm.ChangeDutyCycle(duty)
+    # Only the newest changes are kept, but every write is counted
+    assert [value for _, _, _, value in gpio.trace] == list(range(90, 100))
+    assert gpio.writes == 100
+
+
+def test_simulator_without_record_keeps_no_trace():
+    gpio = SimulatedGPIO(record=False)
+    gpio.output(4, True)
+    gpio.PWM(2, 100).ChangeDutyCycle(50)
+    assert len(gpio.trace) == 0
+    assert gpio.levels == {4: True} and gpio.duty == {2: 50}
+
+
+def test_dump_trace(tmp_path):
+    gpio = SimulatedGPIO(clock=lambda: 1.5)
+    gpio.output(4, True)
+    path = tmp_path / "trace.csv"
+    gpio.dump_trace(str(path))
+    assert path.read_text() == "time,pin,kind,value\n1.500000,4,level,1\n"
+
+
+def test_get_backend_names():
+    assert isinstance(get_backend('sim'), SimulatedGPIO)
+    with pytest.raises(ValueError):
+        get_backend('gpiozero')
+
+
+def test_auto_never_falls_back_to_the_simulator(monkeypatch):
+    # Every hardware library fails to open, as on a machine without them
+    def unavailable():
+        raise RuntimeError("cannot open")
+    monkeypatch.setattr(GPIOBackends, 'PigpioGPIO', unavailable)
+    monkeypatch.setattr(GPIOBackends, 'LgpioGPIO', unavailable)
+    monkeypatch.setitem(sys.modules, 'RPi', None)
+    monkeypatch.setitem(sys.modules, 'RPi.GPIO', None)
+    with pytest.raises(RuntimeError, match="--gpio=sim"):
+        get_backend('auto')
+
+
+def test_auto_takes_the_first_library_that_opens(monkeypatch):
+    def unavailable():
+        raise ImportError("No module named 'pigpio'")
+    lgpio = object()
+    monkeypatch.setattr(GPIOBackends, 'PigpioGPIO', unavailable)
+    monkeypatch.setattr(GPIOBackends, 'LgpioGPIO', lambda: lgpio)
+    assert get_backend('auto') is lgpio
+
+
+def test_backend_from_args():
+    assert backend_from_args(['--multiprocess', '--gpio=pigpio']) == 'pigpio'
+    assert backend_from_args(['--multiprocess']) == 'auto'
+    assert backend_from_args([], default='sim') == 'sim'
@@ -0,0 +1,201 @@
+"""
+Checks that the fast lane-detection paths give the same answer as the plain full-frame one.
+
+    cd v6-PID && python -m pytest -q
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+import utils
+from LaneDetection import getLaneCurve, get_lane_error_norm, LanePipeline, WARP_POINTS
+from WebcamMod import SyntheticSource, convertPixelFormat
+
+# ROI-only warping resamples the band with a shifted matrix, so results agree to float rounding
+ROI_TOLERANCE = 1e-5
+
+
+def synthetic_frames(count=40, width=360, height=240, sway=0.3, **kwargs):
+    # 40 frames at 30 fps cover a third of a sway, lane left of centre through to the right
+    source = SyntheticSource(width=width, height=height, fps=0, sway=sway, **kwargs)
+    return [source.make_frame(i * 3) for i in range(count)]
+
+
+def full_warp_error(img, roi_top=0.6, roi_bot=0.8):
+    """The reference: threshold the whole frame, warp all of it, read the ROI."""
+    h, w = img.shape[:2]
+    warped = utils.warpImg(utils.thresholding(img), WARP_POINTS, w, h)
+    return get_lane_error_norm(warped, roi_top, roi_bot)
+
+
+def test_roi_lane_curve_matches_full_warp():
+    for img in synthetic_frames():
+        reference = full_warp_error(img)
+        full, _ = getLaneCurve(img, full_warp=True)
+        roi, warped = getLaneCurve(img, full_warp=False)
+        assert warped is None
+        assert full == pytest.approx(reference, abs=ROI_TOLERANCE)
+        assert roi == pytest.approx(reference, abs=ROI_TOLERANCE)
+
+
+@pytest.mark.parametrize("full_warp", [True, False])
+def test_pipeline_matches_full_warp(full_warp):
+    pipeline = LanePipeline(360, 240)
+    for img in synthetic_frames():
+        error, warped = pipeline.process(img, full_warp=full_warp)
+        assert error == pytest.approx(full_warp_error(img), abs=ROI_TOLERANCE)
+        assert (warped is not None) == full_warp
+
+
+@pytest.mark.parametrize("pixel_format", utils.ThresholdEngine.FORMATS)
+@pytest.mark.parametrize("options", [{}, dict(tracker=True, model=True, lookahead=0.2)])
+@pytest.mark.parametrize("full_warp", [True, False])
+def test_pipeline_resizes_other_frame_sizes(pixel_format, options, full_warp):
+    # A webcam may ignore the requested 360x240 and deliver 640x480
+    large = LanePipeline(360, 240, pixel_format=pixel_format, **options)
+    small = LanePipeline(360, 240, pixel_format=pixel_format, **options)
+    for img in synthetic_frames(count=10, width=640, height=480):
+        error, warped = large.process(convertPixelFormat(img, pixel_format), full_warp=full_warp)
+        resized = convertPixelFormat(cv2.resize(img, (360, 240)), pixel_format)
+        expected, _ = small.process(resized, full_warp=full_warp)
+        assert error == pytest.approx(expected, abs=0.02)
+        if full_warp:
+            assert warped.shape == (240, 360)
+    assert large.resized_frames == 10
+
+
+def blank_frame(level=200):
+    """Floor without a lane (level 200) or a covered lens (level 0)."""
+    return np.full((240, 360, 3), level, dtype=np.uint8)
+
+
+@pytest.mark.parametrize("full_warp", [True, False])
+def test_tracker_matches_centroid(full_warp):
+    centroid = LanePipeline(360, 240)
+    tracked = LanePipeline(360, 240, tracker=True)
+    for img in synthetic_frames(sway=0.25):
+        expected, _ = centroid.process(img, full_warp=False)
+        error, _ = tracked.process(img, full_warp=full_warp)
+        assert error == pytest.approx(expected, abs=0.005)
+    # Found once, then followed in the windows
+    assert tracked.tracker.searches == 1
+    assert tracked.tracker.tracking
+
+
+def test_tracker_holds_then_searches_again():
+    pipeline = LanePipeline(360, 240, tracker=True)
+    tracker = pipeline.tracker
+    frames = synthetic_frames(count=10)
+    for img in frames:
+        last, _ = pipeline.process(img, full_warp=False)
+    assert abs(last) > 0.1
+
+    # The last offset is held for hold_frames frames without a lane, then the default is reported
+    for _ in range(tracker.hold_frames):
+        assert pipeline.process(blank_frame(), full_warp=False)[0] == last
+    assert not tracker.tracking
+    assert pipeline.process(blank_frame(), full_warp=False)[0] == 0.0
+
+    searches = tracker.searches
+    error, _ = pipeline.process(frames[-1], full_warp=False)
+    assert tracker.tracking and tracker.searches == searches + 1
+    assert error == pytest.approx(last, abs=0.01)
+
+
+@pytest.mark.parametrize("options", [dict(tracker=True), dict(model=True, lookahead=0.2),
+                                     dict(tracker=True, model=True, lookahead=0.2)])
+@pytest.mark.parametrize("full_warp", [True, False])
+def test_dark_frame_is_not_a_lane(options, full_warp):
+    # A covered lens or deep shadow makes every pixel a lane pixel; like the centroid, report 0.0
+    pipeline = LanePipeline(360, 240, **options)
+    assert pipeline.process(blank_frame(0), full_warp=full_warp)[0] == 0.0
+    for estimator in (pipeline.tracker, pipeline.model):
+        assert estimator is None or not estimator.tracking
+
+    # Going dark while tracking holds the last error for a few frames, then drops to 0.0
+    for img in synthetic_frames(count=10):
+        last, _ = pipeline.process(img, full_warp=full_warp)
+    assert abs(last) > 0.1
+    errors = [pipeline.process(blank_frame(0), full_warp=full_warp)[0] for _ in range(10)]
+    assert errors[0] == pytest.approx(last, abs=0.05)
+    assert errors[-1] == 0.0
+
+
+def polyfit_error(img, model, lookahead):
+    """The reference for LaneModel: np.polyfit through every lane pixel of the fully warped rows it samples."""
+    h, w = img.shape[:2]
+    warped = utils.warpImg(utils.thresholding(img), WARP_POINTS, w, h)
+    top = int(h * 0.2)
+    ys, xs = np.nonzero(warped[top:])
+    c2, c1, c0 = np.polyfit((h - top - ys) / h, (xs - model.center) / model.center, 2)
+    v = model.v_error + lookahead
+    return c0 + c1 * v + c2 * v * v
+
+
+@pytest.mark.parametrize("options, step", [(dict(), 1), (dict(tracker=True), 1), (dict(tracker=True), 2)])
+def test_model_matches_polyfit(options, step):
+    # Alone, the model's strip follows the lane at 30 fps; with the tracker placing it, at twice the speed.
+    # What difference there is comes from the fit's memory lagging the lane, and grows with its speed
+    pipeline = LanePipeline(360, 240, model=True, lookahead=0.2, **options)
+    model = pipeline.model
+    source = SyntheticSource(width=360, height=240, fps=0, sway=0.3)
+    for i in range(40):
+        img = source.make_frame(i * step)
+        error, _ = pipeline.process(img, full_warp=False)
+        assert model.tracking
+        assert error == model.error(0.2)
+        for lookahead in (0.0, 0.2):
+            assert model.error(lookahead) == pytest.approx(polyfit_error(img, model, lookahead), abs=0.05)
+        assert model.pixels <= 1024
+
+
+def test_model_warm_start():
+    pipeline = LanePipeline(360, 240, model=True)
+    model = pipeline.model
+    frames = [SyntheticSource(width=360, height=240, fps=0, sway=0.3).make_frame(i) for i in range(10)]
+
+    # The first frame searches the full width on the budget, later ones sample the strip around the last fit
+    pipeline.process(frames[0], full_warp=False)
+    assert model.error() == pytest.approx(polyfit_error(frames[0], model, 0.0), abs=0.01)
+    assert model.pixels <= 1024
+    strip = len(model.strip_rows)
+    for img in frames[1:]:
+        pipeline.process(img, full_warp=False)
+        assert model.tracking and model.pixels == strip < 1024
+
+    # Starting from the tracker's fit matches the full search on the first frame
+    seeded_pipeline = LanePipeline(360, 240, tracker=True, model=True)
+    seeded = seeded_pipeline.model
+    seeded_pipeline.process(frames[0], full_warp=False)
+    assert seeded.pixels == strip
+    assert seeded.error() == pytest.approx(polyfit_error(frames[0], seeded, 0.0), abs=0.01)
+
+
+def test_pipeline_sees_lane_on_both_sides():
+    # Guards against the comparisons above passing trivially on frames without a lane
+    errors = [LanePipeline(360, 240).process(img, full_warp=False)[0] for img in synthetic_frames()]
+    assert min(errors) < -0.1 and max(errors) > 0.1
+
+
+# Includes empty (lower > upper) and out-of-range bounds, which the LUT has to clamp like inRange does
+THRESHOLDS = [(0, 100), (0, 0), (30, 200), (100, 100), (0, 255), (200, 255), (-10, 300), (50, 20)]
+
+
+@pytest.mark.parametrize("lower, upper", THRESHOLDS)
+@pytest.mark.parametrize("pixel_format", utils.ThresholdEngine.FORMATS)
+def test_threshold_engine_matches_inrange(pixel_format, lower, upper):
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (240, 360, 3), dtype=np.uint8)] + synthetic_frames(count=3)
+    engine = utils.ThresholdEngine(lower, upper, pixel_format)
+    for bgr in frames:
+        img = convertPixelFormat(bgr, pixel_format)
+        if pixel_format == 'bgr':
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = img[:, :, 0] if pixel_format == 'yuyv' else img
+        expected = cv2.inRange(gray, lower, upper)
+        np.testing.assert_array_equal(engine.apply(img), expected)
+        dst = np.empty_like(expected)
+        assert engine.apply(img, dst=dst) is dst
+        np.testing.assert_array_equal(dst, expected)
@@ -0,0 +1,67 @@
+"""
+Checks that MotorController only writes changed duty cycles and pin levels, on the GPIO simulator.
+
+    cd v6-PID && python -m pytest -q
+"""
+
+from GPIOBackends import SimulatedGPIO
+from MotorController import MotorController
+
+LEFT = (2, 3, 4)        # (enable, forward, reverse)
+RIGHT = (22, 27, 17)
+
+
+def make_car():
+    gpio = SimulatedGPIO()
+    car = MotorController(LEFT, RIGHT, gpio=gpio)
+    return car, gpio
+
+
+def pin_state(gpio):
+    """Duty per enable pin and (forward, reverse) levels per side, as the simulator last saw them."""
+    return ({pin: gpio.duty[pin] for pin in (LEFT[0], RIGHT[0])},
+            (gpio.levels[LEFT[1]], gpio.levels[LEFT[2]]), (gpio.levels[RIGHT[1]], gpio.levels[RIGHT[2]]))
+
+
+def test_steer_repeats_cost_no_writes():
+    car, gpio = make_car()
+    car.steer(30, 0.5)
+    # Two duty cycles and four direction pins on the first command
+    assert (car.writes, car.writes_skipped) == (6, 0)
+    assert pin_state(gpio) == ({2: 45, 22: 15}, (True, False), (True, False))
+
+    gpio_writes = gpio.writes
+    for _ in range(10):
+        car.steer(30, 0.5)
+    assert (car.writes, car.writes_skipped) == (6, 60)
+    assert gpio.writes == gpio_writes
+
+    # Only the duty cycles change when the steering does
+    car.steer(30, -0.5)
+    assert (car.writes, car.writes_skipped) == (8, 64)
+    assert gpio.writes == gpio_writes + 2
+    assert pin_state(gpio) == ({2: 15, 22: 45}, (True, False), (True, False))
+
+
+def test_drive_reverse_and_stop():
+    car, gpio = make_car()
+    car.drive(40, 40)
+    car.drive(-40, 40)
+    # Same duty cycles, only the left side's direction pins flip
+    assert (car.writes, car.writes_skipped) == (8, 4)
+    assert pin_state(gpio) == ({2: 40, 22: 40}, (False, True), (True, False))
+
+    car.stop()
+    car.stop()
+    assert (car.writes, car.writes_skipped) == (10, 6)
+    assert pin_state(gpio)[0] == {2: 0, 22: 0}
+
+
+def test_duty_is_written_as_int():
+    # 33.4 and 33.6 both become 33 on the pin, so the second command is skipped
+    car, gpio = make_car()
+    car.drive(33.4, 0)
+    writes, skipped = car.writes, car.writes_skipped
+    car.drive(33.6, 0)
+    assert gpio.duty[LEFT[0]] == 33
+    assert (car.writes, car.writes_skipped) == (writes, skipped + 6)
@@ -1,26 +1,199 @@
 import cv2
 import numpy as np
+from collections import OrderedDict
+
+class ThresholdEngine:
+    """
+    Dark-tape thresholding for the pixel formats the camera can deliver.
+
+    'bgr'  - cvtColor to grayscale then inRange (OpenCV's SIMD paths beat any numpy single pass here).
+    'gray' - a single pass through a precomputed 256-entry LUT.
+    'yuyv' - the same LUT applied straight to the Y plane of a raw (h, w, 2) YUYV frame, no conversion.
+
+    For the same grayscale values every path produces exactly the mask inRange(gray, lower, upper) would.
+
+    Args:
+        lower (int): Lower grayscale threshold (inclusive).
+        upper (int): Upper grayscale threshold (inclusive).
+        pixel_format (str): One of 'bgr', 'gray' or 'yuyv'.
+    """
+    FORMATS = ('bgr', 'gray', 'yuyv')
+
+    def __init__(self, lower=0, upper=100, pixel_format='bgr'):
+        if pixel_format not in self.FORMATS:
+            raise ValueError(f"Unknown pixel format {pixel_format!r}, expected one of {self.FORMATS}")
+        self.lower = lower
+        self.upper = upper
+        self.pixel_format = pixel_format
+        self.lut = np.zeros(256, dtype=np.uint8)
+        self.lut[max(0, lower):max(0, min(255, upper) + 1)] = 255
+
+    def apply(self, img, dst=None, gray=None):
+        """
+        Returns the 0/255 lane mask for `img`.
+
+        Args:
+            img (np.ndarray): Frame in this engine's pixel format.
+            dst (np.ndarray): Optional output buffer for the mask.
+            gray (np.ndarray): Optional scratch buffer for the grayscale image ('bgr' only).
+        """
+        if self.pixel_format == 'bgr':
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=gray)
+            return cv2.inRange(gray, self.lower, self.upper, dst=dst)
+        if self.pixel_format == 'yuyv':
+            img = img[:, :, 0]
+        return cv2.LUT(img, self.lut, dst=dst)
+
+
+def pixelFormat(img):
+    """Guesses the pixel format of a frame from its shape ('gray', 'yuyv' or 'bgr')."""
+    if img.ndim == 2:
+        return 'gray'
+    if img.shape[2] == 2:
+        return 'yuyv'
+    return 'bgr'
+
+_threshold_engines = {}
 
 # Color-based Thresholding mask
-def thresholding(img):
-    grayscale = cv2.cvtColor(img, cv2. COLOR_BGR2GRAY)
-    lowerThreshold = 0
-    upperThreshold = 100
-    mask = cv2.inRange(grayscale, lowerThreshold, upperThreshold)
-    return mask
+def thresholding(img, lowerThreshold=0, upperThreshold=100):
+    key = (pixelFormat(img), lowerThreshold, upperThreshold)
+    engine = _threshold_engines.get(key)
+    if engine is None:
+        engine = _threshold_engines[key] = ThresholdEngine(lowerThreshold, upperThreshold, key[0])
+    return engine.apply(img)
+
+class Warp:
+    """
+    A perspective warp for a fixed set of points and output size.
+    Building one is expensive (solving for the matrix, and optionally the remap tables), applying it is cheap,
+    so create it once and reuse it for every frame (see getWarp).
+
+    Args:
+        points (array-like): The 4 source points (top-left, top-right, bottom-left, bottom-right).
+        w (int): Output width.
+        h (int): Output height.
+        inv (bool): Build the inverse warp (bird's-eye view back to camera view).
+        use_maps (bool): Precompute fixed-point cv2.remap tables instead of using warpPerspective.
+                         Output can differ from warpPerspective by one pixel along lane edges.
+    """
+    def __init__(self, points, w, h, inv=False, use_maps=False):
+        self.w = w
+        self.h = h
+        self.inv = inv
+        pts1 = np.float32(points)
+        pts2 = np.float32([[0, 0], [w, 0], [0, h], [w, h]])
+
+        if inv:
+            self.matrix = cv2.getPerspectiveTransform(pts2, pts1)
+        else:
+            self.matrix = cv2.getPerspectiveTransform(pts1, pts2)
+
+        self.map1 = self.map2 = None
+        if use_maps:
+            # For every output pixel, find where it samples from in the input image
+            xs, ys = np.meshgrid(np.arange(w, dtype=np.float32), np.arange(h, dtype=np.float32))
+            dst_pts = np.stack([xs, ys], axis=-1).reshape(-1, 1, 2)
+            src_pts = cv2.perspectiveTransform(dst_pts, np.linalg.inv(self.matrix)).reshape(h, w, 2)
+            # CV_16SC2 maps are the fixed-point form remap consumes fastest
+            self.map1, self.map2 = cv2.convertMaps(src_pts, None, cv2.CV_16SC2)
+
+        self._bands = {}
+
+    def apply(self, img, dst=None):
+        """
+        Warps `img` into a (h, w) image, writing into `dst` if it is given.
+        """
+        if self.map1 is not None:
+            return cv2.remap(img, self.map1, self.map2, cv2.INTER_LINEAR, dst=dst)
+        return cv2.warpPerspective(img, self.matrix, (self.w, self.h), dst=dst)
+
+    def band(self, y0, y1, src_size=None, x0=0, x1=None):
+        """
+        Returns a (cached) WarpBand that only produces output rows y0:y1 (and columns x0:x1) of this warp.
+
+        Args:
+            y0 (int): First output row.
+            y1 (int): One past the last output row.
+            src_size (tuple): (width, height) of the source image; defaults to the output size.
+            x0 (int): First output column.
+            x1 (int): One past the last output column (defaults to the output width).
+        """
+        src_size = src_size or (self.w, self.h)
+        x1 = self.w if x1 is None else x1
+        key = (y0, y1, src_size, x0, x1)
+        band = self._bands.get(key)
+        if band is None:
+            band = self._bands[key] = WarpBand(self, y0, y1, src_size, x0, x1)
+        return band
+
+
+class WarpBand:
+    """
+    The rows y0:y1 (and columns x0:x1) of a Warp's output, computed without warping the rest of the image.
+
+    The band's corners are back-projected through the inverse homography to find the part of the
+    source image it reads from, so callers can also restrict earlier stages (e.g. thresholding)
+    to that crop. Use crop() to cut the source, then apply() on the (processed) crop.
+    """
+    def __init__(self, warp, y0, y1, src_size, x0=0, x1=None):
+        x1 = warp.w if x1 is None else x1
+        self.w = x1 - x0
+        self.h = y1 - y0
+        self.y0, self.y1 = y0, y1
+        self.x0, self.x1 = x0, x1
+        src_w, src_h = src_size
+
+        corners = np.float32([[x0, y0], [x1, y0], [x0, y1], [x1, y1]]).reshape(-1, 1, 2)
+        src = cv2.perspectiveTransform(corners, np.linalg.inv(warp.matrix)).reshape(-1, 2)
+        # One pixel of margin on each side keeps bilinear interpolation identical to the full warp
+        sx0 = int(max(0, np.floor(src[:, 0].min()) - 1))
+        sx1 = int(min(src_w, np.ceil(src[:, 0].max()) + 2))
+        sy0 = int(max(0, np.floor(src[:, 1].min()) - 1))
+        sy1 = int(min(src_h, np.ceil(src[:, 1].max()) + 2))
+        sx0, sy0 = min(sx0, src_w - 1), min(sy0, src_h - 1)
+        sx1, sy1 = max(sx1, sx0 + 1), max(sy1, sy0 + 1)
+        self.src_slice = (slice(sy0, sy1), slice(sx0, sx1))
+
+        # dst_band = T(-x0, -y0) @ M @ T(sx0, sy0) applied to crop coordinates
+        to_crop = np.array([[1, 0, sx0], [0, 1, sy0], [0, 0, 1]], dtype=np.float64)
+        to_band = np.array([[1, 0, -x0], [0, 1, -y0], [0, 0, 1]], dtype=np.float64)
+        self.matrix = to_band @ warp.matrix @ to_crop
+
+    def crop(self, img):
+        """Returns a view of the part of the source image this band reads from."""
+        return img[self.src_slice]
+
+    def apply(self, cropped, dst=None):
+        """
+        Warps a crop (from crop(), possibly thresholded) into the (h, w) band image.
+        """
+        return cv2.warpPerspective(cropped, self.matrix, (self.w, self.h), dst=dst)
+
+
+# Most recently used warps, keyed on (points, w, h, inv, use_maps)
+_warp_cache = OrderedDict()
+WARP_CACHE_SIZE = 8
+
+def getWarp(points, w, h, inv=False, use_maps=False):
+    """
+    Returns a cached Warp for these parameters, building it on first use.
+    Old entries are evicted least-recently-used first, so changing calibration at runtime is safe.
+    """
+    key = (tuple(np.float32(points).ravel().tolist()), w, h, inv, use_maps)
+    warp = _warp_cache.get(key)
+    if warp is None:
+        warp = Warp(points, w, h, inv, use_maps)
+        _warp_cache[key] = warp
+        if len(_warp_cache) > WARP_CACHE_SIZE:
+            _warp_cache.popitem(last=False)
+    else:
+        _warp_cache.move_to_end(key)
+    return warp
 
 # Warps the Image
 def warpImg(img, points, w, h, inv=False):
-    pts1 = np.float32(points)
-    pts2 = np.float32([[0, 0], [w, 0], [0, h], [w, h]])
-    
-    if inv:
-        matrix = cv2.getPerspectiveTransform(pts2, pts1)
-    else:
-        matrix = cv2.getPerspectiveTransform(pts1, pts2)
-    
-    imgWarp = cv2.warpPerspective(img, matrix, (w, h))
-    return imgWarp
+    return getWarp(points, w, h, inv).apply(img)
 
 # Initializes the Array of points needed for warp
 def initWarpPointsArray(values, wT=360, hT=240):
@@ -32,9 +205,35 @@ def initWarpPointsArray(values, wT=360, hT=240):
     return np.float32([(widthTop, heightTop), (wT-widthTop, heightTop),
                       (widthBottom , heightBottom ), (wT-widthBottom, heightBottom)])
 
-def print_slider(value):
+def drawOverlay(img, points, error, steering):
     """
-    Prints a text-based slider to visualize a value between -1 and 1.
+    Draws the warp region, lane error and steering command on a copy of a BGR frame (for debug streams).
+
+    Args:
+        img (np.ndarray): BGR camera frame.
+        points (np.ndarray): Warp points (see initWarpPointsArray).
+        error (float): Normalized lane error in [-1, 1] (red marker).
+        steering (float): Steering command in [-1, 1] (green marker).
+    """
+    overlay = img.copy()
+    h, w = overlay.shape[:2]
+
+    # Warp points are top-left, top-right, bottom-left, bottom-right
+    quad = np.int32(points)[[0, 1, 3, 2]]
+    cv2.polylines(overlay, [quad], True, (0, 255, 255), 1)
+
+    errorX = int((max(-1.0, min(1.0, error)) + 1) / 2 * (w - 1))
+    steerX = int((max(-1.0, min(1.0, steering)) + 1) / 2 * (w - 1))
+    cv2.line(overlay, (w // 2, h - 12), (w // 2, h - 1), (255, 255, 255), 1)
+    cv2.line(overlay, (errorX, h - 24), (errorX, h - 1), (0, 0, 255), 2)
+    cv2.line(overlay, (steerX, h - 24), (steerX, h - 1), (0, 255, 0), 2)
+    cv2.putText(overlay, f"err {error:+.2f}  steer {steering:+.2f}", (5, 15),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.45, (255, 255, 255), 1, cv2.LINE_AA)
+    return overlay
+
+def format_slider(value):
+    """
+    Returns a text-based slider to visualize a value between -1 and 1.
 
     Args:
         value (float): A number between -1.0 (left) and 1.0 (right).
@@ -57,6 +256,16 @@ def print_slider(value):
     bar_list = [filler_char] * bar_width
     bar_list[indicator_pos] = indicator_char
     bar_string = "".join(bar_list)
-    
-    # Print the final result, formatting the value to two decimal places
-    print(f"<{bar_string}> {{{value:.2f}}}")
\ No newline at end of file
+
+    # Format the final result with the value to two decimal places
+    return f"<{bar_string}> {{{value:.2f}}}"
+
+def print_slider(value):
+    """
+    Prints a text-based slider to visualize a value between -1 and 1
+    (blocking; the control loop goes through Telemetry.SliderSink instead).
+
+    Args:
+        value (float): A number between -1.0 (left) and 1.0 (right).
+    """
+    print(format_slider(value))